@@ -1,30 +1,216 @@
 """
 Configuration file for test settings
+Each value comes from the environment variable of the same name, then the active
+profile (CONFIG_PROFILE or --profile), then the default below. Values are resolved
+and validated on first use, once per worker; Config.resolved() lists them all
 """
 
-import os
+from config.settings import Setting, Settings
 
-class Config:
+# Chromium switches that keep headless runs from being throttled or slowed by the GPU
+FAST_LAUNCH_FLAGS = [
+    "--disable-gpu",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-extensions",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+]
+
+
+class Config(Settings):
+    # Named sets of values; anything not listed falls back to the defaults below
+    PROFILES = {
+        "default": {},
+        # Quick feedback on a laptop: local mock server, short timeouts, no reports
+        "local-fast": {
+            "TARGET": "local",
+            "HEADLESS": True,
+            "LAUNCH_FLAGS": FAST_LAUNCH_FLAGS,
+            "TIMEOUT_SCALE": 0.5,
+            "TIMELINE": False,
+            "HEALTH_CHECK": False,
+        },
+        # Shared runners: headless, more patience, longest-first scheduling
+        "ci": {
+            "HEADLESS": True,
+            "LAUNCH_FLAGS": FAST_LAUNCH_FLAGS,
+            "TIMEOUT_SCALE": 1.5,
+            "HEALTH_CHECK": True,
+            "LPT_SCHEDULING": True,
+            "SHARED_BROWSER": True,
+            "VISUAL_RECORD_NEW": False,
+        },
+        # Performance runs against stage: real network, fresh contexts, web vitals on
+        "stage-perf": {
+            "HEADLESS": True,
+            "NETWORK_ROUTING": False,
+            "CONTEXT_POOL": False,
+            "WEB_VITALS": True,
+            "ADAPTIVE_CAPTURE": False,
+        },
+        # Load generation (python -m utils.load_runner): lean contexts, no per-test reporting
+        "load": {
+            "HEADLESS": True,
+            "LAUNCH_FLAGS": FAST_LAUNCH_FLAGS,
+            "TIMELINE": False,
+            "WEB_VITALS": False,
+            "LOCATOR_PROFILING": False,
+            "RESOURCE_WATCHDOG": False,
+        },
+    }
+    PROFILE = Setting("default", env="CONFIG_PROFILE", choices=tuple(PROFILES), profiled=False)
+    
     # Base URL of the application under test
-    BASE_URL = os.getenv("BASE_URL", "https://bpholter.stage.bio-beat.cloud")
+    BASE_URL = Setting("https://bpholter.stage.bio-beat.cloud")
+    TARGET = Setting("remote", choices=("local", "remote"))  # remote BASE_URL or the bundled mock server
     
     # Browser settings
-    BROWSER = "chromium"  # Options: chromium, firefox, webkit
-    HEADLESS = os.getenv("HEADLESS", "False").lower() == "true"  # Set to True for headless mode
-    SLOW_MO = int(os.getenv("SLOW_MO", "0"))  # Slow down operations by specified milliseconds
+    BROWSER = Setting("chromium", choices=("chromium", "firefox", "webkit"))  # Default for --browser
+    BROWSER_CHANNEL = Setting("")  # Default for --browser-channel, e.g. chrome, msedge (chromium only)
+    HEADLESS = Setting(False)  # Set to True for headless mode
+    SLOW_MO = Setting(0, minimum=0)  # Slow down operations by specified milliseconds
+    LAUNCH_FLAGS = Setting([])  # Extra chromium command line switches, e.g. FAST_LAUNCH_FLAGS
+    
+    # Shared browser servers (with -n: the controller launches them, workers connect instead of launching)
+    SHARED_BROWSER = Setting(False)
+    BROWSER_SERVERS = Setting(1, minimum=1)  # Servers per browser name
+    BROWSER_SERVER_ASSIGNMENT = Setting("round-robin", choices=("round-robin", "block"))  # Worker to server mapping
+    BROWSER_SERVER_CHECK_INTERVAL = Setting(2.0, minimum=0.1)  # Seconds between liveness checks of the servers
+    BROWSER_SERVER_ENDPOINT = Setting("")  # ws:// endpoint of a BROWSER server started before pytest (docker-entrypoint.sh)
     
     # Timeouts (in milliseconds)
-    DEFAULT_TIMEOUT = 30000
-    NAVIGATION_TIMEOUT = 30000
+    DEFAULT_TIMEOUT = Setting(30000, minimum=1)
+    NAVIGATION_TIMEOUT = Setting(30000, minimum=1)
+    ACTION_TIMEOUTS = Setting({})  # Per page object action: "click=5000,fill=5000,text=5000,wait=10000,navigate=20000"
+    TIMEOUT_SCALE = Setting(1.0, minimum=0.1)  # Multiplies every action timeout, e.g. 1.5 on slow runners
     
     # Screenshot settings
-    SCREENSHOT_ON_FAILURE = True
-    SCREENSHOT_PATH = "screenshots"
+    SCREENSHOT_ON_FAILURE = Setting(True)
+    SCREENSHOT_PATH = Setting("screenshots")  # Failure artifacts go to <SCREENSHOT_PATH>/<worker>/<test>/
+    ARTIFACT_IMAGE_FORMAT = Setting("png", choices=("png", "jpeg", "webp"))  # webp needs Pillow
+    ARTIFACT_IMAGE_QUALITY = Setting(80, minimum=1)
+    ARTIFACT_MAX_MB = Setting(200, minimum=1)  # Oldest artifacts are deleted above this size
     
     # Test data
-    VALID_USERNAME = os.getenv("VALID_USERNAME", "validuser@example.com")
-    VALID_PASSWORD = os.getenv("VALID_PASSWORD", "ValidPass123!")
+    VALID_USERNAME = Setting("validuser@example.com")
+    VALID_PASSWORD = Setting("ValidPass123!", secret=True)
     
     # Video recording
-    RECORD_VIDEO = False
-    VIDEO_PATH = "videos"
+    RECORD_VIDEO = Setting(False)
+    VIDEO_PATH = Setting("videos")
+    
+    # Authenticated storage state cache
+    AUTH_STATE_PATH = Setting(".auth")
+    AUTH_STATE_TTL = Setting(1800, minimum=0)  # Seconds before a cached login expires
+    
+    # Page readiness
+    READINESS_TIMEOUT = Setting(10000, minimum=1)  # Budget for all READY_WHEN conditions of a page
+    
+    # Login outcome detection
+    OUTCOME_TIMEOUT = Setting(5000, minimum=1)  # Max wait for a success or error after submit
+    AUTH_URL_PATTERN = Setting(r"cognito-idp\.|/oauth2/token|/auth/|/login")
+    
+    # Browser context pool (contexts are reset and reused between tests)
+    CONTEXT_POOL = Setting(True)
+    CONTEXT_POOL_SIZE = Setting(2, minimum=0)  # Warm contexts kept per worker
+    CONTEXT_POOL_MAX_USES = Setting(50, minimum=1)  # Recycle a context after this many tests
+    
+    # Browser resource watchdog (samples the browser around every sync test; 0 disables a limit)
+    RESOURCE_WATCHDOG = Setting(True)
+    RESOURCE_MAX_RSS_MB = Setting(2048, minimum=0)  # All browser processes; with SHARED_BROWSER the whole server
+    RESOURCE_MAX_JS_HEAP_MB = Setting(512, minimum=0)  # JS heap of the test's page (Chromium)
+    RESOURCE_MAX_DOM_NODES = Setting(100000, minimum=0)  # Live DOM nodes of the test's page
+    RESOURCE_MAX_PAGES = Setting(20, minimum=0)  # Pages open in the browser after a test
+    RESOURCE_TOP_N = Setting(5, minimum=1)  # Tests listed per metric in the end of session report
+    
+    # Self-healing locators (fallbacks in a page class's HEALING, see pages/healing.py)
+    LOCATOR_HEALING = Setting(True)
+    HEALING_TIMEOUT = Setting(2000, minimum=0)  # ms to wait for any candidate of an element before failing ("heal" action)
+    HEALING_INDEX_PATH = Setting(".cache/locator-index.json")  # Candidate that last found each element, tried first
+    
+    # Locator profiling (times the first resolution of each selector on every page)
+    LOCATOR_PROFILING = Setting(False)
+    SLOW_SELECTOR_MS = Setting(50.0, minimum=0)
+    BROAD_SELECTOR_MATCHES = Setting(3, minimum=1)  # More matches than this is flagged
+    
+    # Health check (runs once on the xdist controller; always on in CI)
+    HEALTH_CHECK = Setting(False)
+    HEALTH_ENDPOINTS = Setting("")  # Extra dependencies as "auth=https://...,assets=https://..."
+    HEALTH_TIMEOUT = Setting(10.0, minimum=0.1)
+    HEALTH_RETRIES = Setting(2, minimum=0)
+    HEALTH_BACKOFF = Setting(0.5, minimum=0)  # Seconds, doubled on every retry
+    HEALTH_CACHE_TTL = Setting(60, minimum=0)  # Seconds a verdict is reused across runs
+    
+    # Local mock login server (--target=local)
+    MOCK_AUTH_LATENCY_MS = Setting(0, minimum=0)
+    MOCK_PAGE_LATENCY_MS = Setting(0, minimum=0)
+    
+    # Network routing (drops requests no assertion needs, caches static assets on disk); without it only tests
+    # with a network marker are routed, and never by the rules below when they measure the page (perf, visual)
+    NETWORK_ROUTING = Setting(False)
+    NETWORK_DENY_TYPES = Setting(["font", "image", "media"])
+    NETWORK_STUB_URLS = Setting([
+        "*google-analytics.com*", "*googletagmanager.com*", "*hotjar.com*", "*segment.io*", "*doubleclick.net*",
+        "*sentry.io*",
+    ])
+    NETWORK_CACHE_PATH = Setting(".cache/network")
+    NETWORK_CACHE_TTL = Setting(86400, minimum=0)  # Most seconds a cached asset is replayed (within its own max-age)
+    
+    # Streamed data-driven tests (@pytest.mark.data_source, utils/data_source.py)
+    DATA_SHARDS = Setting(8, minimum=0)  # Shard tests per data source; 0 makes one per xdist worker
+    DATA_BATCH_SIZE = Setting(25, minimum=1)  # Cases submitted back to back on one loaded page
+    SECURITY_PAYLOADS = Setting(500, minimum=0)  # Generated injection and fuzz cases of the security corpus
+    SECURITY_CORPUS_REMOTE = Setting(False)  # Also submit the corpus to the remote BASE_URL (lockouts, WAF bans)
+    
+    # Network condition profiles (utils/network_conditions.py; per test with @pytest.mark.network_profile)
+    NETWORK_PROFILE = Setting("")  # Applied to every test without a marker, e.g. 3g, slow-3g, high-latency, flaky-auth
+    
+    # Per-test step timeline (JSON lines per worker, summary at the end of the session)
+    TIMELINE = Setting(True)
+    TIMELINE_PATH = Setting("timelines")
+    TIMELINE_TOP_N = Setting(10, minimum=1)
+    
+    # Load-aware xdist scheduling (pytest -n auto --lpt)
+    LPT_SCHEDULING = Setting(False)
+    DURATIONS_PATH = Setting(".cache/durations.json")
+    DEFAULT_TEST_DURATION = Setting(5.0, minimum=0)  # Seconds assumed before any run is stored
+    
+    # Change-based test selection (pytest --changed-since=<git-ref>)
+    DEPENDENCY_MAP_PATH = Setting(".cache/test-deps.json")  # Page object symbols each test touched, from the last run
+    SELECTION_IGNORE = Setting(["*.md", "docs/*", "LICENSE*"])  # Changes that never select a test
+    SELECTION_FULL_RUN = Setting([
+        "conftest.py", "*/conftest.py", "pytest.ini", "requirements.txt", "config/*", "Dockerfile", ".github/*",
+    ])  # Shared files whose changes run the whole suite
+    
+    # Load generation (python -m utils.load_runner)
+    LOAD_USERS = Setting(10, minimum=1)
+    LOAD_RAMP_UP = Setting(10.0, minimum=0)  # Seconds to reach LOAD_USERS
+    LOAD_DURATION = Setting(60.0, minimum=0)  # Seconds to hold LOAD_USERS
+    LOAD_RESULTS_PATH = Setting("load-results")
+    
+    # Web vitals and navigation timing of page loads (always on for tests with a perf_budget marker)
+    WEB_VITALS = Setting(False)
+    WEB_VITALS_PATH = Setting("web-vitals")
+    WEB_VITALS_SLOWEST = Setting(5, minimum=0)  # Slowest resources kept per page load
+    
+    # Adaptive failure capture (a failed test is rerun once with tracing, video and HAR; kept if it fails again)
+    ADAPTIVE_CAPTURE = Setting(True)
+    
+    # Visual regression (baselines are committed; --update-baselines or VISUAL_UPDATE=true rewrites them)
+    VISUAL_BASELINE_PATH = Setting("baselines")
+    VISUAL_UPDATE = Setting(False)
+    VISUAL_RECORD_NEW = Setting(True)  # Record missing baselines instead of failing (off in the ci profile)
+    VISUAL_HASH_DISTANCE = Setting(0, minimum=-1)  # Perceptual hash bits allowed to differ before pixels are diffed; -1 always diffs
+    VISUAL_PIXEL_TOLERANCE = Setting(16, minimum=0)  # Channel difference still counted as the same pixel
+    VISUAL_MAX_DIFF_RATIO = Setting(0.001, minimum=0)  # Share of changed pixels that still matches
+    VISUAL_WORKERS = Setting(2, minimum=1)  # Diff processes per xdist worker
+
+
+def action_timeout(action: str, page_timeouts: dict = None) -> float:
+    """Timeout in ms for a page object action: the page's TIMEOUTS, then ACTION_TIMEOUTS, scaled by TIMEOUT_SCALE"""
+    base = (page_timeouts or {}).get(action) or Config.ACTION_TIMEOUTS.get(action)
+    if base is None:
+        base = {"navigate": Config.NAVIGATION_TIMEOUT, "heal": Config.HEALING_TIMEOUT}.get(action, Config.DEFAULT_TIMEOUT)
+    return base * Config.TIMEOUT_SCALE
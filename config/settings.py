@@ -0,0 +1,164 @@
+"""
+Lazy settings
+Building blocks of Config: every value is resolved on first use (environment
+variable, then the active profile, then the default), validated and cached for
+the rest of the process, so each xdist worker resolves it once
+"""
+import os
+from typing import Any, Callable, Dict, Optional, Sequence
+
+_UNSET = object()
+
+
+class ConfigError(ValueError):
+    """A config value from the environment or a profile is invalid"""
+
+
+def parse_bool(value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ("true", "1", "yes", "on"):
+        return True
+    if lowered in ("false", "0", "no", "off", ""):
+        return False
+    raise ValueError(f"expected true or false, got {value!r}")
+
+
+def parse_list(value: str) -> list:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_mapping(value: str) -> Dict[str, int]:
+    """'click=5000,navigate=20000' -> {'click': 5000, 'navigate': 20000}"""
+    mapping = {}
+    for item in parse_list(value):
+        name, sep, number = item.partition("=")
+        if not sep:
+            raise ValueError(f"expected name=value, got {item!r}")
+        mapping[name.strip()] = int(number)
+    return mapping
+
+
+# Parser for environment strings, picked from the type of the default
+PARSERS: Dict[type, Callable[[str], Any]] = {
+    bool: parse_bool, int: int, float: float, str: str, list: parse_list, dict: parse_mapping,
+}
+
+
+class Setting:
+    """One config value, declared as a Config class attribute
+
+    Resolved on first access from the environment variable of the same name (or env),
+    then the active profile (unless profiled is False), then default; choices and
+    minimum are checked for all three.
+    """
+
+    def __init__(self, default: Any, env: str = None, choices: Sequence = (), minimum: float = None,
+                 secret: bool = False, profiled: bool = True):
+        self.default = default
+        self.env = env
+        self.choices = tuple(choices)
+        self.minimum = minimum
+        self.secret = secret
+        self.profiled = profiled
+        self.name = None
+        self.owner = None
+        self._value = _UNSET
+        self.source = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.owner = owner
+        self.env = self.env or name
+
+    def __get__(self, instance, owner):
+        if self._value is _UNSET:
+            self._value = self.resolve()
+        return self._value
+
+    def resolve(self) -> Any:
+        raw = os.environ.get(self.env)
+        if raw is not None:
+            self.source = f"env {self.env}"
+            try:
+                value = PARSERS[type(self.default)](raw)
+            except (KeyError, ValueError) as e:
+                raise ConfigError(f"{self.env}={raw!r} is not a valid {self.name}: {e}") from None
+        elif self.profiled and self.name in self.owner.active_profile():
+            self.source = f"profile {self.owner.PROFILE}"
+            value = self.owner.active_profile()[self.name]
+        else:
+            self.source = "default"
+            value = self.default
+        return self.validate(value)
+
+    def validate(self, value: Any) -> Any:
+        if self.default is not None and not isinstance(value, type(self.default)):
+            # Ints are fine where a float is expected
+            if not (isinstance(self.default, float) and isinstance(value, int) and not isinstance(value, bool)):
+                raise ConfigError(f"{self.name} must be {type(self.default).__name__}, got {value!r} ({self.source})")
+        if self.choices and value not in self.choices:
+            raise ConfigError(f"{self.name} must be one of {list(self.choices)}, got {value!r} ({self.source})")
+        if self.minimum is not None and value < self.minimum:
+            raise ConfigError(f"{self.name} must be at least {self.minimum}, got {value!r} ({self.source})")
+        return value
+
+    def override(self, value: Any):
+        self.source = "override"
+        self._value = value
+
+    def reset(self):
+        self._value = _UNSET
+        self.source = None
+
+    @property
+    def resolved(self) -> bool:
+        return self._value is not _UNSET
+
+
+class SettingsType(type):
+    """Metaclass of Config: assigning to a setting overrides its value for this process"""
+
+    def __setattr__(cls, name, value):
+        setting = cls.__dict__.get(name)
+        if isinstance(setting, Setting):
+            setting.override(value)
+        else:
+            super().__setattr__(name, value)
+
+    def settings(cls) -> Dict[str, Setting]:
+        return {name: value for name, value in vars(cls).items() if isinstance(value, Setting)}
+
+
+class Settings(metaclass=SettingsType):
+    """Base of Config; subclasses declare Setting attributes, PROFILES and a PROFILE setting"""
+
+    PROFILES: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def active_profile(cls) -> Dict[str, Any]:
+        return cls.PROFILES[cls.PROFILE]
+
+    @classmethod
+    def use_profile(cls, name: Optional[str]):
+        """Switch profile (e.g. from --profile); values resolved so far are resolved again"""
+        if name is None:
+            return
+        if name not in cls.PROFILES:
+            raise ConfigError(f"Unknown config profile {name!r}, use one of {sorted(cls.PROFILES)}")
+        for setting in type(cls).settings(cls).values():
+            setting.reset()
+        cls.PROFILE = name
+
+    @classmethod
+    def resolved(cls) -> Dict[str, Any]:
+        """Every value as this process sees it (secrets masked), e.g. to store with a report"""
+        values = {}
+        for name, setting in type(cls).settings(cls).items():
+            value = getattr(cls, name)
+            values[name] = "***" if setting.secret and value else value
+        return values
+
+    @classmethod
+    def sources(cls) -> Dict[str, str]:
+        """Where each resolved value came from: env, profile, default or override"""
+        return {name: setting.source for name, setting in type(cls).settings(cls).items() if setting.resolved}
@@ -2,35 +2,415 @@
 Pytest configuration and fixtures
 """
 import pytest
+import pytest_asyncio
+import asyncio
+import hashlib
+import html
+import inspect
+import json
 import os
-import requests
-from urllib.parse import urlparse
+import tempfile
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from _pytest.junitxml import xml_key
+from playwright.async_api import Browser as AsyncBrowser, Page as AsyncPage, async_playwright
 from playwright.sync_api import Page, BrowserContext
-from config.config import Config
-from datetime import datetime
+from playwright.sync_api import Error as PlaywrightError
+from slugify import slugify
+try:
+    import allure
+except ImportError:
+    allure = None
+from config.config import Config, action_timeout
+from config.settings import ConfigError
+from pages.healing import drifted, healing_index, healing_log, merge_healing
+from pages.locators import flag_selectors, merge_selector_stats, selector_stats
+from pages.outcome import drain_outcome_log
+from pages.readiness import drain_readiness_log
+from utils.artifacts import ArtifactWriter, ConsoleRecorder, enforce_retention
+from utils.auth_state import LoginService, StorageStateCache
+from utils.browser_server import BrowserServerFleet, SharedBrowser, default_launch_options
+from utils.capture import AdaptiveCapture, CaptureBundle, capture_bundle_key, capture_rerun_key, capture_verdicts
+from utils.context_pool import ContextPool, merge_reports
+from utils.data_source import DataCases
+from utils.network_conditions import AsyncNetworkConditions, NetworkConditions, get_profile, summarize_profiles
+from utils.resource_watchdog import RecyclableBrowser, ResourceLimits, ResourceWatchdog, summarize_resources
+from utils.network_router import AsyncNetworkRouter, HarCache, NetworkRouter, default_rules, rules_from_marker
+from utils.mock_server import MockAuthSettings, MockLoginServer
+from utils.health import SITE, HealthChecker, parse_endpoints, skip_reason, wait_for_verdict, write_verdict_when_done
+from utils.scheduler import DurationRecorder, DurationStore, LPTScheduling, split_group
+from utils.startup_bench import StartupTimer
+from utils.selection import DependencyMap, DependencyRecorder, Selection, select_tests
+from utils.timeline import (
+    TimelineWriter, clear_timelines, current_timeline, finish_timeline, load_timelines, start_timeline, summarize,
+)
+from utils.visual import BaselineStore, VisualChecker, VisualSettings, create_pool, visual_supported
+from utils.web_vitals import (
+    VitalsWriter, check_budget, clear_vitals, drain_metrics_log, force_collection, load_vitals, metrics_log,
+    summarize_vitals,
+)
+from utils.workers import collect_worker_output, gathered, is_ci, is_xdist_worker, publish
 
 
-def pytest_collection_modifyitems(config, items):
-    """Skip all tests if site is not accessible in CI environment"""
-    is_ci = os.getenv('CI') == 'true' or os.getenv('GITHUB_ACTIONS') == 'true'
-    
-    if is_ci:
-        parsed_url = urlparse(Config.BASE_URL or "")
-        if not parsed_url.scheme or not parsed_url.netloc:
-            skip_marker = pytest.mark.skip(reason="Test site is not accessible: BASE_URL is missing or invalid")
-            for item in items:
-                item.add_marker(skip_marker)
-            return
+health_future_key = pytest.StashKey[Future]()
+health_handoff_key = pytest.StashKey[Dict]()
+timeline_writer_key = pytest.StashKey[TimelineWriter]()
+duration_store_key = pytest.StashKey[DurationStore]()
+browser_fleets_key = pytest.StashKey[Dict[str, BrowserServerFleet]]()
+selection_key = pytest.StashKey[Selection]()
+
+
+def health_check_enabled() -> bool:
+    """The reachability probe runs in CI or when HEALTH_CHECK is switched on"""
+    return is_ci() or Config.HEALTH_CHECK
+
+
+def pytest_addoption(parser):
+    """Framework command line options"""
+    # Defaults of None are filled in from Config once the profile is known (see apply_profile)
+    parser.addoption(
+        "--profile",
+        action="store",
+        default=None,
+        choices=sorted(Config.PROFILES),
+        help="Config profile (default: CONFIG_PROFILE or 'default')",
+    )
+    parser.addoption(
+        "--target",
+        action="store",
+        default=None,
+        choices=["local", "remote"],
+        help="Run against the remote BASE_URL or a bundled local mock login server",
+    )
+    parser.addoption(
+        "--lpt",
+        action="store_true",
+        default=None,
+        help="With -n, hand tests to xdist workers longest first, using durations from previous runs",
+    )
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        default=None,
+        help="Record new and replace mismatching visual baselines instead of failing",
+    )
+    parser.addoption(
+        "--changed-since",
+        action="store",
+        default=None,
+        metavar="GIT_REF",
+        help="Only run tests whose page objects, selectors or test files changed since GIT_REF",
+    )
+
+
+def apply_profile(config):
+    """Select the config profile and fill in the options it provides defaults for"""
+    Config.use_profile(config.getoption("--profile"))
+    for name, value in (("target", Config.TARGET), ("lpt", Config.LPT_SCHEDULING),
+                        ("update_baselines", Config.VISUAL_UPDATE)):
+        if getattr(config.option, name) is None:
+            setattr(config.option, name, value)
+    # pytest-playwright's --browser and --browser-channel
+    if not config.option.browser:
+        config.option.browser = [Config.BROWSER]
+    if not config.option.browser_channel and Config.BROWSER_CHANNEL:
+        config.option.browser_channel = Config.BROWSER_CHANNEL
+
+
+def record_resolved_config(config):
+    """Store the effective config with the JUnit and Allure reports so runs can be compared"""
+    values = Config.resolved()
+    xml = config.stash.get(xml_key, None)
+    if xml is not None:
+        for name, value in values.items():
+            xml.add_global_property(f"config.{name}", json.dumps(value) if not isinstance(value, str) else value)
+    allure_dir = getattr(config.option, "allure_report_dir", None)
+    if allure_dir:
+        os.makedirs(allure_dir, exist_ok=True)
+        with open(os.path.join(allure_dir, "environment.properties"), "w", encoding="utf-8") as f:
+            for name, value in values.items():
+                f.write(f"config.{name}={value}\n")
+
+
+def start_browser_servers(config):
+    """Launch the shared browser servers on the xdist controller; workers launch their own if this fails"""
+    fleets = {}
+    try:
+        for browser_name in config.option.browser:
+            if external_endpoint(browser_name):
+                continue
+            fleets[browser_name] = BrowserServerFleet(
+                browser_name,
+                default_launch_options(browser_name, config.option.browser_channel),
+                count=Config.BROWSER_SERVERS,
+                assignment=Config.BROWSER_SERVER_ASSIGNMENT,
+                check_interval=Config.BROWSER_SERVER_CHECK_INTERVAL,
+            ).start()
+    except RuntimeError as e:
+        print(f"Shared browser servers unavailable, every worker launches its own browser: {e}")
+        for fleet in fleets.values():
+            fleet.stop()
+        return
+    config.stash[browser_fleets_key] = fleets
+
+
+def pytest_configure(config):
+    """Apply the config profile, set up the timeline writer, duration store and failure reruns, start the
+    shared browser servers and start the health check while tests are collected"""
+    try:
+        apply_profile(config)
+        if Config.NETWORK_PROFILE:
+            get_profile(Config.NETWORK_PROFILE)
+    except (ConfigError, ValueError) as e:
+        raise pytest.UsageError(str(e)) from None
+    if Config.ADAPTIVE_CAPTURE:
+        config.pluginmanager.register(AdaptiveCapture(), "adaptive-capture")
+    # Set by docker-entrypoint.sh and utils/startup_bench.py
+    if os.getenv("CONTAINER_STARTED_AT") and not is_xdist_worker(config):
+        config.pluginmanager.register(StartupTimer(config, float(os.environ["CONTAINER_STARTED_AT"])), "startup-timer")
+    if not is_xdist_worker(config):
+        store = DurationStore(Config.DURATIONS_PATH, Config.DEFAULT_TEST_DURATION)
+        config.stash[duration_store_key] = store
+        config.pluginmanager.register(DurationRecorder(store), "duration-recorder")
+    # Workers record what each test touched, the controller keeps the map
+    dependency_map = None if is_xdist_worker(config) else DependencyMap(Config.DEPENDENCY_MAP_PATH)
+    config.pluginmanager.register(DependencyRecorder(dependency_map), "dependency-recorder")
+    if dependency_map is not None and config.getoption("--changed-since"):
+        try:
+            config.stash[selection_key] = select_tests(
+                config.getoption("--changed-since"),
+                str(config.rootpath),
+                dependency_map,
+                config.getini("python_files"),
+                ignore=Config.SELECTION_IGNORE,
+                full_run=Config.SELECTION_FULL_RUN,
+            )
+        except ValueError as e:
+            raise pytest.UsageError(f"--changed-since: {e}") from None
+    if not is_xdist_worker(config):
+        clear_vitals(Config.WEB_VITALS_PATH)
+    if Config.TIMELINE:
+        if not is_xdist_worker(config):
+            clear_timelines(Config.TIMELINE_PATH)
+        config.stash[timeline_writer_key] = TimelineWriter(Config.TIMELINE_PATH)
+    if Config.SHARED_BROWSER and not is_xdist_worker(config) and config.getoption("dist", "no") != "no":
+        start_browser_servers(config)
+    if is_xdist_worker(config) or not health_check_enabled():
+        return
+    if config.getoption("--target") == "local":
+        return
+    endpoints = {SITE: Config.BASE_URL, **parse_endpoints(Config.HEALTH_ENDPOINTS)}
+    checker = HealthChecker(
+        endpoints,
+        timeout=Config.HEALTH_TIMEOUT,
+        retries=Config.HEALTH_RETRIES,
+        backoff=Config.HEALTH_BACKOFF,
+        cache=getattr(config, "cache", None),
+        ttl=Config.HEALTH_CACHE_TTL,
+    )
+    future = checker.start()
+    config.stash[health_future_key] = future
+    if config.getoption("dist", "no") != "no":
+        # Workers start without waiting for the probe and read its verdict from this file when collected
+        handoff = {
+            "path": os.path.join(tempfile.gettempdir(), f"health-{uuid.uuid4().hex}.json"),
+            "timeout": checker.max_duration() + 10,
+        }
+        write_verdict_when_done(future, handoff["path"])
+        config.stash[health_handoff_key] = handoff
+
+
+def pytest_unconfigure(config):
+    """Shut the shared browser servers down and remove the health verdict handed to workers"""
+    for fleet in config.stash.get(browser_fleets_key, {}).values():
+        fleet.stop()
+    handoff = config.stash.get(health_handoff_key, None)
+    if handoff is not None:
         try:
-            response = requests.get(Config.BASE_URL, timeout=10)
-            if response.status_code not in [200, 301, 302]:
-                skip_marker = pytest.mark.skip(reason=f"Test site {Config.BASE_URL} is not accessible (HTTP {response.status_code})")
-                for item in items:
-                    item.add_marker(skip_marker)
-        except Exception as e:
-            skip_marker = pytest.mark.skip(reason=f"Test site {Config.BASE_URL} is not accessible: {str(e)}")
-            for item in items:
-                item.add_marker(skip_marker)
+            os.remove(handoff["path"])
+        except OSError:
+            pass
+
+
+def pytest_sessionstart(session):
+    """Record the effective config once every report plugin is configured"""
+    if not is_xdist_worker(session.config):
+        try:
+            record_resolved_config(session.config)
+        except ConfigError as e:
+            raise pytest.UsageError(str(e)) from None
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, summary, postfix, session):
+    """Add the effective config to the pytest-html report"""
+    prefix.append(f"<h2>Config: {Config.PROFILE}</h2><pre>{html.escape(json.dumps(Config.resolved(), indent=2))}</pre>")
+
+
+def pytest_report_header(config):
+    """Show the config profile and where its values came from, and what --changed-since selected"""
+    sources = Config.sources().values()
+    changed = sum(1 for source in sources if source != "default")
+    lines = [f"config profile: {Config.PROFILE} ({changed} values from env or profile, {len(Config.settings())} total)"]
+    selection = config.stash.get(selection_key, None)
+    if selection is not None:
+        lines.append(selection.describe())
+    return lines
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """Tell each xdist worker where the health verdict will be written, and hand it the test selection and a
+    browser server endpoint"""
+    handoff = node.config.stash.get(health_handoff_key, None)
+    if handoff is not None:
+        node.workerinput["health"] = handoff
+    selection = node.config.stash.get(selection_key, None)
+    if selection is not None:
+        node.workerinput["selection"] = selection.to_dict()
+    fleets = node.config.stash.get(browser_fleets_key, None)
+    if fleets:
+        index = int(node.workerinput["workerid"].lstrip("gw"))
+        node.workerinput["browser_servers"] = {
+            name: fleet.endpoint_for(index, node.workerinput["workercount"]) for name, fleet in fleets.items()
+        }
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """Use the longest-first scheduler when --lpt is given"""
+    if config.getoption("--lpt"):
+        return LPTScheduling(config, log, config.stash[duration_store_key])
+    return None
+
+
+def affinity_group(item):
+    """Group name for tests that should share a worker, or None
+
+    Tests logging in as the same user or asking for the same context args reuse one
+    cached login and one pooled context when they run on the same worker.
+    """
+    marker = item.get_closest_marker("xdist_group")
+    if marker:
+        return marker.args[0] if marker.args else marker.kwargs.get("name", "default")
+    args_marker = item.get_closest_marker("browser_context_args")
+    auth_marker = item.get_closest_marker("authenticated")
+    if not args_marker and not auth_marker:
+        return None
+    username = password = None
+    if auth_marker:
+        username = auth_marker.kwargs.get("username", Config.VALID_USERNAME)
+        password = auth_marker.kwargs.get("password", Config.VALID_PASSWORD)
+    key = ContextPool.key_for(args_marker.kwargs if args_marker else {}, username, password)
+    return "context-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+
+
+def deselect_unchanged(config, items):
+    """Drop the tests --changed-since found unaffected by the diff"""
+    if is_xdist_worker(config):
+        data = config.workerinput.get("selection")
+        selection = Selection.from_dict(data) if data else None
+    else:
+        selection = config.stash.get(selection_key, None)
+    if selection is None:
+        return
+    deselected = [item for item in items if not selection.keeps(item.nodeid)]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if selection.keeps(item.nodeid)]
+
+
+def data_shards(config, marker) -> int:
+    """Shard tests of a data_source marker: its shards, else DATA_SHARDS, else one per xdist worker"""
+    shards = marker.kwargs.get("shards") or Config.DATA_SHARDS
+    if not shards and is_xdist_worker(config):
+        shards = config.workerinput["workercount"]
+    return shards or 1
+
+
+def pytest_generate_tests(metafunc):
+    """Run a test once per profile named in its network_profile marker, and once per shard of its data_source"""
+    marker = metafunc.definition.get_closest_marker("network_profile")
+    if marker is not None:
+        names = list(marker.args)
+        for name in names:
+            get_profile(name)
+        metafunc.parametrize("network_conditions", names, indirect=True, ids=names)
+    marker = metafunc.definition.get_closest_marker("data_source")
+    if marker is not None:
+        source, shards = marker.args[0], data_shards(metafunc.config, marker)
+        metafunc.parametrize(
+            "data_cases", [(source, shard, shards) for shard in range(shards)], indirect=True,
+            ids=[f"shard{shard + 1}of{shards}" for shard in range(shards)],
+        )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Apply --changed-since, tag affinity groups for the LPT scheduler and skip tests whose endpoints are
+    not accessible"""
+    deselect_unchanged(config, items)
+    if is_xdist_worker(config) and config.getoption("--lpt"):
+        for item in items:
+            group = affinity_group(item)
+            # Same node id suffix xdist uses for --dist=loadgroup, which may have added it already
+            if group and split_group(item.nodeid)[1] is None:
+                item._nodeid = f"{item.nodeid}@{group}"
+    if is_xdist_worker(config):
+        # The probe ran alongside worker startup and collection; wait for what is left of it
+        handoff = config.workerinput.get("health")
+        verdict = wait_for_verdict(handoff["path"], handoff["timeout"]) if handoff else None
+    else:
+        future = config.stash.get(health_future_key, None)
+        verdict = future.result() if future is not None else None
+    if not verdict:
+        return
+    for item in items:
+        required = [SITE]
+        for marker in item.iter_markers("requires_endpoint"):
+            required.extend(marker.args)
+        reason = skip_reason(verdict, required)
+        if reason:
+            item.add_marker(pytest.mark.skip(reason=reason))
+
+
+@pytest.fixture(scope="session")
+def local_server(pytestconfig):
+    """Mock login server of this worker when running with --target=local"""
+    if pytestconfig.getoption("--target") != "local":
+        yield None
+        return
+    settings = MockAuthSettings(
+        users={Config.VALID_USERNAME: Config.VALID_PASSWORD},
+        latency_ms=Config.MOCK_AUTH_LATENCY_MS,
+        page_latency_ms=Config.MOCK_PAGE_LATENCY_MS,
+    )
+    server = MockLoginServer(settings).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def target_url(local_server):
+    """Point Config.BASE_URL at the local server for the session when one is running"""
+    if local_server is None:
+        yield Config.BASE_URL
+        return
+    remote_url = Config.BASE_URL
+    Config.BASE_URL = local_server.url
+    yield local_server.url
+    Config.BASE_URL = remote_url
+
+
+@pytest.fixture(scope="function")
+def mock_auth(local_server):
+    """Tune the local auth responses for one test, e.g. mock_auth.configure(latency_ms=500)"""
+    if local_server is None:
+        pytest.skip("Needs the local mock server (--target=local)")
+    yield local_server
+    local_server.reset()
 
 
 @pytest.fixture(scope="session")
@@ -43,44 +423,686 @@ def browser_context_args(browser_context_args):
 
 
 @pytest.fixture(scope="session")
-def browser_type_launch_args(browser_type_launch_args):
+def browser_type_launch_args(browser_type_launch_args, browser_name):
     """Configure browser launch arguments"""
     # Force headless mode in CI environments
-    is_ci = os.getenv('CI') == 'true' or os.getenv('GITHUB_ACTIONS') == 'true'
-    headless = True if is_ci else Config.HEADLESS
+    headless = True if is_ci() else Config.HEADLESS
     
-    return {
+    launch_args = {
         **browser_type_launch_args,
         "headless": headless,
         "slow_mo": Config.SLOW_MO,
     }
+    if browser_name == "chromium" and Config.LAUNCH_FLAGS:
+        launch_args["args"] = [*browser_type_launch_args.get("args", []), *Config.LAUNCH_FLAGS]
+    return launch_args
+
+
+def external_endpoint(browser_name: str):
+    """BROWSER_SERVER_ENDPOINT, a server started before pytest (e.g. by docker-entrypoint.sh), serves BROWSER"""
+    return (Config.BROWSER_SERVER_ENDPOINT or None) if browser_name == Config.BROWSER else None
+
+
+def server_endpoint(config, browser_name: str):
+    """Websocket endpoint of the browser server this worker shares, or None to launch a browser"""
+    endpoint = getattr(config, "workerinput", {}).get("browser_servers", {}).get(browser_name)
+    return endpoint or external_endpoint(browser_name)
+
+
+@pytest.fixture(scope="session")
+def browser(launch_browser, browser_type, browser_name, pytestconfig):
+    """The worker's browser: a connection to a shared browser server when the controller runs them, else launched
+    (behind a RecyclableBrowser when the resource watchdog may relaunch it)"""
+    endpoint = server_endpoint(pytestconfig, browser_name)
+    if not endpoint:
+        browser = RecyclableBrowser(launch_browser) if Config.RESOURCE_WATCHDOG else launch_browser()
+    else:
+        browser = SharedBrowser(browser_type, endpoint, action_timeout("navigate"))
+    yield browser
+    browser.close()
+
+
+@pytest.fixture(scope="session")
+def login_service(browser, browser_context_args, target_url):
+    """Log in once per credential set and cache the storage state on disk"""
+    cache = StorageStateCache(Config.AUTH_STATE_PATH, Config.AUTH_STATE_TTL)
+    return LoginService(browser, browser_context_args, cache, target_url, action_timeout("default"))
+
+
+def configure_context(context: BrowserContext):
+    """Apply the framework timeouts to a new context"""
+    context.set_default_timeout(action_timeout("default"))
+    context.set_default_navigation_timeout(action_timeout("navigate"))
+
+
+@pytest.fixture(scope="session")
+def context_pool(browser, browser_context_args, pytestconfig):
+    """Warm browser contexts reused by the tests of this worker"""
+    # Videos are recorded per context, so they need a fresh context for every test
+    recording_video = pytestconfig.getoption("--video") != "off"
+    pool = ContextPool(
+        browser,
+        browser_context_args,
+        setup=configure_context,
+        max_idle=Config.CONTEXT_POOL_SIZE,
+        max_uses=Config.CONTEXT_POOL_MAX_USES,
+        enabled=Config.CONTEXT_POOL and not recording_video,
+    )
+    pool.warm(Config.CONTEXT_POOL_SIZE)
+    yield pool
+    pool.close()
+    if pool.enabled:
+        publish(pytestconfig, "context_pool", pool.report())
+
+
+@pytest.fixture(scope="session")
+def resource_watchdog(browser, context_pool, browser_name):
+    """Samples this worker's browser between tests and relaunches it over the RESOURCE_MAX_* limits"""
+    if not Config.RESOURCE_WATCHDOG:
+        return None
+    limits = ResourceLimits(
+        rss_mb=Config.RESOURCE_MAX_RSS_MB,
+        js_heap_mb=Config.RESOURCE_MAX_JS_HEAP_MB,
+        dom_nodes=Config.RESOURCE_MAX_DOM_NODES,
+        pages=Config.RESOURCE_MAX_PAGES,
+    )
+    # A shared server's RSS is every worker's; only the controller could act on it
+    return ResourceWatchdog(browser, browser_name, limits, pool=context_pool, shared=isinstance(browser, SharedBrowser))
 
 
 @pytest.fixture(scope="function")
-def context(context: BrowserContext):
-    """Configure context with timeouts"""
-    context.set_default_timeout(Config.DEFAULT_TIMEOUT)
-    context.set_default_navigation_timeout(Config.NAVIGATION_TIMEOUT)
-    yield context
+def resource_usage(resource_watchdog, request):
+    """Record what the test added to the browser once its context is released, recycling the browser if needed"""
+    yield resource_watchdog
+    if resource_watchdog is not None:
+        request.node.user_properties.append(("resources", resource_watchdog.finish_test()))
+
+
+@pytest.fixture(scope="session")
+def artifact_writer():
+    """Background writer for failure artifacts of this worker"""
+    writer = ArtifactWriter(
+        Config.SCREENSHOT_PATH,
+        image_format=Config.ARTIFACT_IMAGE_FORMAT,
+        quality=Config.ARTIFACT_IMAGE_QUALITY,
+        max_mb=Config.ARTIFACT_MAX_MB,
+    )
+    yield writer
+    writer.close()
+
+
+@pytest.fixture(scope="function")
+def data_cases(request):
+    """Cases of this test's shard of its data_source, streamed: for batch in data_cases.batches()"""
+    if not hasattr(request, "param"):
+        pytest.fail("data_cases needs a @pytest.mark.data_source(source) marker", pytrace=False)
+    source, shard, shards = request.param
+    cases = DataCases(source, shard, shards, batch_size=Config.DATA_BATCH_SIZE)
+    yield cases
+    request.node.user_properties.append(("data_cases", dict(cases.stats)))
 
 
 @pytest.fixture(scope="function", autouse=True)
-def screenshot_on_failure(request, page: Page):
-    """Take screenshot on test failure"""
+def network_conditions(request):
+    """Network profile of the test: its network_profile parameter, else NETWORK_PROFILE, else None"""
+    name = getattr(request, "param", None) or Config.NETWORK_PROFILE
+    if not name:
+        return None
+    request.node.user_properties.append(("network_profile", name))
+    return get_profile(name)
+
+
+def network_routing(request) -> Optional[Tuple[List, Optional[HarCache]]]:
+    """Rules and cache the test's contexts are routed through, None when the test isn't routed"""
+    network_marker = request.node.get_closest_marker("network")
+    network_args = network_marker.kwargs if network_marker else {}
+    # Perf budgets and baselines measure the page as users get it: fonts, images and third-party scripts included
+    measures_page = request.node.get_closest_marker("perf_budget") is not None or "visual" in request.fixturenames
+    default_routing = Config.NETWORK_ROUTING and not measures_page
+    if not network_args.get("enabled", network_marker is not None or default_routing):
+        return None
+    rules = rules_from_marker(network_args)
+    if default_routing:
+        rules += default_rules(Config.NETWORK_DENY_TYPES, Config.NETWORK_STUB_URLS)
+    cache = HarCache(Config.NETWORK_CACHE_PATH, Config.NETWORK_CACHE_TTL) if network_args.get("cache", True) else None
+    return rules, cache
+
+
+@pytest.fixture(scope="function")
+def pooled_context(context_pool, artifact_writer, network_conditions, resource_usage, browser_name, request,
+                   pytestconfig):
+    """Take a context from the pool, seeded with a cached login when requested"""
+    args_marker = request.node.get_closest_marker("browser_context_args")
+    extra_args = args_marker.kwargs if args_marker else {}
+    auth_marker = request.node.get_closest_marker("authenticated")
+    username = password = None
+    if auth_marker:
+        username = auth_marker.kwargs.get("username", Config.VALID_USERNAME)
+        password = auth_marker.kwargs.get("password", Config.VALID_PASSWORD)
+    # A rerun of a failed test records everything in a context of its own
+    capture = None
+    if request.node.stash.get(capture_rerun_key, False):
+        capture = CaptureBundle(artifact_writer.directory_for(request.node.nodeid), slugify(request.node.nodeid))
+        request.node.stash[capture_bundle_key] = capture
+        extra_args = {**extra_args, **capture.context_args()}
+    key = ContextPool.key_for(extra_args, username, password)
+    entry = context_pool.acquire(key, extra_args, reusable=capture is None)
+    if auth_marker:
+        request.getfixturevalue("login_service").apply(
+            entry.context, username, password, cookies_only=not entry.fresh
+        )
+    
+    routing = network_routing(request)
+    router = NetworkRouter(entry.context, *routing).start() if routing is not None else None
+    conditions = None
+    if network_conditions is not None:
+        conditions = NetworkConditions(
+            network_conditions, entry.context, entry.page, browser_name, Config.AUTH_URL_PATTERN,
+            seed=request.node.nodeid,
+        ).start()
+    if resource_usage is not None:
+        resource_usage.page_started(entry.page)
+    
+    tracing = pytestconfig.getoption("--tracing")
+    if capture is not None:
+        entry.context.tracing.start(**capture.tracing_args())
+    elif tracing != "off":
+        entry.context.tracing.start(title=slugify(request.node.nodeid), screenshots=True, snapshots=True, sources=True)
+    
+    yield entry
+    
+    failed = request.node.rep_call.failed if hasattr(request.node, "rep_call") else True
+    if capture is not None:
+        entry.context.tracing.stop(path=capture.trace_path())
+    elif tracing != "off":
+        if tracing == "on" or failed:
+            trace_path = os.path.join(tempfile.gettempdir(), f"trace-{uuid.uuid4().hex}.zip")
+            entry.context.tracing.stop(path=trace_path)
+            artifact_writer.add_file(trace_path, request.node.nodeid, "trace.zip")
+        else:
+            entry.context.tracing.stop()
+    if conditions is not None:
+        request.node.user_properties.append(("network_conditions", conditions.stop()))
+    if router is not None:
+        request.node.user_properties.append(("network", router.stop()))
+    if resource_usage is not None:
+        resource_usage.page_finished(entry.page)
+    video = entry.page.video
+    context_pool.release(entry, failed=failed)
+    if capture is not None:
+        # Kept or deleted by AdaptiveCapture once the rerun's verdict is known
+        return
+    video_option = pytestconfig.getoption("--video")
+    if video and (video_option == "on" or (failed and video_option == "retain-on-failure")):
+        try:
+            video_path = video.path()
+            artifact_writer.add_file(video_path, request.node.nodeid, os.path.basename(video_path))
+        except PlaywrightError:
+            pass
+
+
+@pytest.fixture(scope="function")
+def context(pooled_context) -> BrowserContext:
+    """Browser context for the test (reset and reused across tests)"""
+    return pooled_context.context
+
+
+@pytest.fixture(scope="function")
+def page(pooled_context) -> Page:
+    """Warm page of the pooled context"""
+    return pooled_context.page
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """One event loop for the session, so the async browser outlives a single test"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def async_browser(browser_name, browser_type_launch_args, pytestconfig) -> AsyncBrowser:
+    """Browser driven through playwright.async_api, shared by the async tests of this worker"""
+    endpoint = server_endpoint(pytestconfig, browser_name)
+    async with async_playwright() as playwright:
+        browser_type = getattr(playwright, browser_name)
+        if not endpoint:
+            browser = await browser_type.launch(**browser_type_launch_args)
+        else:
+            browser = await browser_type.connect(endpoint, timeout=action_timeout("navigate"))
+        yield browser
+        await browser.close()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def new_async_page(async_browser, browser_context_args, artifact_writer, network_conditions, browser_name,
+                         request):
+    """Open pages in isolated contexts of the async browser: page = await new_async_page()
+
+    Every context is closed after the test; on failure each page gets a screenshot.
+    """
+    contexts = []
+    conditions = []
+    routers = []
+    routing = network_routing(request)
+    capture = None
+    if request.node.stash.get(capture_rerun_key, False):
+        capture = CaptureBundle(artifact_writer.directory_for(request.node.nodeid), slugify(request.node.nodeid))
+        request.node.stash[capture_bundle_key] = capture
+
+    async def open_page(**extra_args) -> AsyncPage:
+        name = f"context-{len(contexts)}"
+        if capture is not None:
+            extra_args = {**extra_args, **capture.context_args(name)}
+        context = await async_browser.new_context(**{**browser_context_args, **extra_args})
+        configure_context(context)
+        if capture is not None:
+            await context.tracing.start(**capture.tracing_args())
+        contexts.append(context)
+        if routing is not None:
+            routers.append(await AsyncNetworkRouter(context, *routing).start())
+        page = await context.new_page()
+        if network_conditions is not None:
+            conditions.append(await AsyncNetworkConditions(
+                network_conditions, context, page, browser_name, Config.AUTH_URL_PATTERN,
+                seed=f"{request.node.nodeid}:{name}",
+            ).start())
+        return page
+
+    yield open_page
+
+    failed = request.node.rep_call.failed if hasattr(request.node, "rep_call") else True
+    if conditions:
+        stats = [await applied.stop() for applied in conditions]
+        request.node.user_properties.append(("network_conditions", {
+            **stats[0], **{key: sum(s[key] for s in stats) for key in ("auth_requests", "auth_delay_ms", "auth_faults")},
+        }))
+    if routers:
+        stats = [await router.stop() for router in routers]
+        request.node.user_properties.append(("network", {key: sum(s[key] for s in stats) for key in stats[0]}))
+    for index, context in enumerate(contexts):
+        if failed and Config.SCREENSHOT_ON_FAILURE:
+            for page in context.pages:
+                path = os.path.join(tempfile.gettempdir(), f"screenshot-{uuid.uuid4().hex}.png")
+                try:
+                    await page.screenshot(path=path)
+                    artifact_writer.add_file(path, request.node.nodeid, f"screenshot-{index}.png")
+                except PlaywrightError:
+                    pass
+        if capture is not None:
+            await context.tracing.stop(path=capture.trace_path(f"context-{index}"))
+        await context.close()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def async_page(new_async_page) -> AsyncPage:
+    """A single async page in its own context"""
+    return await new_async_page()
+
+
+@pytest.fixture(scope="session")
+def visual_pool():
+    """Processes that diff screenshots for this worker, started on first use"""
+    if not visual_supported():
+        pytest.skip("Visual checks need numpy and Pillow")
+    pool = create_pool(Config.VISUAL_WORKERS)
+    yield pool
+    pool.shutdown(cancel_futures=True)
+
+
+@pytest.fixture(scope="function")
+def visual(visual_pool, browser_name, artifact_writer, pytestconfig, request):
+    """Compare screenshots with baselines: visual.check(login_page, "login-form", mask=[...])
+
+    Comparisons run in the background and are verified once the test body passed.
+    """
+    update = pytestconfig.getoption("--update-baselines")
+    checker = VisualChecker(
+        BaselineStore(Config.VISUAL_BASELINE_PATH),
+        visual_pool,
+        browser_name,
+        os.path.join(artifact_writer.directory_for(request.node.nodeid), "visual"),
+        VisualSettings(
+            hash_distance=Config.VISUAL_HASH_DISTANCE,
+            pixel_tolerance=Config.VISUAL_PIXEL_TOLERANCE,
+            max_diff_ratio=Config.VISUAL_MAX_DIFF_RATIO,
+            update=update,
+        ),
+        # New baselines are recorded locally, but in CI (the ci profile) they must already be committed
+        record_new=update or Config.VISUAL_RECORD_NEW,
+    )
+    yield checker
+    checker.cancel()
+    if checker.results:
+        request.node.user_properties.append(("visual", [r.to_dict() for r in checker.results]))
+
+
+@pytest.fixture(scope="function", autouse=True)
+def timeline_attachment(request):
+    """Attach the step timeline of the test to the Allure results"""
+    yield
+    timeline = current_timeline()
+    if timeline is not None and allure is not None:
+        allure.attach(
+            json.dumps(timeline.to_dict(), indent=2),
+            name="timeline",
+            attachment_type=allure.attachment_type.JSON,
+        )
+
+
+@pytest.fixture(scope="function", autouse=True)
+def readiness_timings(request):
+    """Attach how long each page readiness check took to the test report"""
+    drain_readiness_log()
     yield
+    timings = drain_readiness_log()
+    if timings:
+        request.node.user_properties.append(("readiness", [t.to_dict() for t in timings]))
+        request.node.user_properties.append(("readiness_ms", round(sum(t.duration_ms for t in timings), 1)))
+
+
+@pytest.fixture(scope="function", autouse=True)
+def outcome_latencies(request):
+    """Attach the latency of every login outcome resolved in the test to the report"""
+    drain_outcome_log()
+    yield
+    outcomes = drain_outcome_log()
+    if outcomes:
+        request.node.user_properties.append(("outcome_ms", [outcome.latency_ms for outcome in outcomes]))
+
+
+@pytest.fixture(scope="function", autouse=True)
+def web_vitals_report(request):
+    """Store the page loads measured during the test (always measured with a perf_budget marker)"""
+    force_collection(request.node.get_closest_marker("perf_budget") is not None)
+    drain_metrics_log()
+    yield
+    force_collection(False)
+    metrics = drain_metrics_log()
+    if metrics:
+        request.node.user_properties.append(("web_vitals", [m.to_dict() for m in metrics]))
+        VitalsWriter(Config.WEB_VITALS_PATH).write(request.node.nodeid, metrics)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def failure_artifacts(request, artifact_writer):
+    """Capture screenshot, DOM and console log on test failure; files are written in the background"""
+    # Async tests drive their own pages (see new_async_page), tests without a page have nothing to capture
+    if inspect.iscoroutinefunction(request.function) or "pooled_context" not in request.fixturenames:
+        yield
+        return
+    page: Page = request.getfixturevalue("page")
+    console = ConsoleRecorder(page)
+    yield
+    console.stop()
     if request.node.rep_call.failed if hasattr(request.node, 'rep_call') else False:
         if Config.SCREENSHOT_ON_FAILURE:
-            os.makedirs(Config.SCREENSHOT_PATH, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_name = f"{request.node.name}_{timestamp}.png"
-            screenshot_path = os.path.join(Config.SCREENSHOT_PATH, screenshot_name)
-            page.screenshot(path=screenshot_path)
-            print(f"Screenshot saved: {screenshot_path}")
+            artifact_writer.capture(page, request.node.nodeid, console.lines)
+            print(f"Failure artifacts queued: {artifact_writer.directory_for(request.node.nodeid)}")
 
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
 def pytest_runtest_makereport(item, call):
-    """Hook to capture test results for screenshot fixture"""
+    """Hook to capture test results for the failure artifact and context fixtures"""
     outcome = yield
     rep = outcome.get_result()
     setattr(item, f"rep_{rep.when}", rep)
+    timeline = current_timeline()
+    if timeline is not None:
+        timeline.record("phase", rep.when, time.perf_counter() - rep.duration, rep.duration * 1000)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """Record a step timeline for every test and write it to this worker's JSON lines file"""
+    writer = item.config.stash.get(timeline_writer_key, None)
+    if writer is None:
+        yield
+        return
+    start_timeline(item.nodeid)
+    yield
+    timeline = finish_timeline()
+    if timeline is not None:
+        writer.write(timeline)
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Fail a passing test whose page loads went over its perf_budget, whose screenshots changed or
+    whose data cases failed"""
+    result = yield
+    checker = pyfuncitem.funcargs.get("visual")
+    if checker is not None:
+        checker.verify()
+    cases = pyfuncitem.funcargs.get("data_cases")
+    if cases is not None:
+        cases.verify()
+    marker = pyfuncitem.get_closest_marker("perf_budget")
+    if marker is not None:
+        if not metrics_log:
+            pytest.fail("perf_budget is set but no page load was measured")
+        violations = check_budget(metrics_log, marker.kwargs)
+        if violations:
+            pytest.fail("Performance budget exceeded:\n" + "\n".join(violations), pytrace=False)
+    return result
+
+
+# When the teardown of each set-up fixture started, until pytest_fixture_post_finalizer records it
+fixture_teardown_started = {}
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    """Time the setup of every fixture as a timeline step and mark where its teardown starts"""
+    timeline = current_timeline()
+    started = time.perf_counter()
+    yield
+    if timeline is not None:
+        timeline.record("fixture", fixturedef.argname, started,
+                        (time.perf_counter() - started) * 1000, scope=fixturedef.scope)
+    # Finalizers run last in, first out: this one runs after the teardown of the fixtures depending on
+    # this one, right before its own
+    fixturedef.addfinalizer(lambda: fixture_teardown_started.__setitem__(fixturedef, time.perf_counter()))
+
+
+def pytest_fixture_post_finalizer(fixturedef, request):
+    """Time the teardown of every fixture as a timeline step"""
+    started = fixture_teardown_started.pop(fixturedef, None)
+    timeline = current_timeline()
+    if started is not None and timeline is not None:
+        timeline.record("fixture_teardown", fixturedef.argname, started,
+                        (time.perf_counter() - started) * 1000, scope=fixturedef.scope)
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session):
+    """Publish per-process stats so the controller can report them, save the locator healing index and
+    cap the failure artifacts
+
+    Runs last, after the session fixtures (the artifact writers among them) are torn down.
+    """
+    if session.config.stash.get(selection_key, None) is not None and session.exitstatus == pytest.ExitCode.NO_TESTS_COLLECTED:
+        # Nothing the diff touches is tested, which is a pass for --changed-since
+        session.exitstatus = pytest.ExitCode.OK
+    if selector_stats.entries:
+        publish(session.config, "selectors", list(selector_stats.entries.values()))
+    if healing_log.entries:
+        publish(session.config, "healing", list(healing_log.entries.values()))
+    if not is_xdist_worker(session.config):
+        entries = merge_healing(gathered(session.config, "healing"))
+        if entries:
+            index = healing_index(Config.HEALING_INDEX_PATH)
+            index.update(entries)
+            index.save()
+        # Once, after every worker finished writing
+        enforce_retention(Config.SCREENSHOT_PATH, Config.ARTIFACT_MAX_MB * 1024 * 1024)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """Gather what each xdist worker published before it shut down"""
+    collect_worker_output(node.config, getattr(node, "workeroutput", {}))
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report session-wide framework stats"""
+    if is_xdist_worker(config):
+        return
+    report_context_pool(terminalreporter, config)
+    report_selectors(terminalreporter, config)
+    report_healing(terminalreporter, config)
+    report_timeline(terminalreporter, config)
+    report_web_vitals(terminalreporter, config)
+    report_capture(terminalreporter, config)
+    report_browser_servers(terminalreporter, config)
+    report_network_profiles(terminalreporter, config)
+    report_resources(terminalreporter, config)
+
+
+def report_context_pool(terminalreporter, config):
+    """Report context pool hit/miss stats for the whole session"""
+    reports = gathered(config, "context_pool")
+    if not reports:
+        return
+    stats = merge_reports(reports)
+    acquired = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / acquired if acquired else 0
+    terminalreporter.write_sep("-", "context pool")
+    terminalreporter.write_line(
+        f"hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {hit_rate:.0%}, "
+        f"recycled: {stats['recycled']}, reset time: {stats['reset_ms']:.0f}ms"
+    )
+    for reason, count in sorted(stats["recycle_reasons"].items()):
+        terminalreporter.write_line(f"  recycled ({reason}): {count}")
+
+
+def report_selectors(terminalreporter, config):
+    """List selectors that were slow to resolve or matched too many elements"""
+    reports = gathered(config, "selectors")
+    if not reports:
+        return
+    flagged = flag_selectors(merge_selector_stats(reports), Config.SLOW_SELECTOR_MS, Config.BROAD_SELECTOR_MATCHES)
+    terminalreporter.write_sep("-", "selector profile")
+    if not flagged:
+        terminalreporter.write_line("no slow or overly broad selectors")
+    for entry in flagged:
+        terminalreporter.write_line(
+            f"{entry['name']}: max {entry['max_ms']:.1f}ms, total {entry['total_ms']:.1f}ms "
+            f"over {entry['resolutions']} resolutions, up to {entry['max_matches']} matches"
+        )
+
+
+def report_healing(terminalreporter, config):
+    """List the elements whose primary selector drifted and what found them instead"""
+    entries = drifted(merge_healing(gathered(config, "healing")))
+    if not entries:
+        return
+    terminalreporter.write_sep("-", "healed locators")
+    for entry in entries:
+        found = ", ".join(f"{key} ({count}x)" for key, count in
+                          sorted(entry["healed"].items(), key=lambda item: item[1], reverse=True))
+        line = f"{entry['name']}: {entry['primary']!r} drifted"
+        if found:
+            line += f", healed by {found}"
+        if entry["missing"]:
+            line += f", not found {entry['missing']}x"
+        terminalreporter.write_line(f"{line} (slowest resolution {entry['max_ms']:.0f}ms)")
+    terminalreporter.write_line(f"healed candidates are tried first next run ({Config.HEALING_INDEX_PATH})")
+
+
+def report_timeline(terminalreporter, config):
+    """List the slowest steps, selectors and pages across all workers"""
+    if timeline_writer_key not in config.stash:
+        return
+    summary = summarize(load_timelines(Config.TIMELINE_PATH), Config.TIMELINE_TOP_N)
+    if not summary["steps"]:
+        return
+    with open(os.path.join(Config.TIMELINE_PATH, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    for group in ("steps", "selectors", "pages"):
+        if not summary[group]:
+            continue
+        terminalreporter.write_sep("-", f"slowest {group}")
+        for row in summary[group]:
+            terminalreporter.write_line(
+                f"{row['total_ms']:>10.1f}ms total {row['mean_ms']:>8.1f}ms mean "
+                f"{row['max_ms']:>8.1f}ms max {row['count']:>5}x  {row['name']}"
+            )
+
+
+def report_web_vitals(terminalreporter, config):
+    """p75 web vitals per URL across all workers"""
+    rows = summarize_vitals(load_vitals(Config.WEB_VITALS_PATH))
+    if not rows:
+        return
+    with open(os.path.join(Config.WEB_VITALS_PATH, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    terminalreporter.write_sep("-", "web vitals (p75)")
+    for row in rows:
+        cls = "n/a" if row["cls"] is None else f"{row['cls']:.3f}"
+        terminalreporter.write_line(
+            f"TTFB {_ms(row['ttfb_ms'])}, FCP {_ms(row['fcp_ms'])}, LCP {_ms(row['lcp_ms'])}, CLS {cls}, "
+            f"TBT {_ms(row['total_blocking_ms'])} over {row['loads']} loads  {row['url']}"
+        )
+
+
+def _ms(value) -> str:
+    return "n/a" if value is None else f"{value:.0f}ms"
+
+
+def report_capture(terminalreporter, config):
+    """List the failed tests that were rerun with recording: reproduced failures, flaky tests and skipped reruns"""
+    verdicts = capture_verdicts(terminalreporter.stats)
+    if not verdicts:
+        return
+    counts = Counter(verdict for verdict, _ in verdicts.values())
+    terminalreporter.write_sep("-", "failure reruns")
+    terminalreporter.write_line(", ".join(f"{verdict}: {count}" for verdict, count in sorted(counts.items())))
+    for nodeid, (verdict, first_failure) in sorted(verdicts.items()):
+        terminalreporter.write_line(f"  {verdict:<10} {nodeid}: {first_failure}")
+
+
+def report_browser_servers(terminalreporter, config):
+    """Show how many shared browser servers ran and how often each had to be restarted"""
+    fleets = config.stash.get(browser_fleets_key, {})
+    if not fleets:
+        return
+    terminalreporter.write_sep("-", "browser servers")
+    for browser_name, fleet in fleets.items():
+        report = fleet.report()
+        restarts = ", ".join(f"{name}: {count}" for name, count in report["restarts"].items())
+        terminalreporter.write_line(f"{browser_name}: {report['servers']} servers, restarts ({restarts})")
+
+
+def report_network_profiles(terminalreporter, config):
+    """Compare pass rate, page readiness and login outcome latency across network profiles"""
+    summaries = summarize_profiles(terminalreporter.stats)
+    if not summaries:
+        return
+    terminalreporter.write_sep("-", "network profiles")
+    for summary in summaries:
+        terminalreporter.write_line(
+            f"{summary.profile:<14} {summary.passed}/{summary.tests} passed, "
+            f"readiness p50 {_ms(summary.readiness_p50_ms)} p95 {_ms(summary.readiness_p95_ms)}, "
+            f"login outcome p50 {_ms(summary.outcome_p50_ms)} p95 {_ms(summary.outcome_p95_ms)}, "
+            f"auth faults injected: {summary.auth_faults}"
+        )
+
+
+def report_resources(terminalreporter, config):
+    """List the tests that grew the browser the most and the browser recycles"""
+    summary = summarize_resources(terminalreporter.stats, Config.RESOURCE_TOP_N)
+    if not summary:
+        return
+    terminalreporter.write_sep("-", "browser resources")
+    peak = "n/a" if summary["peak_rss_mb"] is None else f"{summary['peak_rss_mb']:.0f}MB"
+    terminalreporter.write_line(
+        f"{summary['tests']} tests sampled, peak browser RSS {peak}, recycled {len(summary['recycled'])} times"
+    )
+    for nodeid, reason in summary["recycled"]:
+        terminalreporter.write_line(f"  recycled after {nodeid}: {reason}")
+    for name, unit in (("rss_mb_delta", "MB RSS"), ("js_heap_mb_delta", "MB JS heap"),
+                       ("dom_nodes_delta", " DOM nodes"), ("pages_delta", " pages")):
+        for value, nodeid in summary[name]:
+            terminalreporter.write_line(f"  +{value:g}{unit}  {nodeid}")
@@ -1,15 +1,48 @@
 #!/bin/bash
+# Starts the slow parts of a test job side by side instead of one after the other:
+# the browser server launches while Python imports and pytest collects, and the
+# health check runs during collection (conftest.py). Dependencies are only installed
+# when the image doesn't have these requirements already.
 set -e
 
+export ENTRYPOINT_STARTED_AT="$(date +%s.%N)"
+# Set by utils/startup_bench.py to the time of `docker run`
+export CONTAINER_STARTED_AT="${CONTAINER_STARTED_AT:-$ENTRYPOINT_STARTED_AT}"
+export HEALTH_CHECK="${HEALTH_CHECK:-true}"
+
 # Ensure pip is installed
 if ! command -v pip3 &> /dev/null; then
     echo "Installing pip..."
     apt-get update -qq && apt-get install -y -qq python3-pip > /dev/null
 fi
 
-# Install dependencies (using --break-system-packages for Docker container)
-echo "Installing Python dependencies..."
-pip3 install --break-system-packages -q -r requirements.txt
+# Install dependencies (using --break-system-packages for Docker container) unless the image was built with them
+if ! sha256sum --check --status /opt/requirements.sha256 2> /dev/null; then
+    echo "Installing Python dependencies..."
+    pip3 install --break-system-packages -q -r requirements.txt
+fi
+
+# Launch the browser server now; its endpoint is fixed up front, so pytest can start right away and
+# connects once the first test needs the browser. EARLY_BROWSER_SERVER=false lets pytest launch browsers.
+# --exit-with $$: this shell becomes pytest (exec below), and the server stops with it, browser included.
+if [ "${EARLY_BROWSER_SERVER:-true}" = "true" ] && [ -z "$BROWSER_SERVER_ENDPOINT" ]; then
+    export BROWSER="${BROWSER:-chromium}"
+    port="${BROWSER_SERVER_PORT:-9323}"
+    ws_path="/$BROWSER-$(od -An -N6 -tx1 /dev/urandom | tr -d ' \n')"
+    python3 -m utils.browser_server --browser "$BROWSER" --port "$port" --ws-path "$ws_path" \
+        --exit-with $$ > /tmp/browser-server.log 2>&1 &
+    export BROWSER_SERVER_ENDPOINT="ws://127.0.0.1:$port$ws_path"
+fi
+
+# Virtual display for headed runs
+if command -v Xvfb &> /dev/null && [ -n "$DISPLAY" ]; then
+    Xvfb "$DISPLAY" -screen 0 1280x720x24 > /dev/null 2>&1 &
+fi
+
+# A command instead of pytest arguments (e.g. "xvfb-run pytest tests/test_login.py") runs as given
+if [ $# -gt 0 ] && [ "${1#-}" = "$1" ] && command -v "$1" &> /dev/null; then
+    exec "$@"
+fi
 
 # Run pytest with all provided arguments
 echo "Running tests..."
@@ -0,0 +1,90 @@
+"""
+Async base page
+Counterpart of BasePage on playwright.async_api, so one worker process can drive
+many pages concurrently from one event loop; READY_WHEN, NETWORK_RULES, timeouts and
+locators come from PageCore, the same as for BasePage
+"""
+import time
+from typing import List, Sequence
+
+from playwright.async_api import Locator
+from playwright.async_api import Error as PlaywrightError
+
+from pages.base_page import PageCore
+from pages.readiness import PageNotReadyError, ReadinessTiming
+from utils import web_vitals
+from utils.selection import record_selector
+
+
+class AsyncBasePage(PageCore):
+    PROFILE_LOCATORS = False
+
+    async def element(self, selector: str, timeout: float = None, required: bool = True) -> Locator:
+        """Locator for an element the page acts on, healed through HEALING, see BasePage.element"""
+        if self.healer is None or not self.healer.heals(selector):
+            return self.locator(selector)
+        record_selector(selector)
+        timeout = self.timeout("heal") if timeout is None else timeout
+        return await self.healer.resolve_async(self.page, selector, timeout, required) or self.locators.get(selector)
+
+    async def navigate_to(self, url: str):
+        """Navigate to a specific URL, wait until the page is ready and measure the load when enabled"""
+        measure = web_vitals.collecting()
+        if measure:
+            await web_vitals.install_async(self.page)
+        if not self.READY_WHEN:
+            await self.page.goto(url, timeout=self.timeout("navigate"))
+        else:
+            await self.page.goto(url, wait_until="commit", timeout=self.timeout("navigate"))
+            await self.wait_until_ready()
+        if measure:
+            await web_vitals.collect_async(self.page, type(self).__name__)
+
+    async def wait_until_ready(self, timeout: int = None) -> List[ReadinessTiming]:
+        """Wait for every declared readiness condition, recording how long each took"""
+        timeout, deadline = self._readiness_deadline(timeout)
+        timings = []
+        for condition in self.READY_WHEN:
+            remaining = max((deadline - time.monotonic()) * 1000, 1)
+            start = time.perf_counter()
+            try:
+                await condition.wait_async(self.page, remaining)
+                ready = True
+            except (PlaywrightError, PageNotReadyError):
+                ready = False
+            self._record_condition(timings, condition, start, ready, timeout)
+        self.readiness_timings.extend(timings)
+        return timings
+
+    async def get_title(self) -> str:
+        """Get the page title"""
+        return await self.page.title()
+
+    async def click(self, locator: str):
+        """Click on an element"""
+        await (await self.element(locator)).click(timeout=self.timeout("click"))
+
+    async def fill(self, locator: str, text: str):
+        """Fill input field with text"""
+        await (await self.element(locator)).fill(text, timeout=self.timeout("fill"))
+
+    async def get_text(self, locator: str) -> str:
+        """Get text content of an element"""
+        return await (await self.element(locator)).text_content(timeout=self.timeout("text"))
+
+    async def is_visible(self, locator: str) -> bool:
+        """Check if element is visible"""
+        return await (await self.element(locator, timeout=0, required=False)).is_visible()
+
+    async def wait_for_selector(self, locator: str, timeout: int = None):
+        """Wait for element to be visible"""
+        timeout = self.timeout("wait") if timeout is None else timeout
+        await (await self.element(locator, timeout)).first.wait_for(state="visible", timeout=timeout)
+
+    async def take_screenshot(self, filename: str = None, locator: str = None, mask: Sequence[str] = (),
+                              full_page: bool = False) -> bytes:
+        """Take a screenshot of the page or one element, with masked selectors painted over"""
+        options = {"path": filename, "mask": [self.locator(s) for s in mask], "animations": "disabled", "caret": "hide"}
+        if locator:
+            return await self.locator(locator).screenshot(**options)
+        return await self.page.screenshot(full_page=full_page, **options)
@@ -0,0 +1,104 @@
+"""
+Async Login Page Object
+LoginPage for playwright.async_api; locators, readiness and scenario bookkeeping come from LoginForm
+"""
+import time
+from typing import Callable, List, Optional, Sequence
+
+from config.config import Config
+from pages.async_base_page import AsyncBasePage
+from pages.login_page import CLEAR_STORAGE_SCRIPT, LoginForm
+from pages.outcome import AsyncOutcomeEngine, LoginOutcome
+from pages.readiness import PageNotReadyError
+from pages.scenarios import RESET_FORM_SCRIPT, CredentialCase, ScenarioResult
+from playwright.async_api import Page
+from playwright.async_api import Error as PlaywrightError
+
+
+class AsyncLoginPage(LoginForm, AsyncBasePage):
+
+    def __init__(self, page: Page):
+        super().__init__(page)
+        self.outcome = AsyncOutcomeEngine(page, **self._outcome_options())
+
+    async def navigate_to_login(self, base_url: str):
+        """Navigate to login page and wait until the form is usable"""
+        await self.navigate_to(base_url)
+
+    async def enter_username(self, username: str):
+        """Enter username in the username field"""
+        await self.fill(self.USERNAME_INPUT, username)
+
+    async def enter_password(self, password: str):
+        """Enter password in the password field"""
+        await self.fill(self.PASSWORD_INPUT, password)
+
+    async def click_login_button(self):
+        """Click the login button and start watching for the login outcome"""
+        await self.outcome.arm()
+        await self.click(self.LOGIN_BUTTON)
+
+    async def login(self, username: str, password: str):
+        """Complete login flow"""
+        await self.enter_username(username)
+        await self.enter_password(password)
+        await self.click_login_button()
+
+    async def get_error_message(self) -> str:
+        """Get error message text"""
+        await self.wait_for_selector(self.ERROR_MESSAGE, timeout=5000)
+        return await self.get_text(self.ERROR_MESSAGE)
+
+    async def wait_for_outcome(self, timeout: int = None) -> LoginOutcome:
+        """Wait for the outcome of the last submission (success, error or none)"""
+        return await self.outcome.wait(Config.OUTCOME_TIMEOUT if timeout is None else timeout)
+
+    async def is_error_displayed(self) -> bool:
+        """Check if the last submission ended with an error"""
+        return (await self.wait_for_outcome()).is_error
+
+    async def is_logged_in(self) -> bool:
+        """Check if the last submission logged the user in"""
+        return (await self.wait_for_outcome()).is_success
+
+    async def error_text(self, outcome: LoginOutcome) -> str:
+        """Error text shown for an error outcome, see LoginPage.error_text"""
+        if outcome.source != "network":
+            return outcome.detail
+        shown, timeout = self._shown_error(outcome)
+        try:
+            await shown.wait_for(timeout=timeout)
+            return (await shown.text_content() or "").strip()
+        except PlaywrightError:
+            return ""
+
+    async def run_scenarios(self, cases: Sequence[CredentialCase], base_url: str = None,
+                            on_result: Optional[Callable[[ScenarioResult], None]] = None) -> List[ScenarioResult]:
+        """Submit every case on one loaded page, resetting the form in between, see LoginPage.run_scenarios"""
+        base_url = base_url or Config.BASE_URL
+        results = []
+        loaded_url = None
+        for case in cases:
+            start = time.perf_counter()
+            reloaded = loaded_url is None or \
+                (await self.page.evaluate(RESET_FORM_SCRIPT, self._reset_args(loaded_url)))["reload"]
+            if reloaded:
+                await self.navigate_to_login(base_url)
+                loaded_url = self.page.url
+                state = await self.page.evaluate(RESET_FORM_SCRIPT, self._reset_args(loaded_url))
+                if state["reload"]:
+                    raise PageNotReadyError(f"Login form can't be reset after loading: {state['reason']}")
+            await self.enter_username(case.username)
+            await self.enter_password(case.password)
+            await self.click_login_button()
+            outcome = await self.wait_for_outcome()
+            error_text = await self.error_text(outcome) if outcome.is_error else ""
+            result = self._scenario_result(case, outcome, error_text, reloaded, start)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+            if outcome.is_success:
+                await self.page.context.clear_cookies()
+                await self.page.evaluate(CLEAR_STORAGE_SCRIPT)
+                loaded_url = None
+        return results
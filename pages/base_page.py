@@ -2,16 +2,119 @@
 Base Page class that all page objects will inherit from
 Contains common methods used across all pages
 """
-from playwright.sync_api import Page, expect
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from playwright.sync_api import Locator, expect
+from playwright.sync_api import Error as PlaywrightError
 
-class BasePage:
-    def __init__(self, page: Page):
+from config.config import Config, action_timeout
+from pages.healing import LocatorHealer, healing_index
+from pages.locators import LocatorRegistry
+from pages.readiness import PageNotReadyError, ReadinessCondition, ReadinessTiming, record_readiness
+from utils import web_vitals
+from utils.network_router import BaseNetworkRouter, RouteRule
+from utils.selection import record_page, record_selector, track_page_class
+from utils.timeline import instrument_page_class
+
+
+class PageCore:
+    """State shared by BasePage and AsyncBasePage (everything but the page calls)"""
+    
+    # Conditions that make the page usable; navigate_to waits for these instead of a load state
+    READY_WHEN: Sequence[ReadinessCondition] = ()
+    # Extra allow/deny/stub rules for requests this page makes (see utils/network_router.py)
+    NETWORK_RULES: Sequence[RouteRule] = ()
+    # Per-action timeouts in ms for this page (click, fill, text, wait, navigate), before TIMEOUT_SCALE
+    TIMEOUTS: Dict[str, int] = {}
+    # Profiling probes with a blocking count(), so only sync pages are profiled
+    PROFILE_LOCATORS = True
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every page object method is recorded as a dependency of the test and shows up in its timeline
+        track_page_class(cls)
+        instrument_page_class(cls)
+    
+    def __init__(self, page):
         self.page = page
+        self.readiness_timings: List[ReadinessTiming] = []
+        self.locators = LocatorRegistry(page, type(self), profile=Config.LOCATOR_PROFILING and self.PROFILE_LOCATORS)
+        self.healer = LocatorHealer(type(self), self.locators.names, healing_index(Config.HEALING_INDEX_PATH)) \
+            if Config.LOCATOR_HEALING else None
+        record_page(type(self))
+        router = BaseNetworkRouter.for_context(page.context)
+        if router is not None and self.NETWORK_RULES:
+            router.add_rules(self.NETWORK_RULES)
+    
+    def locator(self, selector: str):
+        """Get the cached Locator for a selector"""
+        record_selector(selector)
+        return self.locators.get(selector)
+    
+    def timeout(self, action: str) -> float:
+        """Timeout in ms for an action on this page (TIMEOUTS, then Config.ACTION_TIMEOUTS)"""
+        return action_timeout(action, self.TIMEOUTS)
+    
+    def get_url(self) -> str:
+        """Get current URL"""
+        return self.page.url
+    
+    def _readiness_deadline(self, timeout: Optional[int]) -> Tuple[int, float]:
+        timeout = Config.READINESS_TIMEOUT if timeout is None else timeout
+        return timeout, time.monotonic() + timeout / 1000
+    
+    def _record_condition(self, timings: List[ReadinessTiming], condition: ReadinessCondition, started: float,
+                          ready: bool, timeout: int):
+        """Record how long a readiness condition took; raise PageNotReadyError when it wasn't met"""
+        timings.append(record_readiness(type(self).__name__, condition, started, ready))
+        if not ready:
+            self.readiness_timings.extend(timings)
+            raise PageNotReadyError(f"{type(self).__name__} not ready after {timeout}ms: {condition.description}")
+
+
+class BasePage(PageCore):
+    
+    def element(self, selector: str, timeout: float = None, required: bool = True) -> Locator:
+        """Locator for an element the page acts on, healed through the page's HEALING fallbacks
+
+        Waits up to timeout ms (HEALING_TIMEOUT by default) for any candidate to attach;
+        without fallbacks this is locator(selector).
+        """
+        if self.healer is None or not self.healer.heals(selector):
+            return self.locator(selector)
+        record_selector(selector)
+        timeout = self.timeout("heal") if timeout is None else timeout
+        return self.healer.resolve(self.page, selector, timeout, required) or self.locators.get(selector)
     
     def navigate_to(self, url: str):
-        """Navigate to a specific URL"""
-        self.page.goto(url)
+        """Navigate to a specific URL, wait until the page is ready and measure the load when enabled"""
+        measure = web_vitals.collecting()
+        if measure:
+            web_vitals.install(self.page)
+        if not self.READY_WHEN:
+            self.page.goto(url, timeout=self.timeout("navigate"))
+        else:
+            self.page.goto(url, wait_until="commit", timeout=self.timeout("navigate"))
+            self.wait_until_ready()
+        if measure:
+            web_vitals.collect(self.page, type(self).__name__)
+    
+    def wait_until_ready(self, timeout: int = None) -> List[ReadinessTiming]:
+        """Wait for every declared readiness condition, recording how long each took"""
+        timeout, deadline = self._readiness_deadline(timeout)
+        timings = []
+        for condition in self.READY_WHEN:
+            remaining = max((deadline - time.monotonic()) * 1000, 1)
+            start = time.perf_counter()
+            try:
+                condition.wait(self.page, remaining)
+                ready = True
+            except (PlaywrightError, PageNotReadyError):
+                ready = False
+            self._record_condition(timings, condition, start, ready, timeout)
+        self.readiness_timings.extend(timings)
+        return timings
     
     def get_title(self) -> str:
         """Get the page title"""
@@ -19,28 +122,33 @@ class BasePage:
     
     def click(self, locator: str):
         """Click on an element"""
-        self.page.locator(locator).click()
+        self.element(locator).click(timeout=self.timeout("click"))
     
     def fill(self, locator: str, text: str):
         """Fill input field with text"""
-        self.page.locator(locator).fill(text)
+        self.element(locator).fill(text, timeout=self.timeout("fill"))
     
     def get_text(self, locator: str) -> str:
         """Get text content of an element"""
-        return self.page.locator(locator).text_content()
+        return self.element(locator).text_content(timeout=self.timeout("text"))
     
     def is_visible(self, locator: str) -> bool:
         """Check if element is visible"""
-        return self.page.locator(locator).is_visible()
+        return self.element(locator, timeout=0, required=False).is_visible()
     
-    def wait_for_selector(self, locator: str, timeout: int = 30000):
+    def wait_for_selector(self, locator: str, timeout: int = None):
         """Wait for element to be visible"""
-        self.page.wait_for_selector(locator, timeout=timeout)
+        timeout = self.timeout("wait") if timeout is None else timeout
+        self.element(locator, timeout).first.wait_for(state="visible", timeout=timeout)
     
-    def take_screenshot(self, filename: str):
-        """Take a screenshot"""
-        self.page.screenshot(path=filename)
-    
-    def get_url(self) -> str:
-        """Get current URL"""
-        return self.page.url
+    def take_screenshot(self, filename: str = None, locator: str = None, mask: Sequence[str] = (),
+                        full_page: bool = False) -> bytes:
+        """Take a screenshot of the page or one element, with masked selectors painted over"""
+        options = {"path": filename, "mask": [self.locator(s) for s in mask], "animations": "disabled", "caret": "hide"}
+        if locator:
+            return self.locator(locator).screenshot(**options)
+        return self.page.screenshot(full_page=full_page, **options)
+
+
+track_page_class(PageCore)
+instrument_page_class(PageCore)
@@ -0,0 +1,374 @@
+"""
+Self-healing locators
+A page class lists ranked fallback strategies (role, label, placeholder, test id,
+CSS) for its selectors in HEALING. When an element is used, every candidate is
+checked at once with a short budget, so a drifted selector recovers or fails in
+milliseconds instead of after the full action timeout; the candidate that matched
+is kept in an on-disk index and tried first by later runs
+"""
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from functools import reduce
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple, Union
+
+from playwright.sync_api import Locator, Page
+from playwright.sync_api import Error as PlaywrightError
+
+from pages.readiness import ReadinessCondition
+
+
+class ElementNotFoundError(Exception):
+    """Raised when none of an element's candidates matched within the healing budget"""
+
+
+class Candidate(ABC):
+    """One way of finding an element; build() gives its Locator on a sync or async page"""
+    key = "candidate"
+
+    @abstractmethod
+    def build(self, page):
+        """Locator of the element on the page"""
+
+    def __repr__(self) -> str:
+        return self.key
+
+
+class ByCss(Candidate):
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.key = f"css={selector}"
+
+    def build(self, page):
+        return page.locator(self.selector)
+
+
+class ByRole(Candidate):
+    """ARIA role with an optional accessible name (a substring unless exact, or a regex)"""
+
+    def __init__(self, role: str, name: Union[str, Pattern, None] = None, exact: bool = False):
+        self.role = role
+        self.name = name
+        self.exact = exact
+        shown = f"/{name.pattern}/" if isinstance(name, re.Pattern) else name
+        self.key = f"role={role}" + (f"[name={shown}]" if name is not None else "")
+
+    def build(self, page):
+        if self.name is None:
+            return page.get_by_role(self.role)
+        return page.get_by_role(self.role, name=self.name, exact=self.exact)
+
+
+class ByLabel(Candidate):
+    def __init__(self, text: str, exact: bool = False):
+        self.text = text
+        self.exact = exact
+        self.key = f"label={text}"
+
+    def build(self, page):
+        return page.get_by_label(self.text, exact=self.exact)
+
+
+class ByPlaceholder(Candidate):
+    def __init__(self, text: str, exact: bool = False):
+        self.text = text
+        self.exact = exact
+        self.key = f"placeholder={text}"
+
+    def build(self, page):
+        return page.get_by_placeholder(self.text, exact=self.exact)
+
+
+class ByTestId(Candidate):
+    def __init__(self, test_id: str):
+        self.test_id = test_id
+        self.key = f"test-id={test_id}"
+
+    def build(self, page):
+        return page.get_by_test_id(self.test_id)
+
+
+class ByText(Candidate):
+    def __init__(self, text: str, exact: bool = False):
+        self.text = text
+        self.exact = exact
+        self.key = f"text={text}"
+
+    def build(self, page):
+        return page.get_by_text(self.text, exact=self.exact)
+
+
+def declared_healing(page_class: type) -> Dict[str, Tuple[Candidate, ...]]:
+    """Fallbacks per selector from the HEALING of the class and its bases"""
+    healing = {}
+    for cls in reversed(page_class.__mro__):
+        healing.update(vars(cls).get("HEALING", {}))
+    return healing
+
+
+class HealingLog:
+    """How every healed element of this process resolved"""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict] = {}
+
+    def record(self, name: str, primary: str, winner: Optional[str], duration_ms: float):
+        entry = self.entries.setdefault(name, {
+            "name": name, "primary": primary, "resolutions": 0, "missing": 0, "healed": {}, "max_ms": 0.0,
+        })
+        entry["resolutions"] += 1
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        if winner is None:
+            entry["missing"] += 1
+        elif winner != ByCss(primary).key:
+            entry["healed"][winner] = entry["healed"].get(winner, 0) + 1
+
+
+def merge_healing(reports: List[List[Dict]]) -> List[Dict]:
+    """Combine the healing logs published by every worker"""
+    merged: Dict[str, Dict] = {}
+    for report in reports:
+        for entry in report:
+            target = merged.setdefault(entry["name"], {**entry, "resolutions": 0, "missing": 0, "healed": {},
+                                                       "max_ms": 0.0})
+            target["resolutions"] += entry["resolutions"]
+            target["missing"] += entry["missing"]
+            target["max_ms"] = max(target["max_ms"], entry["max_ms"])
+            for key, count in entry["healed"].items():
+                target["healed"][key] = target["healed"].get(key, 0) + count
+    return sorted(merged.values(), key=lambda entry: entry["name"])
+
+
+def drifted(entries: List[Dict]) -> List[Dict]:
+    """Elements whose primary selector was healed or that nothing matched"""
+    return [entry for entry in entries if entry["healed"] or entry["missing"]]
+
+
+def any_of(locators: Sequence):
+    """First element matching any of the Locators (sync or async)"""
+    return reduce(lambda a, b: a.or_(b), locators).first
+
+
+# Shared by every page object in this process, published at the end of the session
+healing_log = HealingLog()
+
+
+class HealingIndex:
+    """Candidate that last found each element, by element name, in a JSON file
+
+    An entry only applies while the primary selector is unchanged, so fixing a
+    selector in the page class drops its healed candidate.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def preferred(self, name: str, primary: str) -> Optional[str]:
+        entry = self.entries.get(name)
+        if entry is None or entry["primary"] != primary:
+            return None
+        return entry["winner"]
+
+    def forget(self, name: str):
+        """Go back to the primary selector first for an element"""
+        self.entries.pop(name, None)
+
+    def update(self, entries: List[Dict]):
+        """Remember the candidate that matched most often; the primary selector when it was never healed"""
+        for entry in entries:
+            if entry["healed"]:
+                winner = max(entry["healed"].items(), key=lambda item: item[1])[0]
+            elif entry["resolutions"] > entry["missing"]:
+                self.entries.pop(entry["name"], None)
+                continue
+            else:
+                # Nothing matched: keep what worked before
+                continue
+            self.entries[entry["name"]] = {"primary": entry["primary"], "winner": winner, "updated": time.time()}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+_indexes: Dict[str, HealingIndex] = {}
+
+
+def healing_index(path: str) -> HealingIndex:
+    """The index at path, read once per process"""
+    if path not in _indexes:
+        _indexes[path] = HealingIndex(path)
+    return _indexes[path]
+
+
+class LocatorHealer:
+    """Resolves the selectors of one page object through their ranked candidates
+
+    The index's candidate goes first, then the selector itself, then the HEALING
+    fallbacks in order. Resolutions are cached until the page URL changes.
+    """
+
+    def __init__(self, page_class: type, names: Dict[str, str], index: HealingIndex):
+        self.fallbacks = declared_healing(page_class)
+        self.names = names
+        self.index = index
+        self._cache: Dict[str, object] = {}
+        self._url = None
+
+    def heals(self, selector: str) -> bool:
+        return selector in self.fallbacks
+
+    def candidates(self, selector: str) -> List[Candidate]:
+        ranked = [ByCss(selector), *self.fallbacks.get(selector, ())]
+        preferred = self.index.preferred(self.names.get(selector, selector), selector)
+        ranked.sort(key=lambda candidate: candidate.key != preferred)
+        return ranked
+
+    def _cached(self, page, selector: str):
+        if page.url != self._url:
+            self._cache.clear()
+            self._url = page.url
+        return self._cache.get(selector)
+
+    def _finish(self, selector: str, winner: Optional[Candidate], locator, started: float, timeout: float,
+                required: bool, candidates: Sequence[Candidate]):
+        if winner is None and not required:
+            # e.g. is_visible(): absence is an answer, not drift
+            return None
+        name = self.names.get(selector, selector)
+        healing_log.record(name, selector, winner.key if winner else None,
+                           round((time.perf_counter() - started) * 1000, 1))
+        if winner is not None:
+            self._cache[selector] = locator
+            return locator
+        raise ElementNotFoundError(
+            f"{name}: none of {len(candidates)} candidates matched within {timeout:.0f}ms: "
+            + ", ".join(candidate.key for candidate in candidates)
+        )
+
+    def resolve(self, page: Page, selector: str, timeout: float, required: bool = True) -> Optional[Locator]:
+        """Locator of the best candidate that matches, waiting up to timeout ms for any of them"""
+        locator = self._cached(page, selector)
+        if locator is not None:
+            return locator
+        started = time.perf_counter()
+        candidates = self.candidates(selector)
+        locators = [candidate.build(page) for candidate in candidates]
+        winner, locator, valid = self._first_match(candidates, locators)
+        if winner is None and valid and timeout > 0:
+            try:
+                any_of(valid).wait_for(state="attached", timeout=timeout)
+            except PlaywrightError:
+                pass
+            winner, locator, _ = self._first_match(candidates, locators)
+        primary = self._outranked_primary(selector, candidates, winner)
+        if primary is not None and self._count(locators[primary]):
+            winner, locator = self._restore_primary(selector, candidates, locators, primary)
+        return self._finish(selector, winner, locator, started, timeout, required, candidates)
+
+    async def resolve_async(self, page, selector: str, timeout: float, required: bool = True):
+        """Same as resolve() for a page of playwright.async_api"""
+        locator = self._cached(page, selector)
+        if locator is not None:
+            return locator
+        started = time.perf_counter()
+        candidates = self.candidates(selector)
+        locators = [candidate.build(page) for candidate in candidates]
+        winner, locator, valid = await self._first_match_async(candidates, locators)
+        if winner is None and valid and timeout > 0:
+            try:
+                await any_of(valid).wait_for(state="attached", timeout=timeout)
+            except PlaywrightError:
+                pass
+            winner, locator, _ = await self._first_match_async(candidates, locators)
+        primary = self._outranked_primary(selector, candidates, winner)
+        if primary is not None and await self._count_async(locators[primary]):
+            winner, locator = self._restore_primary(selector, candidates, locators, primary)
+        return self._finish(selector, winner, locator, started, timeout, required, candidates)
+
+    @staticmethod
+    def _outranked_primary(selector: str, candidates: Sequence[Candidate], winner: Optional[Candidate]) -> Optional[int]:
+        """Position of the selector itself when the index's candidate won ahead of it, else None
+
+        The primary may match again (a transient heal, or the page was fixed); it is
+        then checked too, or the healed candidate would keep winning for good.
+        """
+        primary = ByCss(selector).key
+        if winner is None or winner is not candidates[0] or winner.key == primary:
+            return None
+        return next(i for i, candidate in enumerate(candidates) if candidate.key == primary)
+
+    def _restore_primary(self, selector: str, candidates, locators, position: int):
+        self.index.forget(self.names.get(selector, selector))
+        return candidates[position], locators[position]
+
+    @staticmethod
+    def _count(locator) -> int:
+        try:
+            return locator.count()
+        except PlaywrightError:
+            return 0
+
+    @staticmethod
+    async def _count_async(locator) -> int:
+        try:
+            return await locator.count()
+        except PlaywrightError:
+            return 0
+
+    @staticmethod
+    def _first_match(candidates, locators):
+        """The first candidate with a match and its Locator, and the Locators that can be waited for"""
+        valid = []
+        for candidate, locator in zip(candidates, locators):
+            try:
+                if locator.count():
+                    return candidate, locator, valid
+            except PlaywrightError:
+                # e.g. a CSS selector the browser can't parse
+                continue
+            valid.append(locator)
+        return None, None, valid
+
+    @staticmethod
+    async def _first_match_async(candidates, locators):
+        valid = []
+        for candidate, locator in zip(candidates, locators):
+            try:
+                if await locator.count():
+                    return candidate, locator, valid
+            except PlaywrightError:
+                continue
+            valid.append(locator)
+        return None, None, valid
+
+
+class HealingVisible(ReadinessCondition):
+    """Ready once the selector or any of its fallbacks is visible"""
+
+    def __init__(self, selector: str, fallbacks: Sequence[Candidate] = (), state: str = "visible"):
+        self.candidates = [ByCss(selector), *fallbacks]
+        self.state = state
+        self.description = f"{state}: {selector}" + (f" (or {len(fallbacks)} fallbacks)" if fallbacks else "")
+
+    def _locator(self, page):
+        return any_of([candidate.build(page) for candidate in self.candidates])
+
+    def wait(self, page: Page, timeout: float):
+        self._locator(page).wait_for(state=self.state, timeout=timeout)
+
+    async def wait_async(self, page, timeout: float):
+        await self._locator(page).wait_for(state=self.state, timeout=timeout)
@@ -0,0 +1,105 @@
+"""
+Locator registry
+Page classes declare their selectors once as class constants; the registry builds
+Locator objects lazily, caches them per page object until the page navigates and,
+when profiling is on, times how long each selector takes to resolve
+"""
+import time
+from typing import Dict, List
+
+from playwright.sync_api import Locator, Page
+
+
+def declared_locators(page_class: type) -> Dict[str, str]:
+    """Map every selector declared as an UPPER_CASE string constant to its name"""
+    names = {}
+    for cls in reversed(page_class.__mro__):
+        for name, value in vars(cls).items():
+            if name.isupper() and isinstance(value, str):
+                names[value] = f"{cls.__name__}.{name}"
+    return names
+
+
+class SelectorStats:
+    """Resolution timings of every selector profiled in this process"""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict] = {}
+
+    def record(self, name: str, selector: str, duration_ms: float, matches: int):
+        entry = self.entries.setdefault(selector, {
+            "name": name, "selector": selector, "resolutions": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "max_matches": 0,
+        })
+        entry["resolutions"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["max_matches"] = max(entry["max_matches"], matches)
+
+
+def merge_selector_stats(reports: List[List[Dict]]) -> List[Dict]:
+    """Combine the selector stats published by every worker"""
+    merged: Dict[str, Dict] = {}
+    for report in reports:
+        for entry in report:
+            target = merged.setdefault(entry["selector"], {**entry, "resolutions": 0, "total_ms": 0.0,
+                                                           "max_ms": 0.0, "max_matches": 0})
+            target["resolutions"] += entry["resolutions"]
+            target["total_ms"] += entry["total_ms"]
+            target["max_ms"] = max(target["max_ms"], entry["max_ms"])
+            target["max_matches"] = max(target["max_matches"], entry["max_matches"])
+    return list(merged.values())
+
+
+def flag_selectors(entries: List[Dict], slow_ms: float, broad_matches: int) -> List[Dict]:
+    """Slow or overly broad selectors, most expensive first"""
+    flagged = [
+        entry for entry in entries
+        if entry["max_ms"] >= slow_ms or entry["max_matches"] > broad_matches
+    ]
+    return sorted(flagged, key=lambda entry: entry["total_ms"], reverse=True)
+
+
+# Shared by every registry in this process, reported at the end of the session
+selector_stats = SelectorStats()
+
+
+class LocatorRegistry:
+    """Per page object cache of Locator objects, dropped whenever the page URL changes"""
+
+    def __init__(self, page: Page, page_class: type, profile: bool = False):
+        self.page = page
+        self.names = declared_locators(page_class)
+        self.profile = profile
+        self._cache: Dict[str, Locator] = {}
+        self._url = None
+
+    def get(self, selector: str) -> Locator:
+        """Get the cached Locator for a selector, building it on first use"""
+        if self.page.url != self._url:
+            self.invalidate()
+            self._url = self.page.url
+        locator = self._cache.get(selector)
+        if locator is None:
+            locator = self.page.locator(selector)
+            self._cache[selector] = locator
+            if self.profile:
+                self._measure(selector, locator)
+        return locator
+
+    def name_of(self, selector: str) -> str:
+        """Constant name a selector was declared under (the selector itself if undeclared)"""
+        return self.names.get(selector, selector)
+
+    def invalidate(self):
+        """Forget every cached Locator"""
+        self._cache.clear()
+
+    def _measure(self, selector: str, locator: Locator):
+        start = time.perf_counter()
+        try:
+            matches = locator.count()
+        except Exception:
+            matches = 0
+        duration_ms = (time.perf_counter() - start) * 1000
+        selector_stats.record(self.name_of(selector), selector, round(duration_ms, 2), matches)
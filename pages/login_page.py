@@ -2,36 +2,105 @@
 Login Page Object
 Contains locators and methods specific to the login page
 """
-from pages.base_page import BasePage
+import re
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from config.config import Config
+from pages.base_page import BasePage, PageCore
+from pages.healing import ByCss, ByLabel, ByRole, ByTestId, HealingVisible
+from pages.outcome import LoginOutcome, OutcomeEngine
+from pages.readiness import PageNotReadyError
+from pages.scenarios import RESET_FORM_SCRIPT, CredentialCase, ScenarioResult
 from playwright.sync_api import Page
+from playwright.sync_api import Error as PlaywrightError
+
+
+# Logs out the hard way (with clear_cookies()) after a scenario logged in
+CLEAR_STORAGE_SCRIPT = "() => { localStorage.clear(); sessionStorage.clear(); }"
 
 
-class LoginPage(BasePage):
+class LoginForm(PageCore):
+    """Locators, readiness and scenario bookkeeping shared by LoginPage and AsyncLoginPage"""
+    
     # Locators for Bio-Beat login page
     USERNAME_INPUT = "input[placeholder='Username']"
     PASSWORD_INPUT = "input[placeholder='Password']"
     LOGIN_BUTTON = "button[type='submit']:has-text('Login')"
-    ERROR_MESSAGE = "[role='alert'], .amplify-alert, .error, [class*='error'], [class*='alert']"
+    ERROR_MESSAGE = "[role='alert'], .amplify-alert, .Mui-error, .error, [class*='error'], [class*='alert']"
     SUCCESS_MESSAGE = ".success-message, [class*='success']"
     LOGOUT_BUTTON = "button:has-text('Logout'), button:has-text('Sign out')"
     FORGOT_PASSWORD_LINK = "button:has-text('Forgot your password?')"
     USERNAME_LABEL = "label:has-text('Username')"
     PASSWORD_LABEL = "label:has-text('Password')"
     
+    # Plain CSS + text pattern for the logout button, used by the outcome engine inside the page
+    LOGGED_IN_SELECTOR = "button"
+    LOGGED_IN_TEXT = "^(Logout|Sign out)$"
+    # Auth responses carrying tokens mean the login went through
+    AUTH_SUCCESS_BODY = "AuthenticationResult"
+    
+    # Ranked fallbacks for when a selector above stops matching (pages/healing.py)
+    HEALING = {
+        USERNAME_INPUT: (ByLabel("Username"), ByRole("textbox", name="Username"), ByTestId("username"),
+                         ByCss("input[name='username'], input[autocomplete='username']")),
+        PASSWORD_INPUT: (ByLabel("Password"), ByTestId("password"), ByCss("input[type='password']")),
+        LOGIN_BUTTON: (ByRole("button", name=re.compile(r"^\s*(log ?in|sign ?in)\s*$", re.IGNORECASE)),
+                       ByTestId("login-submit"), ByCss("form button[type='submit']")),
+        ERROR_MESSAGE: (ByRole("alert"),),
+        LOGOUT_BUTTON: (ByRole("button", name=re.compile(LOGGED_IN_TEXT, re.IGNORECASE)),
+                        ByRole("link", name=re.compile(LOGGED_IN_TEXT, re.IGNORECASE))),
+        FORGOT_PASSWORD_LINK: (ByRole("button", name="Forgot your password"), ByRole("link", name="Forgot your password")),
+    }
+    
+    # The form is usable once its inputs and submit button (or their fallbacks) are visible
+    READY_WHEN = (
+        HealingVisible(USERNAME_INPUT, HEALING[USERNAME_INPUT]),
+        HealingVisible(PASSWORD_INPUT, HEALING[PASSWORD_INPUT]),
+        HealingVisible(LOGIN_BUTTON, HEALING[LOGIN_BUTTON]),
+    )
+    
+    def _outcome_options(self) -> dict:
+        """Arguments of the page's outcome engine"""
+        return {
+            "error_selector": self.ERROR_MESSAGE,
+            "success_selector": self.LOGGED_IN_SELECTOR,
+            "success_text": self.LOGGED_IN_TEXT,
+            "auth_url_pattern": Config.AUTH_URL_PATTERN,
+            "success_body": self.AUTH_SUCCESS_BODY,
+        }
+    
+    def _shown_error(self, outcome: LoginOutcome) -> Tuple[object, float]:
+        """The first visible error element and how long (ms) of OUTCOME_TIMEOUT is left to wait for it"""
+        return (self.page.locator(f"{self.ERROR_MESSAGE} >> visible=true").first,
+                max(Config.OUTCOME_TIMEOUT - outcome.latency_ms, 1))
+    
+    def _reset_args(self, loaded_url: str) -> dict:
+        return {"url": loaded_url, "fields": [self.USERNAME_INPUT, self.PASSWORD_INPUT]}
+    
+    def _scenario_result(self, case: CredentialCase, outcome: LoginOutcome, error_text: str, reloaded: bool,
+                         started: float) -> ScenarioResult:
+        return ScenarioResult(
+            case=case,
+            outcome=outcome,
+            error_text=error_text,
+            url=self.page.url,
+            logged_in=outcome.is_success,
+            reloaded=reloaded,
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+
+
+class LoginPage(LoginForm, BasePage):
+    
     def __init__(self, page: Page):
         super().__init__(page)
         self.page = page
+        self.outcome = OutcomeEngine(page, **self._outcome_options())
     
     def navigate_to_login(self, base_url: str):
-        """Navigate to login page"""
-        try:
-            self.navigate_to(base_url)
-            # Wait for page to be ready
-            self.page.wait_for_load_state("networkidle", timeout=10000)
-        except Exception as e:
-            print(f"Navigation warning: {e}")
-            # Try to continue anyway
-            pass
+        """Navigate to login page and wait until the form is usable"""
+        self.navigate_to(base_url)
     
     def enter_username(self, username: str):
         """Enter username in the username field"""
@@ -42,7 +111,8 @@ class LoginPage(BasePage):
         self.fill(self.PASSWORD_INPUT, password)
     
     def click_login_button(self):
-        """Click the login button"""
+        """Click the login button and start watching for the login outcome"""
+        self.outcome.arm()
         self.click(self.LOGIN_BUTTON)
     
     def login(self, username: str, password: str):
@@ -56,27 +126,65 @@ class LoginPage(BasePage):
         self.wait_for_selector(self.ERROR_MESSAGE, timeout=5000)
         return self.get_text(self.ERROR_MESSAGE)
     
+    def wait_for_outcome(self, timeout: int = None) -> LoginOutcome:
+        """Wait for the outcome of the last submission (success, error or none)"""
+        return self.outcome.wait(Config.OUTCOME_TIMEOUT if timeout is None else timeout)
+    
     def is_error_displayed(self) -> bool:
-        """Check if error message is visible"""
-        try:
-            # Wait for error to appear with multiple selectors
-            self.page.wait_for_selector(
-                ".Mui-error, [role='alert'], .error, [class*='error']",
-                timeout=3000,
-                state="visible"
-            )
-            return True
-        except:
-            # If timeout, check if any error elements exist
-            try:
-                error_elements = self.page.locator(".Mui-error, [role='alert'], .error, [class*='error']")
-                return error_elements.count() > 0
-            except:
-                return False
+        """Check if the last submission ended with an error"""
+        return self.wait_for_outcome().is_error
     
     def is_logged_in(self) -> bool:
-        """Check if user is logged in (logout button is visible)"""
+        """Check if the last submission logged the user in"""
+        return self.wait_for_outcome().is_success
+    
+    def error_text(self, outcome: LoginOutcome) -> str:
+        """Error text shown for an error outcome, waiting what is left of OUTCOME_TIMEOUT for it when the
+        outcome came from the auth response ("" if none shows up)"""
+        if outcome.source != "network":
+            return outcome.detail
+        shown, timeout = self._shown_error(outcome)
         try:
-            return self.is_visible(self.LOGOUT_BUTTON)
-        except:
-            return False
+            shown.wait_for(timeout=timeout)
+            return (shown.text_content() or "").strip()
+        except PlaywrightError:
+            return ""
+    
+    def run_scenarios(self, cases: Sequence[CredentialCase], base_url: str = None,
+                      on_result: Optional[Callable[[ScenarioResult], None]] = None) -> List[ScenarioResult]:
+        """Submit every case on one loaded page, resetting the form in between
+
+        The page is reloaded only when the form can't be reused (the app navigated or
+        the form went away) or after a case logged in, in which case cookies and
+        storage are cleared first. on_result is called with each result as soon as
+        it is known.
+        """
+        base_url = base_url or Config.BASE_URL
+        results = []
+        loaded_url = None
+        for case in cases:
+            start = time.perf_counter()
+            # One evaluate resets the form and tells whether it can be reused
+            reloaded = loaded_url is None or \
+                self.page.evaluate(RESET_FORM_SCRIPT, self._reset_args(loaded_url))["reload"]
+            if reloaded:
+                self.navigate_to_login(base_url)
+                loaded_url = self.page.url
+                state = self.page.evaluate(RESET_FORM_SCRIPT, self._reset_args(loaded_url))
+                if state["reload"]:
+                    raise PageNotReadyError(f"Login form can't be reset after loading: {state['reason']}")
+            self.enter_username(case.username)
+            self.enter_password(case.password)
+            self.click_login_button()
+            outcome = self.wait_for_outcome()
+            error_text = self.error_text(outcome) if outcome.is_error else ""
+            result = self._scenario_result(case, outcome, error_text, reloaded, start)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+            if outcome.is_success:
+                # Log out the hard way so the next case starts from the login form
+                self.page.context.clear_cookies()
+                self.page.evaluate(CLEAR_STORAGE_SCRIPT)
+                loaded_url = None
+        return results
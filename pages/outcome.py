@@ -0,0 +1,318 @@
+"""
+Login outcome engine
+Resolves a form submission to a success or error outcome as soon as one shows up,
+either in the DOM (a single MutationObserver) or on the wire (auth responses),
+instead of polling selectors with fixed timeouts
+"""
+import json
+import re
+import time
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+from weakref import WeakSet
+
+from playwright.sync_api import Page
+from playwright.sync_api import Error as PlaywrightError
+
+
+ENGINE_SCRIPT = """
+(config => {
+    if (window.__loginOutcome) return;
+    const authPattern = new RegExp(config.authPattern, 'i');
+    const successText = new RegExp(config.successText, 'i');
+    const state = { armed: false, result: null, seen: new Map(), waiters: [] };
+
+    const isVisible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const textOf = el => (el.textContent || '').trim();
+
+    const settle = (kind, source, detail) => {
+        if (!state.armed || state.result) return;
+        state.result = { kind, source, detail: String(detail || '').slice(0, 500) };
+        state.waiters.splice(0).forEach(resolve => resolve(state.result));
+    };
+
+    const matches = (selector, check) => {
+        for (const el of document.querySelectorAll(selector)) {
+            if (!isVisible(el) || !check(el)) continue;
+            if (state.seen.has(el) && state.seen.get(el) === textOf(el)) continue;
+            return el;
+        }
+        return null;
+    };
+
+    // Text rewritten inside an error that was already showing means the app rendered it again;
+    // attribute changes (e.g. a class toggled on a persistent error wrapper when the input blurs) don't count
+    const rewritesText = record => {
+        if (record.type === 'characterData') return record.oldValue !== record.target.data;
+        if (record.type !== 'childList') return false;
+        return [...record.addedNodes, ...record.removedNodes].some(node => (node.textContent || '').trim());
+    };
+    const rerendered = records => {
+        for (const record of records || []) {
+            if (!rewritesText(record)) continue;
+            for (const el of state.seen.keys()) {
+                if (el.contains(record.target) && isVisible(el)) return el;
+            }
+        }
+        return null;
+    };
+
+    const scan = records => {
+        if (!state.armed || state.result) return;
+        // Errors that went away count as new when they show up again
+        for (const el of [...state.seen.keys()]) {
+            if (!el.isConnected || !isVisible(el)) state.seen.delete(el);
+        }
+        const error = matches(config.errorSelector, () => true) || rerendered(records);
+        if (error) return settle('error', 'dom', textOf(error));
+        const success = matches(config.successSelector, el => successText.test(textOf(el)));
+        if (success) settle('success', 'dom', textOf(success));
+    };
+
+    const onAuthResponse = (url, status, body) => {
+        if (!authPattern.test(url)) return;
+        if (status >= 400) return settle('error', 'network', `HTTP ${status} ${url}`);
+        if (config.successBody && body && body.includes(config.successBody)) {
+            settle('success', 'network', `HTTP ${status} ${url}`);
+        }
+    };
+
+    const originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (...args) {
+            return originalFetch.apply(this, args).then(response => {
+                if (state.armed && authPattern.test(response.url)) {
+                    response.clone().text()
+                        .then(body => onAuthResponse(response.url, response.status, body))
+                        .catch(() => onAuthResponse(response.url, response.status, ''));
+                }
+                return response;
+            });
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        this.addEventListener('loadend', () => {
+            if (!state.armed) return;
+            const body = (this.responseType === '' || this.responseType === 'text') ? this.responseText : '';
+            onAuthResponse(this.responseURL, this.status, body);
+        });
+        return originalSend.apply(this, args);
+    };
+
+    document.addEventListener('invalid', event => {
+        settle('error', 'validation', event.target.validationMessage || event.target.name);
+    }, true);
+
+    const observer = new MutationObserver(scan);
+    const observe = () => observer.observe(document.documentElement, {
+        subtree: true, childList: true, attributes: true, characterData: true, characterDataOldValue: true,
+    });
+    if (document.documentElement) observe();
+    else document.addEventListener('DOMContentLoaded', observe);
+
+    window.__loginOutcome = {
+        arm(ignoreExisting) {
+            // Mutations made before arming (filling the form, a reset) are not the outcome
+            observer.takeRecords();
+            state.result = null;
+            state.seen = new Map();
+            if (ignoreExisting) {
+                for (const el of document.querySelectorAll(config.errorSelector)) {
+                    if (isVisible(el)) state.seen.set(el, textOf(el));
+                }
+            }
+            state.armed = true;
+            scan();
+        },
+        wait(timeout) {
+            if (state.result) return Promise.resolve(state.result);
+            return new Promise(resolve => {
+                state.waiters.push(resolve);
+                setTimeout(() => resolve(state.result || { kind: 'none', source: 'timeout', detail: '' }), timeout);
+            });
+        },
+    };
+})(%s)
+"""
+
+
+@dataclass
+class LoginOutcome:
+    """Classified result of a form submission"""
+    kind: str  # "success", "error" or "none" when nothing happened in time
+    source: str  # "dom", "network", "validation" or "timeout"
+    detail: str
+    latency_ms: float
+    response_status: Optional[int] = None
+
+    @property
+    def is_success(self) -> bool:
+        return self.kind == "success"
+
+    @property
+    def is_error(self) -> bool:
+        return self.kind == "error"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Outcomes resolved since the last drain, collected per test by conftest.py
+outcome_log: List[LoginOutcome] = []
+
+
+def drain_outcome_log() -> List[LoginOutcome]:
+    """Return and clear all recorded login outcomes"""
+    outcomes = list(outcome_log)
+    outcome_log.clear()
+    return outcomes
+
+
+class BaseOutcomeEngine:
+    """State shared by the sync and async outcome engines (everything but the page calls)"""
+
+    # Pages that already have the engine registered as an init script
+    _installed = WeakSet()
+
+    def __init__(self, page, error_selector: str, success_selector: str,
+                 success_text: str, auth_url_pattern: str, success_body: str = ""):
+        self.page = page
+        self.auth_url_pattern = re.compile(auth_url_pattern, re.IGNORECASE)
+        self.script = ENGINE_SCRIPT % json.dumps({
+            "errorSelector": error_selector,
+            "successSelector": success_selector,
+            "successText": success_text,
+            "authPattern": auth_url_pattern,
+            "successBody": success_body,
+        })
+        self.last_outcome: Optional[LoginOutcome] = None
+        self._armed_at: Optional[float] = None
+        self._response_status: Optional[int] = None
+        self._listening = False
+
+    def _start(self):
+        """Forget the previous outcome and start the latency clock"""
+        self.last_outcome = None
+        self._response_status = None
+        self._armed_at = time.perf_counter()
+
+    def _finish(self, result: dict) -> LoginOutcome:
+        """Turn the result reported by the page into the outcome of this submission"""
+        self.last_outcome = LoginOutcome(
+            kind=result["kind"],
+            source=result["source"],
+            detail=result["detail"],
+            latency_ms=round((time.perf_counter() - self._armed_at) * 1000, 1),
+            response_status=self._response_status,
+        )
+        self._armed_at = None
+        outcome_log.append(self.last_outcome)
+        return self.last_outcome
+
+    def _arm_expression(self) -> str:
+        """Function evaluated in the page to make sure the document runs the engine and arm it"""
+        return "ignore => {%s; window.__loginOutcome.arm(ignore); }" % self.script
+
+    def _on_response(self, response):
+        """Record the status of the first auth response seen on the wire"""
+        if self._response_status is None and self.auth_url_pattern.search(response.url) \
+                and response.request.resource_type in ("fetch", "xhr"):
+            self._response_status = response.status
+
+
+class OutcomeEngine(BaseOutcomeEngine):
+    """Waits for the outcome of a submission on one page"""
+
+    def __init__(self, page: Page, error_selector: str, success_selector: str,
+                 success_text: str, auth_url_pattern: str, success_body: str = ""):
+        super().__init__(page, error_selector, success_selector, success_text, auth_url_pattern, success_body)
+        self.install()
+
+    def install(self):
+        """Register the engine for every document the page loads from now on"""
+        if self.page in self._installed:
+            return
+        self.page.add_init_script(self.script)
+        self._installed.add(self.page)
+
+    def arm(self, ignore_existing: bool = True):
+        """Start watching for an outcome; call right before submitting"""
+        self._start()
+        if not self._listening:
+            self.page.on("response", self._on_response)
+            self._listening = True
+        self._arm_document(ignore_existing)
+
+    def wait(self, timeout: int) -> LoginOutcome:
+        """Block until a success or error outcome appears or the timeout passes"""
+        if self.last_outcome is not None:
+            return self.last_outcome
+        if self._armed_at is None:
+            self.arm(ignore_existing=False)
+        deadline = self._armed_at + timeout / 1000
+        result = None
+        while result is None:
+            remaining = max(int((deadline - time.perf_counter()) * 1000), 0)
+            try:
+                result = self.page.evaluate("t => window.__loginOutcome.wait(t)", remaining)
+            except PlaywrightError:
+                # The submission navigated away; watch the new document with what is left
+                if remaining == 0:
+                    result = {"kind": "none", "source": "timeout", "detail": ""}
+                    break
+                self.page.wait_for_load_state("domcontentloaded")
+                self._arm_document(ignore_existing=False)
+        if self._listening:
+            self.page.remove_listener("response", self._on_response)
+            self._listening = False
+        return self._finish(result)
+
+    def _arm_document(self, ignore_existing: bool):
+        self.page.evaluate(self._arm_expression(), ignore_existing)
+
+
+class AsyncOutcomeEngine(BaseOutcomeEngine):
+    """OutcomeEngine for a page of playwright.async_api"""
+
+    async def install(self):
+        """Register the engine for every document the page loads from now on"""
+        if self.page in self._installed:
+            return
+        await self.page.add_init_script(self.script)
+        self._installed.add(self.page)
+
+    async def arm(self, ignore_existing: bool = True):
+        """Start watching for an outcome; call right before submitting"""
+        await self.install()
+        self._start()
+        if not self._listening:
+            self.page.on("response", self._on_response)
+            self._listening = True
+        await self._arm_document(ignore_existing)
+
+    async def wait(self, timeout: int) -> LoginOutcome:
+        """Wait until a success or error outcome appears or the timeout passes"""
+        if self.last_outcome is not None:
+            return self.last_outcome
+        if self._armed_at is None:
+            await self.arm(ignore_existing=False)
+        deadline = self._armed_at + timeout / 1000
+        result = None
+        while result is None:
+            remaining = max(int((deadline - time.perf_counter()) * 1000), 0)
+            try:
+                result = await self.page.evaluate("t => window.__loginOutcome.wait(t)", remaining)
+            except PlaywrightError:
+                if remaining == 0:
+                    result = {"kind": "none", "source": "timeout", "detail": ""}
+                    break
+                await self.page.wait_for_load_state("domcontentloaded")
+                await self._arm_document(ignore_existing=False)
+        if self._listening:
+            self.page.remove_listener("response", self._on_response)
+            self._listening = False
+        return self._finish(result)
+
+    async def _arm_document(self, ignore_existing: bool):
+        await self.page.evaluate(self._arm_expression(), ignore_existing)
@@ -0,0 +1,138 @@
+"""
+Readiness conditions for page objects
+A page object declares what "ready" means for it (visible locators, URL patterns
+or custom predicates) and BasePage.navigate_to waits for exactly that
+"""
+import asyncio
+import inspect
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Pattern, Union
+
+from playwright.async_api import Page as AsyncPage
+from playwright.sync_api import Page
+
+
+class PageNotReadyError(Exception):
+    """Raised when a readiness condition is not met within its timeout"""
+
+
+@dataclass
+class ReadinessTiming:
+    """How long a single readiness condition took to be satisfied"""
+    page: str
+    condition: str
+    duration_ms: float
+    ready: bool
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Timings recorded since the last drain, collected per test by conftest.py
+readiness_log: List[ReadinessTiming] = []
+
+
+def record_readiness(page_name: str, condition: "ReadinessCondition", started: float, ready: bool) -> ReadinessTiming:
+    """Build the timing of one condition (started is a perf_counter value) and log it"""
+    timing = ReadinessTiming(
+        page=page_name,
+        condition=condition.description,
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        ready=ready,
+    )
+    readiness_log.append(timing)
+    return timing
+
+
+def drain_readiness_log() -> List[ReadinessTiming]:
+    """Return and clear all recorded readiness timings"""
+    timings = list(readiness_log)
+    readiness_log.clear()
+    return timings
+
+
+class ReadinessCondition(ABC):
+    """Base class for a condition a page must satisfy before it is usable"""
+    description = "condition"
+
+    @abstractmethod
+    def wait(self, page: Page, timeout: float):
+        """Block until the condition holds or raise on timeout"""
+
+    @abstractmethod
+    async def wait_async(self, page: AsyncPage, timeout: float):
+        """Same as wait() for a page of playwright.async_api"""
+
+    def __repr__(self) -> str:
+        return self.description
+
+
+class LocatorVisible(ReadinessCondition):
+    """Ready once the first element matching the selector reaches the given state"""
+
+    def __init__(self, selector: str, state: str = "visible"):
+        self.selector = selector
+        self.state = state
+        self.description = f"{state}: {selector}"
+
+    def wait(self, page: Page, timeout: float):
+        page.locator(self.selector).first.wait_for(state=self.state, timeout=timeout)
+
+    async def wait_async(self, page: AsyncPage, timeout: float):
+        await page.locator(self.selector).first.wait_for(state=self.state, timeout=timeout)
+
+
+class UrlMatches(ReadinessCondition):
+    """Ready once the page URL matches a glob string, regex or predicate"""
+
+    def __init__(self, pattern: Union[str, Pattern, Callable[[str], bool]]):
+        self.pattern = pattern
+        if isinstance(pattern, re.Pattern):
+            self.description = f"url: /{pattern.pattern}/"
+        else:
+            self.description = f"url: {getattr(pattern, '__name__', pattern)}"
+
+    def wait(self, page: Page, timeout: float):
+        page.wait_for_url(self.pattern, wait_until="commit", timeout=timeout)
+
+    async def wait_async(self, page: AsyncPage, timeout: float):
+        await page.wait_for_url(self.pattern, wait_until="commit", timeout=timeout)
+
+
+class Predicate(ReadinessCondition):
+    """Ready once a JavaScript expression is truthy or a Python callable returns True"""
+
+    POLL_INTERVAL = 50
+
+    def __init__(self, check: Union[str, Callable[[Page], bool]], description: str = None):
+        # With async pages the callable may also be a coroutine function
+        self.check = check
+        self.description = description or f"predicate: {getattr(check, '__name__', check)}"
+
+    def wait(self, page: Page, timeout: float):
+        if isinstance(self.check, str):
+            page.wait_for_function(self.check, timeout=timeout)
+            return
+        deadline = time.monotonic() + timeout / 1000
+        while not self.check(page):
+            if time.monotonic() >= deadline:
+                raise PageNotReadyError(f"{self.description} not met within {timeout:.0f}ms")
+            page.wait_for_timeout(self.POLL_INTERVAL)
+
+    async def wait_async(self, page: AsyncPage, timeout: float):
+        if isinstance(self.check, str):
+            await page.wait_for_function(self.check, timeout=timeout)
+            return
+        deadline = time.monotonic() + timeout / 1000
+        while True:
+            result = self.check(page)
+            if inspect.isawaitable(result):
+                result = await result
+            if result:
+                return
+            if time.monotonic() >= deadline:
+                raise PageNotReadyError(f"{self.description} not met within {timeout:.0f}ms")
+            await asyncio.sleep(self.POLL_INTERVAL / 1000)
@@ -0,0 +1,105 @@
+"""
+Form scenarios
+Credential cases run back to back on one loaded login page: the form is reset
+in the page between cases and the page is only reloaded when the app state changed
+"""
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+
+from pages.outcome import LoginOutcome
+
+
+# Runs in the page before each case: tells whether the form can be reused and clears it
+RESET_FORM_SCRIPT = """
+config => {
+    if (location.href !== config.url) return { reload: true, reason: `navigated to ${location.href}` };
+    const fields = config.fields.map(selector => document.querySelector(selector));
+    const usable = field => field && !field.disabled && !!(field.offsetWidth || field.offsetHeight);
+    if (!fields.every(usable)) return { reload: true, reason: 'form is not usable' };
+    // The native setter skips framework listeners; the next fill() sends the real input events
+    const setValue = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    fields.forEach(field => setValue.call(field, ''));
+    if (document.activeElement && document.activeElement !== document.body) document.activeElement.blur();
+    return { reload: false, reason: '' };
+}
+"""
+
+
+@dataclass(frozen=True)
+class CredentialCase:
+    """One username/password pair to submit"""
+    username: str
+    password: str
+    description: str = ""
+
+    @property
+    def id(self) -> str:
+        return self.description or f"{self.username}/{self.password}"
+
+
+@dataclass
+class ScenarioResult:
+    """What happened when one case was submitted"""
+    case: CredentialCase
+    outcome: LoginOutcome
+    error_text: str
+    url: str
+    logged_in: bool
+    reloaded: bool  # The page was (re)loaded before this case
+    duration_ms: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def scheduled_cases(request, cases: Iterable[CredentialCase], argname: str = "case") -> List[CredentialCase]:
+    """The cases that the parametrized tests of the requesting class will run in this process
+
+    Deselected cases (-k, -m, --changed-since) are left out. An xdist worker only
+    knows which tests it gets when the tests of an xdist_group are kept together
+    (--dist=loadgroup or --lpt); otherwise no case is known and each test runs its own.
+    """
+    config = request.config
+    if hasattr(config, "workerinput") and config.getoption("dist", "no") != "loadgroup" \
+            and not config.getoption("--lpt", False):
+        return []
+    collected = {
+        item.callspec.params[argname].id for item in request.session.items
+        if item.cls is request.cls and argname in getattr(getattr(item, "callspec", None), "params", {})
+    }
+    return [case for case in cases if case.id in collected]
+
+
+class ScenarioBatch:
+    """Runs its cases once, on the page of whichever test asks first, and hands each test its own result
+
+    Keep one batch per test class (a class-scoped fixture, built from scheduled_cases())
+    and parametrize the tests with the same cases, so every case still shows up as its
+    own pytest result.
+    """
+
+    def __init__(self, cases: Iterable[CredentialCase]):
+        self.cases: List[CredentialCase] = list(cases)
+        self.results: Dict[str, ScenarioResult] = {}
+        self.errors: Dict[str, Exception] = {}
+
+    def result(self, login_page, case: CredentialCase, base_url: Optional[str] = None) -> ScenarioResult:
+        """Result of one case; runs it, then every other case without a result yet, on login_page
+
+        An exception is raised in the test of the case it happened in; the cases after
+        it are left for their own tests.
+        """
+        if case.id not in self.results and case.id not in self.errors:
+            pending = [case] + [c for c in self.cases
+                                if c.id != case.id and c.id not in self.results and c.id not in self.errors]
+            try:
+                login_page.run_scenarios(pending, base_url, on_result=self._store)
+            except Exception as e:
+                failed = next(c for c in pending if c.id not in self.results)
+                self.errors[failed.id] = e
+        if case.id in self.errors:
+            raise self.errors[case.id]
+        return self.results[case.id]
+
+    def _store(self, result: ScenarioResult):
+        self.results[result.case.id] = result
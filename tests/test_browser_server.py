@@ -0,0 +1,72 @@
+"""
+Browser Server Tests
+Starts a stand-in for `playwright launch-server` that, like the real one, runs
+its work in a child process, and checks stop() leaves nothing running
+"""
+import sys
+
+import pytest
+
+from utils.browser_server import BrowserServer, group_running
+
+
+# Starts a child that outlives it unless the whole group is signalled, prints the endpoint, then waits
+SERVER = """
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+with open(sys.argv[1], "w") as f:
+    f.write(str(child.pid))
+print(sys.argv[2], flush=True)
+time.sleep(600)
+"""
+
+
+class StandInServer(BrowserServer):
+    def __init__(self, pid_file: str):
+        super().__init__("chromium", {})
+        self.pid_file = pid_file
+
+    def command(self):
+        return [sys.executable, "-c", SERVER, self.pid_file, self.address]
+
+    def child_pid(self) -> int:
+        with open(self.pid_file, encoding="utf-8") as f:
+            return int(f.read())
+
+
+def running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Reads processes from /proc")
+class TestBrowserServer:
+    """Processes a browser server leaves behind"""
+
+    def test_stop_ends_child_processes(self, tmp_path):
+        """Test stopping the server also ends the process its launcher started"""
+        server = StandInServer(str(tmp_path / "child.pid"))
+        assert server.start(timeout=10) == server.address
+        child, group = server.child_pid(), server._process.pid
+        assert running(child)
+        server.stop()
+        assert not running(child), "The launcher's child should not survive stop()"
+        assert not group_running(group)
+
+    def test_restart_ends_previous_processes(self, tmp_path):
+        """Test a restart after the launcher exited ends the child it left holding the port"""
+        server = StandInServer(str(tmp_path / "child.pid"))
+        server.start(timeout=10)
+        first_child = server.child_pid()
+        server._process.kill()
+        server._process.wait()
+        assert not server.alive() and running(first_child)
+        try:
+            server.start(timeout=10)
+            assert not running(first_child), "The previous child should be gone before the server starts again"
+        finally:
+            server.stop()
+        assert not running(server.child_pid())
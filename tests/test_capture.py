@@ -0,0 +1,102 @@
+"""
+Failure Rerun Tests
+Runs small test files through the AdaptiveCapture plugin and checks the verdict
+of each rerun and whether its recording is kept
+"""
+import os
+
+import pytest
+
+
+pytest_plugins = ("pytester",)
+
+CONFTEST = """
+import os
+import pytest
+from utils.capture import AdaptiveCapture, CaptureBundle, capture_bundle_key, capture_rerun_key
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(AdaptiveCapture(), "adaptive-capture")
+
+
+@pytest.fixture(autouse=True)
+def recording(request):
+    # Stands in for pooled_context: a rerun records into the test's capture folder
+    if request.node.stash.get(capture_rerun_key, False):
+        capture = CaptureBundle(str(request.config.rootpath / "artifacts" / request.node.name), request.node.name)
+        os.makedirs(capture.directory)
+        open(os.path.join(capture.directory, "trace.zip"), "w").close()
+        request.node.stash[capture_bundle_key] = capture
+"""
+
+TESTS = """
+import pytest
+
+attempts = {"reproduced": 0, "flaky": 0, "skipped": 0}
+
+
+def test_reproduced():
+    attempts["reproduced"] += 1
+    assert False, "always fails"
+
+
+def test_flaky():
+    attempts["flaky"] += 1
+    assert attempts["flaky"] > 1, "fails the first time only"
+
+
+def test_skipped():
+    attempts["skipped"] += 1
+    if attempts["skipped"] > 1:
+        pytest.skip("endpoint went down")
+    assert False, "fails, then skips"
+
+
+def test_passes():
+    pass
+"""
+
+
+@pytest.fixture
+def capture_run(pytester):
+    """Run the sample tests with failure reruns; (verdict per test, recording kept per test, run result)"""
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(test_sample=TESTS)
+    result = pytester.runpytest_inprocess("-p", "no:cacheprovider")
+    verdicts = {}
+    for report in result.reprec.getreports("pytest_runtest_logreport"):
+        verdict = dict(report.user_properties).get("capture")
+        if verdict:
+            verdicts[report.nodeid.split("::")[-1]] = verdict
+    kept = {name: os.path.isdir(pytester.path / "artifacts" / name / "capture") for name in ("test_reproduced", "test_flaky", "test_skipped")}
+    return verdicts, kept, result
+
+
+class TestAdaptiveCapture:
+    """Verdicts and recordings of failure reruns"""
+
+    def test_failure_that_fails_again_is_reproduced(self, capture_run):
+        """Test a rerun that fails again keeps its recording"""
+        verdicts, kept, _ = capture_run
+        assert verdicts["test_reproduced"] == "reproduced"
+        assert kept["test_reproduced"], "Recording of a reproduced failure should be kept"
+
+    def test_failure_that_passes_on_rerun_is_flaky(self, capture_run):
+        """Test a rerun that passes marks the test flaky and drops its recording"""
+        verdicts, kept, _ = capture_run
+        assert verdicts["test_flaky"] == "flaky"
+        assert not kept["test_flaky"], "Recording of a flaky test should be deleted"
+
+    def test_skipped_rerun_is_inconclusive(self, capture_run):
+        """Test a rerun that skips is neither reproduced nor flaky and drops its recording"""
+        verdicts, kept, _ = capture_run
+        assert verdicts["test_skipped"] == "inconclusive"
+        assert not kept["test_skipped"], "Recording of a skipped rerun should be deleted"
+
+    def test_only_failed_tests_are_rerun(self, capture_run):
+        """Test passing tests run once and the session reports the rerun outcomes"""
+        verdicts, _, result = capture_run
+        assert "test_passes" not in verdicts
+        # The first attempt of each failed test is reported as a rerun
+        assert result.parseoutcomes() == {"passed": 2, "failed": 1, "skipped": 1, "rerun": 3}
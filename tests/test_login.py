@@ -66,3 +66,31 @@ class TestLogin:
         
         # Verify user is logged in
         assert login_page.is_logged_in(), "User should be logged in successfully"
+
+
+# The valid credentials only exist on the local mock server
+@pytest.mark.skipif("config.getoption('--target') != 'local'", reason="Needs the local mock server (--target=local)")
+class TestAuthenticatedSession:
+    """Test cases starting from a cached login"""
+    
+    @pytest.mark.authenticated
+    def test_session_starts_logged_in(self, page):
+        """Test a seeded context opens the app already logged in"""
+        login_page = LoginPage(page)
+        page.goto(Config.BASE_URL)
+        
+        # The logout button replaces the login form
+        login_page.wait_for_selector(login_page.LOGOUT_BUTTON)
+        assert not login_page.is_visible(login_page.USERNAME_INPUT), "Login form should not be shown"
+    
+    @pytest.mark.authenticated
+    def test_logout_returns_to_login_form(self, page):
+        """Test logging out of a seeded session shows the login form again"""
+        login_page = LoginPage(page)
+        page.goto(Config.BASE_URL)
+        
+        login_page.click(login_page.LOGOUT_BUTTON)
+        
+        # Verify the form is usable again
+        login_page.wait_until_ready()
+        assert login_page.is_visible(login_page.USERNAME_INPUT), "Username field should be visible after logout"
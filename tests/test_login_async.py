@@ -0,0 +1,44 @@
+"""
+Async Login Tests
+Runs independent login scenarios concurrently, each in its own browser context
+"""
+import asyncio
+import pytest
+from pages.async_login_page import AsyncLoginPage
+from config.config import Config
+
+
+INVALID_CREDENTIALS = [
+    ("invalid@example.com", "WrongPass123"),
+    ("notanemail", "Password123"),
+    ("admin", "admin"),
+    ("admin' OR '1'='1", "Password123"),
+    ("<script>alert('XSS')</script>", "Password123"),
+]
+
+
+class TestLoginAsync:
+    """Login scenarios on the async page objects"""
+    
+    @pytest.mark.asyncio
+    async def test_login_page_ready(self, async_page):
+        """Test that the login form becomes usable"""
+        login_page = AsyncLoginPage(async_page)
+        await login_page.navigate_to_login(Config.BASE_URL)
+        
+        assert await login_page.is_visible(login_page.USERNAME_INPUT), "Username field should be visible"
+        assert await login_page.is_visible(login_page.LOGIN_BUTTON), "Login button should be visible"
+    
+    @pytest.mark.asyncio
+    async def test_invalid_credentials_concurrently(self, new_async_page):
+        """Test that every invalid credential pair is rejected, all pairs at once"""
+        async def attempt(username, password):
+            login_page = AsyncLoginPage(await new_async_page())
+            await login_page.navigate_to_login(Config.BASE_URL)
+            await login_page.login(username, password)
+            return username, await login_page.wait_for_outcome()
+        
+        results = await asyncio.gather(*(attempt(u, p) for u, p in INVALID_CREDENTIALS))
+        
+        logged_in = [username for username, outcome in results if outcome.is_success]
+        assert not logged_in, f"Should not log in with: {logged_in}"
@@ -2,9 +2,19 @@
 Example of additional test file
 You can create more test files following this pattern
 """
+import os
+
 import pytest
 from pages.login_page import LoginPage
 from config.config import Config
+from utils.data_source import ChainSource, GeneratorSource, JsonlSource, security_payloads
+
+
+# Curated payloads plus generated injection and fuzz cases, streamed in shards
+SECURITY_CORPUS = ChainSource(
+    JsonlSource(os.path.join(os.path.dirname(__file__), "data", "login_payloads.jsonl"), name="login_payloads"),
+    GeneratorSource("security_payloads", lambda: security_payloads(Config.SECURITY_PAYLOADS)),
+)
 
 
 class TestLoginSecurity:
@@ -33,6 +43,37 @@ class TestLoginSecurity:
         
         # Should show error, not execute script
         assert login_page.is_error_displayed(), "XSS should be prevented"
+    
+    @pytest.mark.security
+    @pytest.mark.slow
+    # Hundreds of hostile logins would lock accounts or get the runner banned on a shared remote site
+    @pytest.mark.skipif("config.getoption('--target') != 'local' and not Config.SECURITY_CORPUS_REMOTE",
+                        reason="Runs against the local mock server (--target=local) or with SECURITY_CORPUS_REMOTE=true")
+    @pytest.mark.data_source(SECURITY_CORPUS)
+    def test_injection_corpus_is_rejected(self, page, data_cases):
+        """Test no injection or fuzz payload of the corpus logs in"""
+        login_page = LoginPage(page)
+        
+        for batch in data_cases.batches():
+            for result in login_page.run_scenarios(batch, Config.BASE_URL):
+                data_cases.check(result.case, not result.logged_in, f"logged in: {result.outcome.detail}")
+
+
+class TestLoginNetworkConditions:
+    """Login flow on slow and lossy client networks"""
+    
+    @pytest.mark.slow
+    @pytest.mark.network_profile("3g", "high-latency", "flaky-auth")
+    def test_invalid_login_reports_error(self, page):
+        """Test invalid credentials still end in an error when the network is degraded"""
+        login_page = LoginPage(page)
+        login_page.navigate_to_login(Config.BASE_URL)
+        
+        login_page.login("invalid@example.com", "WrongPassword123!")
+        
+        # Slow links and delayed auth calls need more than the usual outcome budget
+        outcome = login_page.wait_for_outcome(timeout=Config.OUTCOME_TIMEOUT * 3)
+        assert outcome.is_error, f"Expected an error outcome, got {outcome.kind}: {outcome.detail}"
 
 
 class TestLoginUI:
@@ -48,6 +89,7 @@ class TestLoginUI:
         assert "bio" in title.lower() or "login" in title.lower(), f"Page title should contain 'Biobeat' or 'login', got: {title}"
     
     @pytest.mark.ui
+    @pytest.mark.perf_budget(lcp_ms=2500, cls=0.1)
     def test_login_page_elements_visible(self, page):
         """Test all login page elements are visible"""
         login_page = LoginPage(page)
@@ -57,3 +99,14 @@ class TestLoginUI:
         assert login_page.is_visible(login_page.USERNAME_INPUT), "Username field should be visible"
         assert login_page.is_visible(login_page.PASSWORD_INPUT), "Password field should be visible"
         assert login_page.is_visible(login_page.LOGIN_BUTTON), "Login button should be visible"
+    
+    @pytest.mark.ui
+    # Baselines are recorded from the local replica, stage content changes between deploys
+    @pytest.mark.skipif("config.getoption('--target') != 'local'", reason="Baselines are of the local mock server (--target=local)")
+    def test_login_page_matches_baseline(self, page, visual):
+        """Test the login page looks like its stored baseline"""
+        login_page = LoginPage(page)
+        login_page.navigate_to_login(Config.BASE_URL)
+        
+        # Alerts change text between runs, so they are painted over
+        visual.check(login_page, "login-page", mask=[login_page.ERROR_MESSAGE])
@@ -0,0 +1,52 @@
+"""
+Page Parity Tests
+Checks the async page objects offer everything their sync counterparts do, so a
+test behaves the same on either API (no browser needed)
+"""
+import inspect
+
+import pytest
+
+from pages.async_base_page import AsyncBasePage
+from pages.async_login_page import AsyncLoginPage
+from pages.base_page import BasePage
+from pages.login_page import LoginPage
+
+
+PAIRS = [(BasePage, AsyncBasePage), (LoginPage, AsyncLoginPage)]
+
+
+def public_methods(cls: type) -> dict:
+    return {name: member for name, member in inspect.getmembers(cls, inspect.isfunction) if not name.startswith("_")}
+
+
+def parameters(method) -> list:
+    # Annotations name the sync or async Playwright types, so only names and defaults are compared
+    return [(parameter.name, parameter.default) for parameter in inspect.signature(method).parameters.values()]
+
+
+def constants(cls: type) -> dict:
+    return {name: getattr(cls, name) for name in dir(cls) if name.isupper() and name != "PROFILE_LOCATORS"}
+
+
+@pytest.mark.parametrize("sync_cls, async_cls", PAIRS, ids=[pair[1].__name__ for pair in PAIRS])
+class TestPageParity:
+    """Members of the sync and async page objects"""
+
+    def test_same_methods(self, sync_cls, async_cls):
+        """Test every public method exists on both pages, with the same parameters"""
+        sync_methods, async_methods = public_methods(sync_cls), public_methods(async_cls)
+        assert sorted(sync_methods) == sorted(async_methods)
+        for name, method in sync_methods.items():
+            assert parameters(method) == parameters(async_methods[name]), f"Parameters of {name} differ"
+
+    def test_page_calls_are_awaitable(self, sync_cls, async_cls):
+        """Test the methods that are coroutines on the async page are the ones that aren't shared"""
+        for name, method in public_methods(async_cls).items():
+            shared = method is public_methods(sync_cls)[name]
+            assert shared != inspect.iscoroutinefunction(inspect.unwrap(method)), \
+                f"{async_cls.__name__}.{name} should be {'sync, it is shared' if shared else 'a coroutine'}"
+
+    def test_same_locators_and_rules(self, sync_cls, async_cls):
+        """Test locators, readiness, network rules and timeouts are the same"""
+        assert constants(sync_cls) == constants(async_cls)
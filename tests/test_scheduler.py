@@ -0,0 +1,35 @@
+"""
+Scheduler Tests
+Node ids tagged with affinity groups map back to the ids durations are stored under
+(no browser needed)
+"""
+import pytest
+
+from utils.scheduler import DurationStore, split_group
+
+
+class TestSplitGroup:
+    """Group suffixes of xdist node ids"""
+
+    @pytest.mark.parametrize("nodeid, expected", [
+        ("tests/test_login.py::TestLogin::test_valid", ("tests/test_login.py::TestLogin::test_valid", None)),
+        ("tests/test_login.py::test_valid@context-1a2b", ("tests/test_login.py::test_valid", "context-1a2b")),
+        ("tests/test_login.py::test_email[a@b.com]", ("tests/test_login.py::test_email[a@b.com]", None)),
+        ("tests/test_login.py::test_email[a@b.com]@users", ("tests/test_login.py::test_email[a@b.com]", "users")),
+        ("tests/team@x/test_login.py::test_valid", ("tests/team@x/test_login.py::test_valid", None)),
+    ])
+    def test_split(self, nodeid, expected):
+        """Test the group suffix is split off, and an '@' in a parameter id or path is left alone"""
+        assert split_group(nodeid) == expected
+
+    def test_every_suffix_is_stripped(self):
+        """Test a suffix added by --lpt on top of the one --dist=loadgroup added leaves the plain node id"""
+        assert split_group("tests/test_login.py::test_valid[chromium]@users@users") == \
+            ("tests/test_login.py::test_valid[chromium]", "users")
+
+    def test_durations_stored_under_plain_nodeid(self, tmp_path):
+        """Test durations of a doubly tagged test are found again by its plain node id"""
+        store = DurationStore(str(tmp_path / "durations.json"))
+        store.add("tests/test_login.py::test_valid@users@users", 2.0)
+        store.save()
+        assert DurationStore(str(tmp_path / "durations.json")).estimate("tests/test_login.py::test_valid@users") == 2.0
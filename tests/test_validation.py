@@ -1,10 +1,23 @@
-# """
-# Validation Tests for User and Password Fields
-# Tests specific to Bio-Beat login page validation
-# """
-# import pytest
-# from pages.login_page import LoginPage
-# from config.config import Config
+"""
+Validation Tests for User and Password Fields
+Tests specific to Bio-Beat login page validation
+"""
+import pytest
+from pages.login_page import LoginPage
+from pages.scenarios import CredentialCase, ScenarioBatch, scheduled_cases
+from config.config import Config
+
+
+INVALID_CREDENTIALS = [
+    CredentialCase("invalid@example.com", "WrongPass123", "Invalid username with valid password format"),
+    CredentialCase("validuser@example.com", "wrong", "Valid username format with invalid password"),
+    CredentialCase("notanemail", "Password123", "Username without @ symbol"),
+    CredentialCase("user@", "Password123", "Incomplete email address"),
+    CredentialCase("@example.com", "Password123", "Email without username part"),
+    CredentialCase("user name@example.com", "Password123", "Email with space in username"),
+    CredentialCase("admin", "admin", "Common default credentials"),
+    CredentialCase("test", "test", "Simple test credentials"),
+]
 
 
 # class TestLoginFieldValidation:
@@ -179,31 +192,25 @@
 #         assert login_page.is_visible(login_page.FORGOT_PASSWORD_LINK), "Forgot password link should be visible"
 
 
-# @pytest.mark.validation
-# class TestLoginWithInvalidCredentials:
-#     """Tests for various invalid credential scenarios"""
+@pytest.mark.validation
+class TestLoginWithInvalidCredentials:
+    """Tests for various invalid credential scenarios"""
     
-#     @pytest.mark.smoke
-#     @pytest.mark.parametrize("username,password,description", [
-#         ("invalid@example.com", "WrongPass123", "Invalid username with valid password format"),
-#         ("validuser@example.com", "wrong", "Valid username format with invalid password"),
-#         ("notanemail", "Password123", "Username without @ symbol"),
-#         ("user@", "Password123", "Incomplete email address"),
-#         ("@example.com", "Password123", "Email without username part"),
-#         ("user name@example.com", "Password123", "Email with space in username"),
-#         ("admin", "admin", "Common default credentials"),
-#         ("test", "test", "Simple test credentials"),
-#     ])
-#     def test_invalid_credentials_combinations(self, page, username, password, description):
-#         """Test login with various invalid credential combinations"""
-#         login_page = LoginPage(page)
-#         login_page.navigate_to_login(Config.BASE_URL)
-        
-#         login_page.login(username, password)
-        
-#         # Should show error or prevent login
-#         # Check that user is not logged in
-#         assert not login_page.is_logged_in(), f"Should not log in with: {description}"
+    @pytest.fixture(scope="class")
+    def invalid_credentials(self, request):
+        """The invalid credential cases this process runs, submitted back to back on one loaded page"""
+        return ScenarioBatch(scheduled_cases(request, INVALID_CREDENTIALS))
+    
+    @pytest.mark.smoke
+    # Keeps the matrix on one worker with --lpt or --dist=loadgroup; with plain -n every case runs on its own
+    @pytest.mark.xdist_group("invalid-credentials")
+    @pytest.mark.parametrize("case", INVALID_CREDENTIALS, ids=lambda case: case.description)
+    def test_invalid_credentials_combinations(self, page, invalid_credentials, case):
+        """Test login with various invalid credential combinations"""
+        result = invalid_credentials.result(LoginPage(page), case, Config.BASE_URL)
+        
+        # Check that user is not logged in
+        assert not result.logged_in, f"Should not log in with: {case.description}"
     
 #     @pytest.mark.validation
 #     def test_numeric_username(self, page):
@@ -0,0 +1 @@
+# Add init files to make packages importable
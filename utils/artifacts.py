@@ -0,0 +1,170 @@
+"""
+Failure artifact pipeline
+Captures what a failing test left on screen and hands the slow parts (encoding and
+disk writes) to a background writer thread; the size cap is enforced on the whole
+folder once per session, and on a worker's own folder only when that outgrows it
+"""
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Dict, List
+
+from playwright.sync_api import Page
+from playwright.sync_api import Error as PlaywrightError
+from slugify import slugify
+
+from utils.workers import worker_id
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, only needed for WebP output
+    Image = None
+
+
+def enforce_retention(root: str, max_bytes: int) -> int:
+    """Delete the oldest artifacts until the folder fits in the size cap; the size left"""
+    files = []
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return total
+    for _, size, path in sorted(files):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
+    _remove_empty_dirs(root)
+    return total
+
+
+def _remove_empty_dirs(root: str):
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        if dirpath != root and not dirnames and not filenames:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+
+class ArtifactWriter:
+    """Background queue that writes failure artifacts to per-worker folders"""
+
+    def __init__(self, root: str, image_format: str = "png", quality: int = 80, max_mb: int = 200):
+        self.root = root
+        self.directory = os.path.join(root, worker_id())
+        self.image_format = image_format
+        self.quality = quality
+        self.max_bytes = max_mb * 1024 * 1024
+        self.written: List[str] = []
+        # Size of this worker's folder, counted up as files are written instead of walking the folder each time
+        self.size = enforce_retention(self.directory, self.max_bytes)
+        self._dirs: Dict[str, str] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+        self._thread.start()
+        if image_format == "webp" and Image is None:
+            print("Pillow is not installed, failure screenshots are saved as PNG instead of WebP")
+            self.image_format = "png"
+
+    def directory_for(self, nodeid: str) -> str:
+        """Unique artifact folder for a test, stable for the whole test run"""
+        if nodeid not in self._dirs:
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            name = f"{slugify(nodeid)[:150]}_{stamp}_{os.getpid()}"
+            self._dirs[nodeid] = os.path.join(self.directory, name)
+        return self._dirs[nodeid]
+
+    def capture(self, page: Page, nodeid: str, console: List[str]):
+        """Grab screenshot, DOM and console of a failed test; only the browser calls block"""
+        directory = self.directory_for(nodeid)
+        try:
+            # JPEG is encoded by the browser, which is cheaper than PNG for full screens
+            if self.image_format == "jpeg":
+                shot = page.screenshot(type="jpeg", quality=self.quality, timeout=5000)
+            else:
+                shot = page.screenshot(type="png", timeout=5000)
+            self._queue.put(("image", os.path.join(directory, "screenshot"), shot))
+        except PlaywrightError as e:
+            print(f"Failure screenshot skipped: {e}")
+        try:
+            self._queue.put(("bytes", os.path.join(directory, "dom.html"), page.content().encode("utf-8")))
+        except PlaywrightError:
+            pass
+        self._queue.put(("bytes", os.path.join(directory, "console.log"), "\n".join(console).encode("utf-8")))
+
+    def add_file(self, source: str, nodeid: str, file_name: str):
+        """Move a file the browser already wrote (e.g. a trace) into the test's folder"""
+        self._queue.put(("move", os.path.join(self.directory_for(nodeid), file_name), source))
+
+    def close(self, timeout: float = 30):
+        """Flush everything queued and stop the writer"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            kind, path, payload = job
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if kind == "move":
+                    shutil.move(payload, path)
+                elif kind == "image":
+                    path = self._write_image(path, payload)
+                else:
+                    with open(path, "wb") as f:
+                        f.write(payload)
+                self.written.append(path)
+                self.size += os.path.getsize(path)
+                # Only this worker's folder: other workers may be writing to theirs
+                if self.size > self.max_bytes:
+                    self.size = enforce_retention(self.directory, self.max_bytes)
+            except OSError as e:
+                print(f"Could not save artifact {path}: {e}")
+
+    def _write_image(self, path: str, data: bytes) -> str:
+        if self.image_format == "webp":
+            path = f"{path}.webp"
+            Image.open(io.BytesIO(data)).save(path, "WEBP", quality=self.quality)
+            return path
+        path = f"{path}.{'jpg' if self.image_format == 'jpeg' else 'png'}"
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class ConsoleRecorder:
+    """Collects console messages and page errors of a page while a test runs"""
+
+    def __init__(self, page: Page):
+        self.page = page
+        self.lines: List[str] = []
+        page.on("console", self._on_console)
+        page.on("pageerror", self._on_page_error)
+
+    def stop(self):
+        """Detach from the page (pooled pages outlive the test)"""
+        self.page.remove_listener("console", self._on_console)
+        self.page.remove_listener("pageerror", self._on_page_error)
+
+    def _on_console(self, msg):
+        self.lines.append(f"[{msg.type}] {msg.text}")
+
+    def _on_page_error(self, error):
+        self.lines.append(f"[pageerror] {error}")
@@ -0,0 +1,137 @@
+"""
+Storage state cache
+Logs in once per credential set and keeps the Playwright storage state on disk
+so tests can start from an already authenticated context
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from playwright.sync_api import Browser, BrowserContext
+
+from pages.login_page import LoginPage
+from utils.workers import worker_id
+
+
+# Seeds localStorage for the origins saved in the storage state, once per tab
+SEED_LOCAL_STORAGE_SCRIPT = """
+(origins => {
+    const items = origins[window.location.origin];
+    if (!items || window.sessionStorage.getItem('__storage_state_seeded')) return;
+    for (const item of items) window.localStorage.setItem(item.name, item.value);
+    window.sessionStorage.setItem('__storage_state_seeded', '1');
+})(%s)
+"""
+
+
+class LoginFailedError(Exception):
+    """Raised when the UI login used to build a storage state does not succeed"""
+
+
+class StorageStateCache:
+    """On-disk cache of storage state files keyed by target and credentials"""
+
+    def __init__(self, directory: str, ttl: int):
+        self.directory = directory
+        self.ttl = ttl
+
+    def key(self, base_url: str, username: str, password: str) -> str:
+        """Build the cache key for a credential set"""
+        raw = f"{base_url}|{username}|{password}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    def path_for(self, key: str) -> str:
+        """Get the file path for a cache key"""
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Get the storage state path if it exists and has not expired"""
+        path = self.path_for(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+        if age > self.ttl:
+            self.invalidate(key)
+            return None
+        return path
+
+    def put(self, key: str, state: Dict) -> str:
+        """Save a storage state atomically and return its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        # Write to a worker specific temp file so parallel workers never read half a file
+        tmp_path = f"{path}.{worker_id()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def invalidate(self, key: str):
+        """Remove a cached storage state"""
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+
+class LoginService:
+    """Logs in through the UI once per credential set and seeds contexts from the cache"""
+
+    def __init__(self, browser: Browser, context_args: Dict, cache: StorageStateCache,
+                 base_url: str, timeout: int):
+        self.browser = browser
+        self.context_args = context_args
+        self.cache = cache
+        self.base_url = base_url
+        self.timeout = timeout
+        self._states: Dict[str, Dict] = {}
+
+    def storage_state_for(self, username: str, password: str) -> Dict:
+        """Get the storage state for a credential set, logging in only when needed"""
+        key = self.cache.key(self.base_url, username, password)
+        path = self.cache.get(key)
+        if path is not None and key in self._states:
+            return self._states[key]
+        if path is None:
+            path = self.cache.put(key, self._login(username, password))
+        with open(path, encoding="utf-8") as f:
+            self._states[key] = json.load(f)
+        return self._states[key]
+
+    def apply(self, context: BrowserContext, username: str, password: str, cookies_only: bool = False):
+        """Seed an existing context with the cached cookies and localStorage
+
+        A reused context already carries the localStorage init script, so only
+        its cookies need to be restored (cookies_only=True).
+        """
+        state = self.storage_state_for(username, password)
+        if state.get("cookies"):
+            context.add_cookies(state["cookies"])
+        if cookies_only:
+            return
+        origins = {
+            origin["origin"]: origin.get("localStorage", [])
+            for origin in state.get("origins", [])
+        }
+        if origins:
+            context.add_init_script(SEED_LOCAL_STORAGE_SCRIPT % json.dumps(origins))
+
+    def _login(self, username: str, password: str) -> Dict:
+        """Log in through the login form and capture the resulting storage state"""
+        context = self.browser.new_context(**self.context_args)
+        try:
+            context.set_default_timeout(self.timeout)
+            login_page = LoginPage(context.new_page())
+            login_page.navigate_to_login(self.base_url)
+            login_page.login(username, password)
+            outcome = login_page.wait_for_outcome(timeout=self.timeout)
+            if not outcome.is_success:
+                raise LoginFailedError(
+                    f"Could not log in as {username} at {self.base_url}: {outcome.kind} {outcome.detail}"
+                )
+            return context.storage_state()
+        finally:
+            context.close()
@@ -0,0 +1,336 @@
+"""
+Shared browser servers
+The xdist controller launches a few Playwright browser servers and every worker
+connects to one of them over a websocket instead of launching its own browser;
+crashed servers are restarted on the same endpoint and workers reconnect
+
+    python -m utils.browser_server --browser chromium --port 9323 --ws-path /shared
+runs one server in the foreground (the container entrypoint starts it before pytest, and
+it stops the server and the browser with it on SIGTERM or once the --exit-with process exited)
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from playwright._impl._driver import compute_driver_executable, get_driver_env
+from playwright.sync_api import Browser, BrowserType
+from playwright.sync_api import Error as PlaywrightError
+
+from config.config import Config
+from utils.workers import is_ci
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def group_running(pgid: int) -> bool:
+    """Whether a process of the group still runs; zombies left to a PID 1 that doesn't reap them don't count"""
+    if not os.path.isdir("/proc"):
+        try:
+            os.killpg(pgid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as f:
+                # pid (comm) state ppid pgrp ...; comm may contain spaces and parentheses
+                state, _, pgrp = f.read().rsplit(")", 1)[1].split()[:3]
+        except (OSError, IndexError):
+            continue
+        if int(pgrp) == pgid and state != "Z":
+            return True
+    return False
+
+
+def process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def default_launch_options(browser_name: str, channel: str = "") -> Dict:
+    """Launch options of a browser server, the same as browser_type_launch_args gives a launched browser"""
+    options = {"headless": True if is_ci() else Config.HEADLESS, "slowMo": Config.SLOW_MO}
+    if browser_name == "chromium":
+        options["args"] = list(Config.LAUNCH_FLAGS)
+        if channel:
+            options["channel"] = channel
+    return options
+
+
+def assign_server(worker_index: int, worker_count: int, servers: int, mode: str = "round-robin") -> int:
+    """Index of the server a worker connects to
+
+    round-robin: gw0 -> 0, gw1 -> 1, ... (spreads neighbouring workers)
+    block: consecutive workers share a server, e.g. 8 workers on 2 servers -> gw0-gw3 on 0
+    """
+    if mode == "block":
+        return min(worker_index * servers // max(worker_count, 1), servers - 1)
+    return worker_index % servers
+
+
+class BrowserServer:
+    """One `playwright launch-server` process with a fixed port and path, so a restart keeps the endpoint
+
+    Port and path are picked when not given; either way the endpoint is known before the server starts.
+    The server runs in its own process group, which stop() ends as a whole: the driver script starts
+    Node, and Node the browser, and none of them passes a signal on to its children.
+    """
+
+    def __init__(self, browser_name: str, launch_options: Dict, name: str = "server-0", port: int = None,
+                 ws_path: str = None):
+        self.browser_name = browser_name
+        self.launch_options = {
+            **launch_options,
+            "port": port or free_port(),
+            "wsPath": ws_path or f"/{name}-{uuid.uuid4().hex[:12]}",
+            "host": "127.0.0.1",
+        }
+        self.name = name
+        self.endpoint: Optional[str] = None
+        self.starts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._config_path = os.path.join(tempfile.gettempdir(), f"browser-server-{uuid.uuid4().hex}.json")
+
+    @property
+    def address(self) -> str:
+        """The websocket endpoint the server listens on once started, known before it starts"""
+        options = self.launch_options
+        return f"ws://{options['host']}:{options['port']}{options['wsPath']}"
+
+    def command(self) -> List[str]:
+        # The driver itself, as `python -m playwright` runs it; that wrapper would be one more process in between
+        return [str(compute_driver_executable()), "launch-server", "--browser", self.browser_name,
+                "--config", self._config_path]
+
+    def start(self, timeout: float = 30) -> str:
+        """Launch the server and wait until it prints its websocket endpoint"""
+        # Whatever is left of a previous start still holds the port
+        self._terminate()
+        with open(self._config_path, "w", encoding="utf-8") as f:
+            json.dump(self.launch_options, f)
+        # A restart only counts once this process printed an endpoint, not the previous one
+        self.endpoint = None
+        self._process = subprocess.Popen(
+            self.command(),
+            env=get_driver_env(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            start_new_session=os.name != "nt",
+        )
+        output, found = [], []
+        reader = threading.Thread(target=self._read_endpoint, args=(self._process, output, found), daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if not found:
+            self.stop()
+            raise RuntimeError(f"Browser server {self.name} did not start:\n" + "".join(output[-20:]))
+        self.endpoint = found[0]
+        self.starts += 1
+        return self.endpoint
+
+    @staticmethod
+    def _read_endpoint(process: subprocess.Popen, output: List[str], found: List[str]):
+        for line in process.stdout:
+            output.append(line)
+            if line.startswith("ws://"):
+                found.append(line.strip())
+                break
+        # Keep draining so a chatty browser can't fill the pipe and block
+        threading.Thread(target=process.stdout.read, daemon=True).start()
+
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _terminate(self, timeout: float = 10):
+        """End the server's whole process group, even if the process it was started as already exited"""
+        if self._process is None:
+            return
+        pid = self._process.pid
+        if os.name == "nt":
+            if self._process.poll() is None:
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
+        elif group_running(pid):
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                # Reap the group leader, so it doesn't count as running
+                self._process.poll()
+                if not group_running(pid):
+                    break
+                time.sleep(0.1)
+            else:
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        self._process.wait()
+        self._process = None
+
+    def stop(self):
+        self._terminate()
+        try:
+            os.remove(self._config_path)
+        except OSError:
+            pass
+
+
+class BrowserServerFleet:
+    """The controller's browser servers, watched by a thread that restarts any that died"""
+
+    def __init__(self, browser_name: str, launch_options: Dict, count: int = 1,
+                 assignment: str = "round-robin", check_interval: float = 2.0):
+        self.servers = [BrowserServer(browser_name, launch_options, f"server-{i}") for i in range(count)]
+        self.assignment = assignment
+        self.check_interval = check_interval
+        self.restarts: Dict[str, int] = {server.name: 0 for server in self.servers}
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name="browser-server-watch", daemon=True)
+
+    def start(self) -> "BrowserServerFleet":
+        """Start every server in parallel, then the watcher"""
+        with ThreadPoolExecutor(max_workers=len(self.servers)) as pool:
+            list(pool.map(lambda server: server.start(), self.servers))
+        self._watcher.start()
+        return self
+
+    def endpoint_for(self, worker_index: int, worker_count: int) -> str:
+        # The fixed address, so a worker starting while its server restarts still gets one
+        return self.servers[assign_server(worker_index, worker_count, len(self.servers), self.assignment)].address
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            for server in self.servers:
+                if server.alive() or self._stop.is_set():
+                    continue
+                self.restarts[server.name] += 1
+                print(f"Browser server {server.name} exited, restarting it on {server.address}")
+                try:
+                    server.start()
+                except RuntimeError as e:
+                    print(e)
+
+    def report(self) -> Dict:
+        return {"servers": len(self.servers), "restarts": dict(self.restarts)}
+
+    def stop(self):
+        self._stop.set()
+        for server in self.servers:
+            server.stop()
+
+
+class SharedBrowser:
+    """A worker's connection to a browser server, used in place of a launched Browser
+
+    Every call goes to the connected Browser; when the connection dropped (the
+    server crashed and is being restarted) the next new_context() reconnects first.
+    """
+
+    def __init__(self, browser_type: BrowserType, endpoint: str, timeout: float = 30000):
+        self.browser_type = browser_type
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.connections = 0
+        self._browser: Optional[Browser] = None
+        self._connect()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.timeout / 1000
+        while True:
+            try:
+                self._browser = self.browser_type.connect(self.endpoint, timeout=self.timeout)
+                self.connections += 1
+                return
+            except PlaywrightError:
+                if time.monotonic() > deadline:
+                    raise
+                # The controller restarts a crashed server within a few seconds
+                time.sleep(0.5)
+
+    @property
+    def browser(self) -> Browser:
+        if not self._browser.is_connected():
+            print(f"Lost browser server {self.endpoint}, reconnecting")
+            self._connect()
+        return self._browser
+
+    def new_context(self, **kwargs):
+        return self.browser.new_context(**kwargs)
+
+    def new_page(self, **kwargs):
+        return self.browser.new_page(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.browser, name)
+
+    def recycle(self):
+        """Reconnect, which closes this worker's contexts on the server; the server itself keeps running"""
+        self.close()
+        self._connect()
+
+    def close(self):
+        """Drop the connection; the server and other workers' contexts stay up"""
+        if self._browser.is_connected():
+            self._browser.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run one browser server in the foreground, restarting it if it exits")
+    parser.add_argument("--browser", default=None, help="Browser to serve (default: BROWSER)")
+    parser.add_argument("--channel", default=None, help="Chromium channel (default: BROWSER_CHANNEL)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (default: a free one)")
+    parser.add_argument("--ws-path", default=None, help="Websocket path, e.g. /shared (default: a random one)")
+    parser.add_argument("--exit-with", type=int, default=None,
+                        help="Stop the server once the process with this PID exited")
+    args = parser.parse_args(argv)
+    browser_name = args.browser or Config.BROWSER
+    channel = Config.BROWSER_CHANNEL if args.channel is None else args.channel
+    server = BrowserServer(browser_name, default_launch_options(browser_name, channel), f"{browser_name}-server",
+                           port=args.port, ws_path=args.ws_path)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        print(server.start(), flush=True)
+        while not stop.wait(Config.BROWSER_SERVER_CHECK_INTERVAL):
+            if args.exit_with and not process_running(args.exit_with):
+                break
+            if not server.alive():
+                print(f"Browser server exited, restarting it on {server.address}", flush=True)
+                server.start()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Adaptive failure capture
+Tests run without tracing or video; a test that fails is rerun once in the same
+worker with tracing, video and HAR recording, and the recording is only kept when
+the failure reproduces. A rerun that passes marks the test as flaky, one that is
+skipped (e.g. its endpoint went down) proves nothing either way
+"""
+import os
+import shutil
+from typing import Dict, List, Tuple
+
+import pytest
+from _pytest.reports import TestReport
+from _pytest.runner import call_and_report, show_test_item
+
+
+# Outcome of the report of a failed first attempt
+RERUN = "rerun"
+# Verdicts stored as the "capture" user property of the rerun's reports
+REPRODUCED = "reproduced"
+FLAKY = "flaky"
+INCONCLUSIVE = "inconclusive"
+
+# Set on a test item while it is rerun with recording
+capture_rerun_key = pytest.StashKey[bool]()
+# The recording of the rerun, set by the fixtures that record it and finished once the verdict is known
+capture_bundle_key = pytest.StashKey["CaptureBundle"]()
+
+
+class CaptureBundle:
+    """Trace, video and HAR of each browser context used by a rerun, recorded into the test's artifact folder"""
+
+    def __init__(self, artifact_dir: str, title: str):
+        self.directory = os.path.join(artifact_dir, "capture")
+        self.title = title
+
+    def context_args(self, name: str = "context") -> Dict:
+        """Extra new_context() args that record video and HAR for one context"""
+        return {
+            "record_video_dir": os.path.join(self.directory, name, "video"),
+            "record_har_path": os.path.join(self.directory, name, "network.har"),
+        }
+
+    def tracing_args(self) -> Dict:
+        return {"title": self.title, "screenshots": True, "snapshots": True, "sources": True}
+
+    def trace_path(self, name: str = "context") -> str:
+        return os.path.join(self.directory, name, "trace.zip")
+
+    def finish(self, keep: bool):
+        """Keep the recording when the failure reproduced, otherwise delete it; call once the contexts are closed"""
+        if keep:
+            print(f"Failure reproduced, trace, video and HAR saved: {self.directory}")
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        try:
+            # Drop the test's folder too if the recording was all there was
+            os.rmdir(os.path.dirname(self.directory))
+        except OSError:
+            pass
+
+
+def failed_call(reports: List[TestReport]) -> bool:
+    """Whether the test itself failed (setup errors and expected failures are not rerun)"""
+    return any(r.when == "call" and r.failed and not hasattr(r, "wasxfail") for r in reports)
+
+
+def rerun_verdict(reports: List[TestReport]) -> str:
+    """Verdict of a rerun from its setup, call and teardown reports"""
+    if any(r.failed for r in reports):
+        return REPRODUCED
+    if any(r.skipped for r in reports):
+        return INCONCLUSIVE
+    return FLAKY
+
+
+def run_attempt(item, nextitem, may_rerun: bool) -> Tuple[List[TestReport], bool]:
+    """One setup/call/teardown round without logging its reports, like _pytest.runner.runtestprotocol
+
+    When the call fails and may_rerun is set, the teardown keeps only the session
+    fixtures (browser, context pool), so the rerun rebuilds module and class state
+    instead of replaying cached results. Returns the reports and whether to rerun.
+    """
+    hasrequest = hasattr(item, "_request")
+    if hasrequest and not item._request:
+        item._initrequest()
+    reports = [call_and_report(item, "setup", log=False)]
+    if reports[0].passed and not item.config.getoption("setuponly", False):
+        if item.config.getoption("setupshow", False):
+            show_test_item(item)
+        reports.append(call_and_report(item, "call", log=False))
+    rerun = may_rerun and failed_call(reports)
+    if item.session.shouldfail or item.session.shouldstop:
+        nextitem = None
+    elif rerun:
+        nextitem = item.session
+    reports.append(call_and_report(item, "teardown", log=False, nextitem=nextitem))
+    if hasrequest:
+        item._request = False
+        item.funcargs = None
+    return reports, rerun
+
+
+class AdaptiveCapture:
+    """Plugin that reruns failed tests once with recording switched on"""
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        ihook = item.ihook
+        ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        reports, rerun = run_attempt(item, nextitem, may_rerun=True)
+        if rerun:
+            for report in reports:
+                if report.when == "call":
+                    report.outcome = RERUN
+                # The teardown of the first attempt is not reported, the rerun's is
+                if report.when != "teardown":
+                    ihook.pytest_runtest_logreport(report=report)
+            item.user_properties.clear()
+            item.stash[capture_rerun_key] = True
+            try:
+                reports, _ = run_attempt(item, nextitem, may_rerun=False)
+            finally:
+                del item.stash[capture_rerun_key]
+            verdict = rerun_verdict(reports)
+            bundle = item.stash.get(capture_bundle_key, None)
+            if bundle is not None:
+                del item.stash[capture_bundle_key]
+                bundle.finish(keep=verdict == REPRODUCED)
+            for report in reports:
+                report.user_properties.append(("capture", verdict))
+        for report in reports:
+            ihook.pytest_runtest_logreport(report=report)
+        ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+        return True
+
+    def pytest_report_teststatus(self, report):
+        if report.outcome == RERUN:
+            return RERUN, "R", ("RERUN", {"yellow": True})
+        return None
+
+
+def capture_verdicts(stats: Dict[str, List]) -> Dict[str, Tuple[str, str]]:
+    """Verdict and first failure line of every rerun test, from the terminal reporter's stats"""
+    first_failures = {}
+    for report in stats.get(RERUN, []):
+        crash = getattr(report.longrepr, "reprcrash", None)
+        first_failures[report.nodeid] = crash.message.splitlines()[0] if crash and crash.message else ""
+    verdicts = {}
+    for reports in stats.values():
+        for report in reports:
+            verdict = dict(getattr(report, "user_properties", ())).get("capture")
+            if verdict and report.nodeid in first_failures:
+                verdicts[report.nodeid] = (verdict, first_failures[report.nodeid])
+    return verdicts
@@ -0,0 +1,208 @@
+"""
+Browser context pool
+Keeps warm browser contexts per worker and resets them between tests
+instead of creating and tearing down a new context for every test
+"""
+import hashlib
+import json
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from playwright.sync_api import Browser, BrowserContext, Page
+from playwright.sync_api import Error as PlaywrightError
+
+
+# Clears what the last test left behind for the current origin; storage of other origins can only be
+# cleared from a page on them, so a context whose frames visited another origin is recycled instead
+CLEAR_STORAGE_SCRIPT = """
+async () => {
+    try { window.localStorage.clear(); } catch (e) {}
+    try { window.sessionStorage.clear(); } catch (e) {}
+    try {
+        if (window.indexedDB && indexedDB.databases) {
+            for (const db of await indexedDB.databases()) indexedDB.deleteDatabase(db.name);
+        }
+    } catch (e) {}
+    try {
+        if (window.caches) for (const name of await caches.keys()) await caches.delete(name);
+    } catch (e) {}
+}
+"""
+
+
+def origin_of(url: str) -> Optional[str]:
+    """scheme://host[:port] of a web URL; None for about:, data: and other URLs without storage of their own"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class PooledContext:
+    """A browser context with its warm page"""
+
+    def __init__(self, key: str, context: BrowserContext, page: Page):
+        self.key = key
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.reusable = True
+        # Origins the page's frames were on since the last reset, i.e. those that may hold storage
+        self.origins: Set[str] = set()
+        page.on("framenavigated", self._visited)
+
+    def _visited(self, frame):
+        origin = origin_of(frame.url)
+        if origin is not None:
+            self.origins.add(origin)
+
+    @property
+    def fresh(self) -> bool:
+        """True until the context has been handed out once"""
+        return self.uses <= 1
+
+
+class ContextPool:
+    """Hands out warm contexts and recycles the ones a test left dirty"""
+
+    def __init__(self, browser: Browser, context_args: Dict, setup: Callable[[BrowserContext], None],
+                 max_idle: int = 2, max_uses: int = 50, enabled: bool = True):
+        self.browser = browser
+        self.context_args = context_args
+        self.setup = setup
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.enabled = enabled
+        self.idle: Dict[str, List[PooledContext]] = defaultdict(list)
+        self.stats = {"hits": 0, "misses": 0, "recycled": 0, "reset_ms": 0.0}
+        self.recycle_reasons: Dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def key_for(extra_args: Dict = None, username: str = None, password: str = None) -> str:
+        """Build the pool key; contexts are only reused for identical args and credentials
+
+        Credentials are hashed: a context carries the login init script of one credential set.
+        """
+        auth = None
+        if username is not None:
+            auth = hashlib.sha256(f"{username}|{password}".encode("utf-8")).hexdigest()[:16]
+        return json.dumps({"args": extra_args or {}, "auth": auth}, sort_keys=True, default=str)
+
+    def warm(self, count: int, extra_args: Dict = None):
+        """Create contexts up front so the first tests get a hit"""
+        if not self.enabled:
+            return
+        key = self.key_for(extra_args)
+        while len(self.idle[key]) < min(count, self.max_idle):
+            self.idle[key].append(self._create(key, extra_args))
+
+    def acquire(self, key: str, extra_args: Dict = None, reusable: bool = True) -> PooledContext:
+        """Get a reset context for the key, creating one on a miss (always, if it must not be reused)"""
+        entry = self._pop_idle(key) if reusable and self.enabled else None
+        if entry is not None:
+            self.stats["hits"] += 1
+        else:
+            entry = self._create(key, extra_args)
+            self.stats["misses"] += 1
+        entry.uses += 1
+        entry.reusable = reusable
+        return entry
+
+    def release(self, entry: PooledContext, failed: bool = False):
+        """Reset a context and put it back, or close it if it can't be reused"""
+        reason = self.dirty_reason(entry, failed)
+        if reason is None:
+            start = time.perf_counter()
+            try:
+                self.reset(entry)
+            except PlaywrightError:
+                reason = "reset failed"
+            self.stats["reset_ms"] += (time.perf_counter() - start) * 1000
+        if reason is not None:
+            if self.enabled:
+                self.stats["recycled"] += 1
+                self.recycle_reasons[reason] += 1
+            self._close(entry)
+            return
+        self.idle[entry.key].append(entry)
+
+    def dirty_reason(self, entry: PooledContext, failed: bool = False) -> Optional[str]:
+        """Explain why a context must not be reused, or return None if it's clean"""
+        if not self.enabled:
+            return "pool disabled"
+        if not entry.reusable:
+            return "single use"
+        if failed:
+            return "test failed"
+        if entry.page.is_closed():
+            return "page closed"
+        if len(entry.context.pages) != 1:
+            return "extra pages open"
+        if entry.origins - {origin_of(entry.page.url)}:
+            return "storage on other origins"
+        if entry.uses >= self.max_uses:
+            return "max uses reached"
+        if len(self.idle[entry.key]) >= self.max_idle:
+            return "pool full"
+        return None
+
+    def reset(self, entry: PooledContext):
+        """Clear cookies, storage, routes and permissions and park the page on about:blank"""
+        if origin_of(entry.page.url) is not None:
+            entry.page.evaluate(CLEAR_STORAGE_SCRIPT)
+        entry.context.clear_cookies()
+        entry.context.clear_permissions()
+        entry.context.set_extra_http_headers({})
+        entry.context.set_offline(False)
+        # Routes a test added itself; the framework's routers and network conditions unroute on stop
+        entry.page.unroute_all(behavior="ignoreErrors")
+        entry.context.unroute_all(behavior="ignoreErrors")
+        entry.page.goto("about:blank")
+        entry.origins.clear()
+
+    def close(self):
+        """Close every idle context"""
+        for entries in self.idle.values():
+            for entry in entries:
+                self._close(entry)
+        self.idle.clear()
+
+    def report(self) -> Dict:
+        """Stats for the end of session summary"""
+        return {**self.stats, "recycle_reasons": dict(self.recycle_reasons)}
+
+    def _pop_idle(self, key: str) -> Optional[PooledContext]:
+        """Take an idle context, dropping those of a browser that disconnected (e.g. a restarted browser server)"""
+        while self.idle[key]:
+            entry = self.idle[key].pop()
+            browser = entry.context.browser
+            if browser is None or browser.is_connected():
+                return entry
+            self.stats["recycled"] += 1
+            self.recycle_reasons["browser disconnected"] += 1
+        return None
+
+    def _create(self, key: str, extra_args: Dict = None) -> PooledContext:
+        context = self.browser.new_context(**{**self.context_args, **(extra_args or {})})
+        self.setup(context)
+        return PooledContext(key, context, context.new_page())
+
+    def _close(self, entry: PooledContext):
+        try:
+            entry.context.close()
+        except PlaywrightError:
+            pass
+
+
+def merge_reports(reports: List[Dict]) -> Dict:
+    """Add up the pool stats published by every worker"""
+    merged = {"hits": 0, "misses": 0, "recycled": 0, "reset_ms": 0.0, "recycle_reasons": defaultdict(int)}
+    for report in reports:
+        for name in ("hits", "misses", "recycled", "reset_ms"):
+            merged[name] += report.get(name, 0)
+        for reason, count in report.get("recycle_reasons", {}).items():
+            merged["recycle_reasons"][reason] += count
+    merged["recycle_reasons"] = dict(merged["recycle_reasons"])
+    return merged
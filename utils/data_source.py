@@ -0,0 +1,208 @@
+"""
+Streaming test data
+Credential and payload cases streamed from CSV/JSONL files or generators into a
+fixed number of shard tests, so a corpus of any size costs the same collection
+time and memory; duplicate payloads are dropped by hash
+"""
+import csv
+import hashlib
+import itertools
+import json
+import random
+import string
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote
+
+from pages.scenarios import CredentialCase
+
+
+class DataSource(ABC):
+    """A named, re-iterable stream of credential cases; nothing is read until it is iterated"""
+
+    name = "data"
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[CredentialCase]:
+        """Read the cases from the start"""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+
+def case_from_record(record: Dict, line: int) -> CredentialCase:
+    """Build a case from a row with username, password and an optional description"""
+    return CredentialCase(
+        str(record.get("username") or ""),
+        str(record.get("password") or ""),
+        str(record.get("description") or f"line {line}"),
+    )
+
+
+class CsvSource(DataSource):
+    """Rows of a CSV file with a username,password[,description] header"""
+
+    def __init__(self, path: str, name: str = None):
+        self.path = path
+        self.name = name or path
+
+    def __iter__(self) -> Iterator[CredentialCase]:
+        with open(self.path, newline="", encoding="utf-8") as f:
+            for line, record in enumerate(csv.DictReader(f), start=2):
+                yield case_from_record(record, line)
+
+
+class JsonlSource(DataSource):
+    """One JSON object per line with username, password and an optional description"""
+
+    def __init__(self, path: str, name: str = None):
+        self.path = path
+        self.name = name or path
+
+    def __iter__(self) -> Iterator[CredentialCase]:
+        with open(self.path, encoding="utf-8") as f:
+            for line, text in enumerate(f, start=1):
+                if text.strip() and not text.lstrip().startswith("//"):
+                    yield case_from_record(json.loads(text), line)
+
+
+class GeneratorSource(DataSource):
+    """Cases produced by calling factory(*args, **kwargs) again on every iteration"""
+
+    def __init__(self, name: str, factory: Callable[..., Iterable[CredentialCase]], *args, **kwargs):
+        self.name = name
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+
+    def __iter__(self) -> Iterator[CredentialCase]:
+        return iter(self.factory(*self.args, **self.kwargs))
+
+
+class ChainSource(DataSource):
+    """Several sources one after the other"""
+
+    def __init__(self, *sources: DataSource, name: str = None):
+        self.sources = sources
+        self.name = name or "+".join(source.name for source in sources)
+
+    def __iter__(self) -> Iterator[CredentialCase]:
+        return itertools.chain.from_iterable(self.sources)
+
+
+# Payloads of the security corpus, by kind
+SQL_INJECTION = [
+    "' OR '1'='1", "' OR 1=1--", "admin'--", "' OR ''='", "'; DROP TABLE users;--", "\" OR \"\"=\"",
+    "1' UNION SELECT NULL,NULL--", "' AND SLEEP(5)--", "') OR ('1'='1", "' OR 'x'='x'#",
+]
+XSS = [
+    "<script>alert('XSS')</script>", "<img src=x onerror=alert(1)>", "\"><svg onload=alert(1)>",
+    "javascript:alert(1)", "<iframe src=javascript:alert(1)>", "'\"><body onload=alert(1)>",
+]
+OTHER_INJECTION = [
+    "../../../../etc/passwd", "*)(uid=*))(|(uid=*", "%s%s%s%n", "{{7*7}}", "${7*7}", "admin\x00",
+    "; ls -la", "| cat /etc/passwd",
+]
+MUTATIONS: Dict[str, Callable[[str], str]] = {
+    "plain": lambda p: p,
+    "upper": str.upper,
+    "url": lambda p: quote(p, safe=""),
+    "double-url": lambda p: quote(quote(p, safe=""), safe=""),
+    "email": lambda p: f"{p}@example.com",
+    "padded": lambda p: f"  {p}  ",
+}
+FUZZ_ALPHABET = string.ascii_letters + string.digits + string.punctuation + " \té中\U0001f600"
+
+
+def security_payloads(count: int = 1000, seed: int = 0, password: str = "Password123!") -> Iterator[CredentialCase]:
+    """Injection payloads in every mutation in the username, the password or both, then random fuzz
+
+    Deterministic for a seed, so shards and reruns see the same cases.
+    """
+    payloads = [("sqli", p) for p in SQL_INJECTION] + [("xss", p) for p in XSS] + \
+        [("injection", p) for p in OTHER_INJECTION]
+    produced = 0
+    for (kind, payload), (mutation, mutate), field in itertools.product(
+            payloads, MUTATIONS.items(), ("username", "password", "both")):
+        if produced >= count:
+            return
+        value = mutate(payload)
+        username = password_value = None
+        if field in ("username", "both"):
+            username = value
+        if field in ("password", "both"):
+            password_value = value
+        yield CredentialCase(username or "validuser@example.com", password_value or password,
+                             f"{kind} {mutation} in {field}: {payload[:40]}")
+        produced += 1
+    rng = random.Random(seed)
+    while produced < count:
+        length = rng.choice((1, 8, 32, 64, 256, 1024))
+        value = "".join(rng.choices(FUZZ_ALPHABET, k=length))
+        yield CredentialCase(value, password, f"fuzz {length} chars #{produced}")
+        produced += 1
+
+
+def case_digest(case: CredentialCase) -> bytes:
+    """Hash of what is submitted; cases with the same username and password are duplicates"""
+    return hashlib.blake2b(f"{case.username}\x00{case.password}".encode("utf-8"), digest_size=8).digest()
+
+
+class DataCases:
+    """The cases of one shard of a data source, streamed to a test and checked one by one
+
+    A case belongs to shard int(digest) % shards, so duplicates always land in the same
+    shard and are dropped there; only the 8-byte digests of the shard are kept in memory.
+    """
+
+    def __init__(self, source: DataSource, shard: int = 0, shards: int = 1, batch_size: int = 25,
+                 max_reported: int = 20):
+        self.source = source
+        self.shard = shard
+        self.shards = shards
+        self.batch_size = batch_size
+        self.max_reported = max_reported
+        self.stats = {"source": source.name, "shard": f"{shard + 1}/{shards}", "cases": 0, "duplicates": 0,
+                      "checked": 0, "failed": 0}
+        self.failures: List[str] = []
+
+    def __iter__(self) -> Iterator[CredentialCase]:
+        seen = set()
+        for case in self.source:
+            digest = case_digest(case)
+            if int.from_bytes(digest, "big") % self.shards != self.shard:
+                continue
+            if digest in seen:
+                self.stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            self.stats["cases"] += 1
+            yield case
+
+    def batches(self, size: Optional[int] = None) -> Iterator[List[CredentialCase]]:
+        """The shard's cases in lists of size, e.g. for LoginPage.run_scenarios"""
+        cases = iter(self)
+        while True:
+            batch = list(itertools.islice(cases, size or self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def check(self, case: CredentialCase, ok: bool, detail: str = ""):
+        """Record the verdict of one case; failures are raised together by verify()"""
+        self.stats["checked"] += 1
+        if ok:
+            return
+        self.stats["failed"] += 1
+        if len(self.failures) < self.max_reported:
+            self.failures.append(f"{case.id}: {detail}" if detail else case.id)
+
+    def verify(self):
+        """Fail the test if any case failed (called after the test body passed)"""
+        if not self.stats["failed"]:
+            return
+        more = self.stats["failed"] - len(self.failures)
+        raise AssertionError(
+            f"{self.stats['failed']} of {self.stats['checked']} cases failed in shard {self.stats['shard']} "
+            f"of {self.source.name}:\n" + "\n".join(self.failures) + (f"\n... and {more} more" if more > 0 else "")
+        )
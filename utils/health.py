@@ -0,0 +1,160 @@
+"""
+Health check service
+Probes the site and its dependency endpoints in parallel, once per run on the
+xdist controller, and caches the verdict on disk for a short time
+"""
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+SITE = "site"
+CACHE_KEY = "health/verdict"
+
+
+def parse_endpoints(spec: str) -> Dict[str, str]:
+    """Parse 'name=url,name=url' into a dict"""
+    endpoints = {}
+    for item in (spec or "").split(","):
+        name, sep, url = item.strip().partition("=")
+        if sep and name.strip():
+            endpoints[name.strip()] = url.strip()
+    return endpoints
+
+
+def skip_reason(verdict: Dict[str, Dict], required: List[str]) -> Optional[str]:
+    """Explain why a test needing the given endpoints can't run, or return None
+
+    A name the health check didn't probe (not in HEALTH_ENDPOINTS, e.g. a typo) can't be vouched for either.
+    """
+    for name in required:
+        result = verdict.get(name)
+        if result is None:
+            return f"Unknown endpoint '{name}': not in HEALTH_ENDPOINTS ({', '.join(sorted(verdict))})"
+        if not result["ok"]:
+            return f"Endpoint '{name}' is not accessible: {result['detail']}"
+    return None
+
+
+def write_verdict_when_done(future: Future, path: str):
+    """Write the verdict to a JSON file once the probe finishes, for xdist workers to pick up"""
+    def write(done: Future):
+        try:
+            verdict = done.result()
+        except Exception as e:
+            print(f"Health check failed, no tests are skipped: {e}")
+            verdict = {}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(verdict, f)
+        os.replace(tmp, path)
+    future.add_done_callback(write)
+
+
+def wait_for_verdict(path: str, timeout: float, interval: float = 0.05) -> Optional[Dict[str, Dict]]:
+    """Read the verdict written by write_verdict_when_done, waiting up to timeout seconds for it"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            if time.monotonic() > deadline:
+                return None
+        time.sleep(interval)
+
+
+class HealthChecker:
+    """Probes endpoints with a pooled, retrying HTTP session"""
+
+    def __init__(self, endpoints: Dict[str, str], timeout: float = 10, retries: int = 2,
+                 backoff: float = 0.5, cache=None, ttl: int = 60):
+        self.endpoints = endpoints
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.ttl = ttl
+
+    def max_duration(self) -> float:
+        """Seconds the slowest probe can take with every retry and backoff"""
+        return self.timeout * (self.retries + 1) + sum(self.backoff * 2 ** n for n in range(self.retries))
+
+    def start(self) -> Future:
+        """Run the probes in the background and return a future for the verdict"""
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health-check")
+        future = executor.submit(self.run)
+        executor.shutdown(wait=False)
+        return future
+
+    def run(self) -> Dict[str, Dict]:
+        """Get the verdict for every endpoint, from the cache when it is still fresh"""
+        cached = self._load_cached()
+        if cached is not None:
+            return cached
+        session = self._session()
+        with ThreadPoolExecutor(max_workers=max(len(self.endpoints), 1)) as pool:
+            futures = {name: pool.submit(self.probe, session, name, url) for name, url in self.endpoints.items()}
+            verdict = {name: future.result() for name, future in futures.items()}
+        session.close()
+        self._save(verdict)
+        return verdict
+
+    def probe(self, session: requests.Session, name: str, url: str) -> Dict:
+        """Check a single endpoint"""
+        parsed = urlparse(url or "")
+        if not parsed.scheme or not parsed.netloc:
+            return {"ok": False, "detail": "URL is missing or invalid", "elapsed_ms": 0}
+        # The site has to serve pages; dependencies only have to be up (APIs often 4xx a bare GET)
+        healthy_below = 400 if name == SITE else 500
+        start = time.perf_counter()
+        try:
+            with session.get(url, timeout=self.timeout, stream=True) as response:
+                status = response.status_code
+        except requests.RequestException as e:
+            return {"ok": False, "detail": str(e), "elapsed_ms": self._elapsed(start)}
+        return {
+            "ok": status < healthy_below,
+            "detail": f"{url} answered HTTP {status}",
+            "elapsed_ms": self._elapsed(start),
+        }
+
+    def _session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=len(self.endpoints) or 1,
+                              pool_maxsize=len(self.endpoints) or 1)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _load_cached(self) -> Optional[Dict[str, Dict]]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(CACHE_KEY, None)
+        if not cached or cached.get("endpoints") != self.endpoints:
+            return None
+        if time.time() - cached.get("timestamp", 0) > self.ttl:
+            return None
+        return cached["verdict"]
+
+    def _save(self, verdict: Dict[str, Dict]):
+        if self.cache is not None:
+            self.cache.set(CACHE_KEY, {"timestamp": time.time(), "endpoints": self.endpoints, "verdict": verdict})
+
+    @staticmethod
+    def _elapsed(start: float) -> float:
+        return round((time.perf_counter() - start) * 1000, 1)
@@ -0,0 +1,322 @@
+"""
+Load generator
+Drives many concurrent headless contexts through the async login page object,
+following a ramp-up profile, and reports throughput and latency percentiles for
+each step (page ready, submit, outcome) as JSON and CSV that can be compared
+between builds
+
+    python -m utils.load_runner --target local --users 20 --ramp-up 30 --duration 60
+    python -m utils.load_runner --stages 30:10,60:50,30:0 --baseline load-results/main.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, async_playwright
+from playwright.async_api import Error as PlaywrightError
+
+from config.config import Config, action_timeout
+from pages.async_login_page import AsyncLoginPage
+from pages.readiness import PageNotReadyError, drain_readiness_log
+from utils import web_vitals
+from utils.mock_server import MockAuthSettings, MockLoginServer
+from utils.stats import percentile
+
+
+STEPS = ("ready", "submit", "outcome", "iteration")
+# How often the controller adjusts the number of running users
+TICK = 0.25
+
+
+@dataclass
+class Stage:
+    """Move linearly to `users` concurrent users over `duration` seconds"""
+    duration: float
+    users: int
+
+
+def parse_stages(spec: str) -> List[Stage]:
+    """Parse 'seconds:users,...', e.g. '30:10,60:10,15:0' ramps to 10, holds, then ramps down"""
+    stages = []
+    for item in spec.split(","):
+        duration, sep, users = item.strip().partition(":")
+        if not sep:
+            raise ValueError(f"Stage '{item}' should look like seconds:users")
+        stages.append(Stage(float(duration), int(users)))
+    return stages
+
+
+def users_at(stages: List[Stage], elapsed: float) -> int:
+    """Number of users the profile asks for after `elapsed` seconds"""
+    previous = 0
+    for stage in stages:
+        if elapsed < stage.duration:
+            fraction = elapsed / stage.duration if stage.duration else 1
+            return round(previous + (stage.users - previous) * fraction)
+        elapsed -= stage.duration
+        previous = stage.users
+    return 0
+
+
+@dataclass
+class Sample:
+    """One timed step of one user"""
+    step: str
+    offset_s: float  # Since the start of the run
+    duration_ms: float
+    ok: bool
+    user: int
+
+
+def summarize(samples: List[Sample], elapsed: float) -> List[Dict]:
+    """Throughput and latency percentiles per step (latencies of successful steps only)"""
+    rows = []
+    for step in STEPS:
+        step_samples = [s for s in samples if s.step == step]
+        durations = sorted(s.duration_ms for s in step_samples if s.ok)
+        rows.append({
+            "step": step,
+            "count": len(step_samples),
+            "errors": sum(1 for s in step_samples if not s.ok),
+            "throughput_per_s": round(len(durations) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(durations) / len(durations), 1) if durations else 0.0,
+            "p50_ms": round(percentile(durations, 50), 1),
+            "p95_ms": round(percentile(durations, 95), 1),
+            "p99_ms": round(percentile(durations, 99), 1),
+            "max_ms": round(durations[-1], 1) if durations else 0.0,
+        })
+    return rows
+
+
+def compare(rows: List[Dict], baseline: Dict, max_regression: float) -> List[str]:
+    """Steps whose p95 got slower than the baseline by more than max_regression percent"""
+    baseline_rows = {row["step"]: row for row in baseline.get("steps", [])}
+    regressions = []
+    for row in rows:
+        before = baseline_rows.get(row["step"])
+        if not before or not before["p95_ms"] or not row["p95_ms"]:
+            continue
+        change = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        if change > max_regression:
+            regressions.append(
+                f"{row['step']}: p95 {before['p95_ms']:.1f}ms -> {row['p95_ms']:.1f}ms (+{change:.0f}%)"
+            )
+    return regressions
+
+
+class LoadRunner:
+    """Runs virtual users, each logging in over and over in its own browser context"""
+
+    def __init__(self, base_url: str, stages: List[Stage], username: str, password: str,
+                 expect: str = "any", think_time: float = 0.0, context_args: Optional[Dict] = None):
+        self.base_url = base_url
+        self.stages = stages
+        self.username = username
+        self.password = password
+        self.expect = expect  # "success", "error" or "any" outcome counts as ok
+        self.think_time = think_time
+        self.context_args = context_args or {}
+        self.samples: List[Sample] = []
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._tasks: List[asyncio.Task] = []
+
+    async def run(self, browser: Browser) -> List[Sample]:
+        """Follow the stages, starting and stopping users as the profile changes"""
+        total = sum(stage.duration for stage in self.stages)
+        users: List[tuple] = []
+        self.started = time.perf_counter()
+        while (elapsed := time.perf_counter() - self.started) < total:
+            target = users_at(self.stages, elapsed)
+            while len(users) < target:
+                stop = asyncio.Event()
+                task = asyncio.create_task(self._user(browser, len(self._tasks), stop))
+                self._tasks.append(task)
+                users.append((task, stop))
+            while len(users) > target:
+                # The newest user finishes its current iteration and leaves
+                _, stop = users.pop()
+                stop.set()
+            # Readiness timings and page metrics are only collected per test; don't let them pile up here
+            drain_readiness_log()
+            web_vitals.drain_metrics_log()
+            await asyncio.sleep(TICK)
+        for _, stop in users:
+            stop.set()
+        # Stopped users finish the iteration they are in
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.elapsed = time.perf_counter() - self.started
+        return self.samples
+
+    async def _user(self, browser: Browser, user: int, stop: asyncio.Event):
+        context = await self._new_context(browser)
+        try:
+            while not stop.is_set():
+                if not await self._iteration(context, user):
+                    # Start over from a clean context after a broken iteration
+                    await context.close()
+                    context = await self._new_context(browser)
+                if self.think_time:
+                    await asyncio.sleep(self.think_time)
+        finally:
+            await context.close()
+
+    async def _new_context(self, browser: Browser) -> BrowserContext:
+        context = await browser.new_context(**self.context_args)
+        context.set_default_timeout(action_timeout("default"))
+        context.set_default_navigation_timeout(action_timeout("navigate"))
+        await context.new_page()
+        return context
+
+    async def _iteration(self, context: BrowserContext, user: int) -> bool:
+        """One login attempt; returns False when the context should be replaced"""
+        page = context.pages[0]
+        login_page = AsyncLoginPage(page)
+        try:
+            with self._step("iteration", user) as iteration:
+                with self._step("ready", user):
+                    await login_page.navigate_to_login(self.base_url)
+                with self._step("submit", user):
+                    await login_page.login(self.username, self.password)
+                with self._step("outcome", user) as step:
+                    outcome = await login_page.wait_for_outcome()
+                    step["ok"] = outcome.kind != "none" and self.expect in ("any", outcome.kind)
+                iteration["ok"] = step["ok"]
+            # Next iteration starts logged out
+            await context.clear_cookies()
+            await page.evaluate("() => { localStorage.clear(); sessionStorage.clear(); }")
+            return True
+        except (PlaywrightError, PageNotReadyError):
+            return False
+
+    @contextmanager
+    def _step(self, step: str, user: int):
+        state = {"ok": True}
+        started = time.perf_counter()
+        try:
+            yield state
+        except Exception:
+            state["ok"] = False
+            raise
+        finally:
+            self.samples.append(Sample(
+                step=step,
+                offset_s=round(started - self.started, 3),
+                duration_ms=round((time.perf_counter() - started) * 1000, 1),
+                ok=state["ok"],
+                user=user,
+            ))
+
+
+def write_results(directory: str, name: str, meta: Dict, rows: List[Dict], samples: List[Sample]) -> str:
+    """Write <name>.json (meta and per-step rows), <name>.csv (rows) and <name>-samples.csv"""
+    os.makedirs(directory, exist_ok=True)
+    json_path = os.path.join(directory, f"{name}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "steps": rows}, f, indent=2)
+    with open(os.path.join(directory, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["label", *rows[0].keys()])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({"label": meta["label"], **row})
+    with open(os.path.join(directory, f"{name}-samples.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(asdict(samples[0]).keys()) if samples else ["step"])
+        writer.writeheader()
+        for sample in samples:
+            writer.writerow(asdict(sample))
+    return json_path
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    # The profile is applied first, since the other defaults come from it
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument("--profile", choices=sorted(Config.PROFILES),
+                                default=os.getenv("CONFIG_PROFILE", "load"), help="Config profile (default: load)")
+    profile, _ = profile_parser.parse_known_args(argv)
+    Config.use_profile(profile.profile)
+    parser = argparse.ArgumentParser(description="Stress the login flow with the page objects", parents=[profile_parser])
+    parser.add_argument("--target", choices=["local", "remote"], default=Config.TARGET,
+                        help="Remote BASE_URL or the bundled local mock login server")
+    parser.add_argument("--users", type=int, default=Config.LOAD_USERS, help="Concurrent users to ramp up to")
+    parser.add_argument("--ramp-up", type=float, default=Config.LOAD_RAMP_UP, help="Seconds to reach --users")
+    parser.add_argument("--duration", type=float, default=Config.LOAD_DURATION, help="Seconds to hold --users")
+    parser.add_argument("--stages", help="Custom profile as seconds:users,... (overrides the three above)")
+    parser.add_argument("--username", default=Config.VALID_USERNAME)
+    parser.add_argument("--password", default=Config.VALID_PASSWORD)
+    parser.add_argument("--expect", choices=["success", "error", "any"], default="any",
+                        help="Outcome that counts as a successful iteration")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds each user waits between logins")
+    parser.add_argument("--label", default=os.getenv("BUILD_ID", ""), help="Build label stored with the results")
+    parser.add_argument("--output", default=Config.LOAD_RESULTS_PATH, help="Directory for the result files")
+    parser.add_argument("--baseline", help="Results JSON of a previous build to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Fail when a step's p95 is this many percent slower than the baseline")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> int:
+    stages = parse_stages(args.stages) if args.stages else [Stage(args.ramp_up, args.users),
+                                                            Stage(args.duration, args.users)]
+    server = None
+    base_url = Config.BASE_URL
+    if args.target == "local":
+        server = MockLoginServer(MockAuthSettings(
+            users={args.username: args.password},
+            latency_ms=Config.MOCK_AUTH_LATENCY_MS,
+            page_latency_ms=Config.MOCK_PAGE_LATENCY_MS,
+        )).start()
+        base_url = server.url
+    runner = LoadRunner(base_url, stages, args.username, args.password, args.expect, args.think_time)
+    started_at = datetime.now(timezone.utc)
+    try:
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(headless=True, args=list(Config.LAUNCH_FLAGS))
+            samples = await runner.run(browser)
+            await browser.close()
+    finally:
+        if server is not None:
+            server.stop()
+
+    rows = summarize(samples, runner.elapsed)
+    meta = {
+        "label": args.label,
+        "target": args.target,
+        "base_url": base_url,
+        "stages": [asdict(stage) for stage in stages],
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "elapsed_s": round(runner.elapsed, 1),
+        "config": Config.resolved(),
+    }
+    name = f"load-{started_at:%Y%m%d-%H%M%S}"
+    path = write_results(args.output, name, meta, rows, samples)
+
+    print(f"{'step':<10}{'count':>7}{'errors':>8}{'per s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for row in rows:
+        print(f"{row['step']:<10}{row['count']:>7}{row['errors']:>8}{row['throughput_per_s']:>8}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+    print(f"Results: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(rows, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    return asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
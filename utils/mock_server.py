@@ -0,0 +1,117 @@
+"""
+Local mock login server
+Serves a replica of the login page (same placeholders, submit button, alert and
+forgot-password button as LoginPage expects) and a fake auth endpoint, so the
+suite can run offline with configurable auth responses and latency
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+SITE_DIR = os.path.join(os.path.dirname(__file__), "mock_site")
+AUTH_PATH = "/auth/login"
+
+
+@dataclass
+class MockAuthSettings:
+    """How the fake auth endpoint answers"""
+    users: Dict[str, str] = field(default_factory=dict)
+    latency_ms: int = 0  # Added to every auth response
+    page_latency_ms: int = 0  # Added to every page load
+    status_override: Optional[int] = None  # Force this status for every auth call (e.g. 500)
+    error_message: str = "Incorrect username or password."
+
+
+class MockLoginServer:
+    """In-process HTTP server running on a free local port"""
+
+    def __init__(self, settings: MockAuthSettings, host: str = "127.0.0.1", port: int = 0):
+        self.defaults = settings
+        self.settings = MockAuthSettings(**vars(settings))
+        self.requests_served = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-login-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLoginServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def configure(self, **changes):
+        """Change how auth answers, e.g. configure(latency_ms=800) or configure(status_override=503)"""
+        for name, value in changes.items():
+            if not hasattr(self.settings, name):
+                raise AttributeError(f"Unknown mock auth setting: {name}")
+            setattr(self.settings, name, value)
+
+    def reset(self):
+        """Go back to the settings the server was started with"""
+        self.settings = MockAuthSettings(**vars(self.defaults))
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests_served += 1
+                path = self.path.split("?", 1)[0]
+                if path != "/" and path != "/index.html":
+                    self._send(404, b"Not found", "text/plain")
+                    return
+                time.sleep(server.settings.page_latency_ms / 1000)
+                with open(os.path.join(SITE_DIR, "index.html"), "rb") as f:
+                    self._send(200, f.read(), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                server.requests_served += 1
+                if self.path != AUTH_PATH:
+                    self._send(404, b"Not found", "text/plain")
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    credentials = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    credentials = {}
+                settings = server.settings
+                time.sleep(settings.latency_ms / 1000)
+                username = credentials.get("username", "")
+                if settings.status_override is not None:
+                    status, body = settings.status_override, {"message": f"Mock auth returned {settings.status_override}"}
+                elif username in settings.users and settings.users[username] == credentials.get("password"):
+                    token = uuid.uuid4().hex
+                    status, body = 200, {"AuthenticationResult": {"IdToken": token, "ExpiresIn": 3600}}
+                    self._cookie = f"session={token}; Path=/; HttpOnly"
+                else:
+                    status, body = 400, {"__type": "NotAuthorizedException", "message": settings.error_message}
+                self._send(status, json.dumps(body).encode("utf-8"), "application/json")
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                cookie = getattr(self, "_cookie", None)
+                if cookie:
+                    self.send_header("Set-Cookie", cookie)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,260 @@
+"""
+Network condition profiles
+Named client network conditions (3g, high-latency, flaky-auth, ...) applied to a
+test's pages: bandwidth and latency through CDP network throttling (Chromium), and
+delays and faults injected into the auth requests of the login flow
+"""
+import asyncio
+import random
+import re
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from playwright.sync_api import Route
+from playwright.sync_api import Error as PlaywrightError
+
+from utils.stats import percentile
+
+
+# Only API calls are delayed or failed; the login document itself may match the auth pattern
+AUTH_RESOURCE_TYPES = ("xhr", "fetch")
+# Profile name of tests that run without one, shown next to the profiles for comparison
+NO_PROFILE = "none"
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    """Client network conditions; 0 means unthrottled"""
+    name: str
+    latency_ms: float = 0  # Added round trip time of every request (CDP)
+    download_kbps: float = 0
+    upload_kbps: float = 0
+    auth_delay_ms: float = 0  # Extra delay of auth API calls
+    auth_jitter_ms: float = 0  # Random extra delay of up to this much on top
+    auth_failure_rate: float = 0.0  # Share of auth API calls that fail
+    auth_failure_status: Optional[int] = None  # Status of a failed call; None drops the connection
+
+    @property
+    def throttles(self) -> bool:
+        return bool(self.latency_ms or self.download_kbps or self.upload_kbps)
+
+    @property
+    def touches_auth(self) -> bool:
+        return bool(self.auth_delay_ms or self.auth_jitter_ms or self.auth_failure_rate)
+
+    def emulation(self) -> Dict:
+        """Network.emulateNetworkConditions parameters (throughput in bytes per second, -1 unthrottled)"""
+        return {
+            "offline": False,
+            "latency": self.latency_ms,
+            "downloadThroughput": self.download_kbps * 1000 / 8 if self.download_kbps else -1,
+            "uploadThroughput": self.upload_kbps * 1000 / 8 if self.upload_kbps else -1,
+        }
+
+
+PROFILES: Dict[str, NetworkProfile] = {
+    # Chrome DevTools "Fast 3G"
+    "3g": NetworkProfile("3g", latency_ms=562.5, download_kbps=1440, upload_kbps=675),
+    # Chrome DevTools "Slow 3G"
+    "slow-3g": NetworkProfile("slow-3g", latency_ms=2000, download_kbps=400, upload_kbps=400),
+    # Fast link far from the servers, with a slow identity provider
+    "high-latency": NetworkProfile("high-latency", latency_ms=600, auth_delay_ms=1500, auth_jitter_ms=500),
+    # Auth API that is slow and fails every third call or so
+    "flaky-auth": NetworkProfile("flaky-auth", auth_delay_ms=300, auth_jitter_ms=700,
+                                 auth_failure_rate=0.3, auth_failure_status=503),
+}
+
+
+def get_profile(name: str) -> NetworkProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown network profile {name!r}, use one of {sorted(PROFILES)}") from None
+
+
+class BaseNetworkConditions:
+    """State shared by the sync and async appliers (everything but the page calls)
+
+    seed makes the injected delays and faults of a test the same on every run.
+    """
+
+    def __init__(self, profile: NetworkProfile, context, page, browser_name: str, auth_url_pattern: str,
+                 seed: str = ""):
+        self.profile = profile
+        self.context = context
+        self.page = page
+        self.auth_url_pattern = re.compile(auth_url_pattern, re.IGNORECASE)
+        self.throttled = profile.throttles and browser_name == "chromium"
+        self.random = random.Random(f"{profile.name}:{seed}")
+        self.cdp = None
+        self.stats = {"profile": profile.name, "throttled": self.throttled, "auth_requests": 0,
+                      "auth_delay_ms": 0.0, "auth_faults": 0}
+
+    def _matches(self, route) -> bool:
+        return route.request.resource_type in AUTH_RESOURCE_TYPES and bool(
+            self.auth_url_pattern.search(route.request.url))
+
+    def _plan(self):
+        """Delay in ms and whether to fail the next auth call"""
+        delay = self.profile.auth_delay_ms + self.random.uniform(0, self.profile.auth_jitter_ms)
+        fail = self.random.random() < self.profile.auth_failure_rate
+        self.stats["auth_requests"] += 1
+        self.stats["auth_delay_ms"] = round(self.stats["auth_delay_ms"] + delay, 1)
+        self.stats["auth_faults"] += int(fail)
+        return delay, fail
+
+    def _fault_args(self) -> Dict:
+        return {"status": self.profile.auth_failure_status, "body": "Injected by network profile "
+                + self.profile.name, "content_type": "text/plain"}
+
+
+class NetworkConditions(BaseNetworkConditions):
+    """Applies a profile to a sync context and its page until stop()"""
+
+    def start(self) -> "NetworkConditions":
+        if self.throttled:
+            self.cdp = self.context.new_cdp_session(self.page)
+            self.cdp.send("Network.enable")
+            self.cdp.send("Network.emulateNetworkConditions", self.profile.emulation())
+        if self.profile.touches_auth:
+            # Registered after the NetworkRouter, so auth calls come here first and fall back to it
+            self.context.route(self.auth_url_pattern, self._handle)
+        return self
+
+    def stop(self) -> Dict:
+        """Lift the conditions (pooled contexts are reused) and return the stats"""
+        try:
+            if self.profile.touches_auth:
+                self.context.unroute(self.auth_url_pattern, self._handle)
+            if self.cdp is not None:
+                self.cdp.send("Network.emulateNetworkConditions", NetworkProfile(NO_PROFILE).emulation())
+                self.cdp.detach()
+        except PlaywrightError:
+            pass
+        return dict(self.stats)
+
+    def _handle(self, route: Route):
+        if not self._matches(route):
+            route.fallback()
+            return
+        delay, fail = self._plan()
+        try:
+            if delay:
+                # Waits without blocking the event dispatch of the other requests
+                self.page.wait_for_timeout(delay)
+            if not fail:
+                route.fallback()
+            elif self.profile.auth_failure_status is None:
+                route.abort("connectionreset")
+            else:
+                route.fulfill(**self._fault_args())
+        except PlaywrightError:
+            # The page closed while the call was held back; its request went with it
+            pass
+
+
+class AsyncNetworkConditions(BaseNetworkConditions):
+    """Applies a profile to an async context and its page until stop()"""
+
+    async def start(self) -> "AsyncNetworkConditions":
+        if self.throttled:
+            self.cdp = await self.context.new_cdp_session(self.page)
+            await self.cdp.send("Network.enable")
+            await self.cdp.send("Network.emulateNetworkConditions", self.profile.emulation())
+        if self.profile.touches_auth:
+            await self.context.route(self.auth_url_pattern, self._handle)
+        return self
+
+    async def stop(self) -> Dict:
+        """Lift the conditions and return the stats"""
+        try:
+            if self.profile.touches_auth:
+                await self.context.unroute(self.auth_url_pattern, self._handle)
+            if self.cdp is not None:
+                await self.cdp.send("Network.emulateNetworkConditions", NetworkProfile(NO_PROFILE).emulation())
+                await self.cdp.detach()
+        except PlaywrightError:
+            pass
+        return dict(self.stats)
+
+    async def _handle(self, route):
+        if not self._matches(route):
+            await route.fallback()
+            return
+        delay, fail = self._plan()
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        try:
+            if not fail:
+                await route.fallback()
+            elif self.profile.auth_failure_status is None:
+                await route.abort("connectionreset")
+            else:
+                await route.fulfill(**self._fault_args())
+        except PlaywrightError:
+            # The page closed while the call was held back; its request went with it
+            pass
+
+
+@dataclass
+class ProfileSummary:
+    """Results of the tests run under one network profile"""
+    profile: str
+    tests: int = 0
+    passed: int = 0
+    failed: int = 0
+    readiness_p50_ms: Optional[float] = None
+    readiness_p95_ms: Optional[float] = None
+    outcome_p50_ms: Optional[float] = None
+    outcome_p95_ms: Optional[float] = None
+    auth_faults: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def summarize_profiles(stats: Dict[str, List]) -> List[ProfileSummary]:
+    """Pass rate, readiness and login outcome latency per network profile, from the terminal reporter's stats
+
+    Tests without a profile are listed as "none" for comparison; nothing is returned
+    when no test ran under a profile.
+    """
+    outcomes: Dict[str, str] = {}
+    properties: Dict[str, Dict] = {}
+    for reports in stats.values():
+        for report in reports:
+            when = getattr(report, "when", None)
+            # Warnings have no phase; the first attempt of a rerun test has the outcome "rerun"
+            if when is None or report.outcome not in ("passed", "failed", "skipped"):
+                continue
+            if when == "call" or (when == "setup" and not report.passed):
+                outcomes[report.nodeid] = report.outcome
+            elif when == "teardown":
+                properties[report.nodeid] = dict(report.user_properties)
+    groups: Dict[str, Dict[str, List]] = {}
+    for nodeid, outcome in outcomes.items():
+        props = properties.get(nodeid, {})
+        group = groups.setdefault(props.get("network_profile", NO_PROFILE),
+                                  {"outcomes": [], "readiness": [], "latency": [], "faults": 0})
+        group["outcomes"].append(outcome)
+        if props.get("readiness_ms") is not None:
+            group["readiness"].append(props["readiness_ms"])
+        group["latency"].extend(props.get("outcome_ms", []))
+        group["faults"] += props.get("network_conditions", {}).get("auth_faults", 0)
+    if set(groups) <= {NO_PROFILE}:
+        return []
+    summaries = []
+    for name, group in sorted(groups.items(), key=lambda item: (item[0] != NO_PROFILE, item[0])):
+        readiness, latency = sorted(group["readiness"]), sorted(group["latency"])
+        summaries.append(ProfileSummary(
+            profile=name,
+            tests=len(group["outcomes"]),
+            passed=group["outcomes"].count("passed"),
+            failed=group["outcomes"].count("failed"),
+            readiness_p50_ms=round(percentile(readiness, 50), 1) if readiness else None,
+            readiness_p95_ms=round(percentile(readiness, 95), 1) if readiness else None,
+            outcome_p50_ms=round(percentile(latency, 50), 1) if latency else None,
+            outcome_p95_ms=round(percentile(latency, 95), 1) if latency else None,
+            auth_faults=group["faults"],
+        ))
+    return summaries
@@ -0,0 +1,326 @@
+"""
+Network router
+Blocks or stubs requests the tests don't need (fonts, images, analytics) and serves
+repeated static assets from an on-disk cache of HAR entries, counting what was saved;
+assets are replayed only as long as their Cache-Control/Expires headers allow
+"""
+import base64
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Pattern, Sequence, Set, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from playwright.sync_api import Route
+from playwright.sync_api import Error as PlaywrightError
+
+
+ALLOW, DENY, STUB = "allow", "deny", "stub"
+CACHEABLE_TYPES = ("stylesheet", "script", "font", "image")
+RESOURCE_TYPES = (
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack",
+    "xhr", "fetch", "eventsource", "websocket", "manifest", "other",
+)
+# Replayed bodies are already decoded, so these must not be replayed with them
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+@dataclass
+class RouteRule:
+    """Decides what happens to requests matching a URL pattern and/or resource types"""
+    action: str
+    url: Union[str, Pattern, None] = None  # Glob ("*fonts.googleapis.com*") or compiled regex
+    resource_types: Sequence[str] = ()
+    status: int = 200
+    body: str = ""
+    content_type: str = "text/plain"
+
+    def matches(self, url: str, resource_type: str) -> bool:
+        if self.resource_types and resource_type not in self.resource_types:
+            return False
+        if self.url is None:
+            return bool(self.resource_types)
+        if isinstance(self.url, re.Pattern):
+            return bool(self.url.search(url))
+        return fnmatch.fnmatch(url, self.url)
+
+
+def allow(url=None, resource_types=()) -> RouteRule:
+    return RouteRule(ALLOW, url, tuple(resource_types))
+
+
+def deny(url=None, resource_types=()) -> RouteRule:
+    return RouteRule(DENY, url, tuple(resource_types))
+
+
+def stub(url=None, body: str = "", status: int = 200, content_type: str = "text/plain", resource_types=()) -> RouteRule:
+    return RouteRule(STUB, url, tuple(resource_types), status, body, content_type)
+
+
+def rules_from_marker(kwargs: Dict) -> List[RouteRule]:
+    """Turn @pytest.mark.network(allow=[...], deny=[...], stub={...}) into rules
+
+    Entries of allow/deny are URL globs, or resource types such as "image" or "font".
+    """
+    rules = []
+    for action, factory in ((ALLOW, allow), (DENY, deny)):
+        for entry in kwargs.get(action, ()):
+            if entry in RESOURCE_TYPES:
+                rules.append(factory(resource_types=[entry]))
+            else:
+                rules.append(factory(entry))
+    for url, body in kwargs.get(STUB, {}).items():
+        rules.append(stub(url, body=body))
+    return rules
+
+
+def default_rules(deny_types: Sequence[str], stub_urls: Sequence[str]) -> List[RouteRule]:
+    """Framework-wide rules: drop heavy resource types and answer analytics with empty stubs"""
+    rules = [stub(url) for url in stub_urls]
+    if deny_types:
+        rules.append(deny(resource_types=deny_types))
+    return rules
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> float:
+    """Seconds a response may be replayed as a private cache would (RFC 9111); 0 when it must not be
+
+    max-age, else Expires, else 10% of the time since Last-Modified; Age counts against it.
+    """
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    if "no-store" in directives or "no-cache" in directives or headers.get("vary", "").strip() == "*":
+        return 0
+    date = _http_date(headers.get("date")) or time.time()
+    lifetime = 0.0
+    if "max-age" in directives:
+        try:
+            lifetime = int(directives["max-age"])
+        except ValueError:
+            return 0
+    elif "expires" in headers:
+        expires = _http_date(headers["expires"])
+        lifetime = expires - date if expires is not None else 0
+    elif "last-modified" in headers:
+        modified = _http_date(headers["last-modified"])
+        lifetime = (date - modified) / 10 if modified is not None else 0
+    try:
+        age = int(headers.get("age", 0))
+    except ValueError:
+        age = 0
+    return max(lifetime - age, 0)
+
+
+class HarCache:
+    """One HAR entry per URL on disk, used to replay static assets
+
+    An entry is replayed until its freshness lifetime ends (at most ttl seconds) and only to
+    requests that send the same values of the headers its response Varies on.
+    """
+
+    def __init__(self, directory: str, ttl: int):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".har.json")
+
+    def get(self, url: str, request_headers: Dict[str, str] = None) -> Optional[Dict]:
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() >= entry.get("expires", 0):
+            return None
+        request_headers = request_headers or {}
+        if any(request_headers.get(name) != value for name, value in entry.get("vary", {}).items()):
+            return None
+        return entry
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes,
+            request_headers: Dict[str, str] = None) -> bool:
+        """Store a response unless its headers forbid replaying it; whether it was stored"""
+        lifetime = min(freshness_lifetime(headers), self.ttl)
+        if lifetime <= 0:
+            return False
+        request_headers = request_headers or {}
+        vary = [name.strip().lower() for name in headers.get("vary", "").split(",") if name.strip()]
+        entry = {
+            "expires": time.time() + lifetime,
+            "vary": {name: request_headers.get(name) for name in vary},
+            "request": {"method": "GET", "url": url},
+            "response": {
+                "status": status,
+                "headers": [
+                    {"name": name, "value": value} for name, value in headers.items()
+                    if name.lower() not in DROPPED_HEADERS
+                ],
+                "content": {
+                    "size": len(body),
+                    "mimeType": headers.get("content-type", ""),
+                    "encoding": "base64",
+                    "text": base64.b64encode(body).decode("ascii"),
+                },
+            },
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        return True
+
+
+class BaseNetworkRouter:
+    """Rules, cache and stats shared by the sync and async routers (everything but the route calls)"""
+
+    # Router currently attached to each context, so page objects can add their own rules
+    _active: "WeakKeyDictionary[object, BaseNetworkRouter]" = WeakKeyDictionary()
+
+    def __init__(self, context, rules: List[RouteRule], cache: Optional[HarCache] = None):
+        self.context = context
+        self.rules = list(rules)
+        self.cache = cache
+        self.stats = {"requests": 0, "blocked": 0, "stubbed": 0, "cache_hits": 0, "bytes_saved": 0}
+        # URLs whose responses can't be replayed go straight to the network after the first one
+        self._uncacheable: Set[str] = set()
+
+    @classmethod
+    def for_context(cls, context) -> Optional["BaseNetworkRouter"]:
+        return cls._active.get(context)
+
+    def add_rules(self, rules: Sequence[RouteRule]):
+        """Put rules in front of the existing ones (used by page objects)"""
+        self.rules[:0] = [rule for rule in rules if rule not in self.rules]
+
+    def decide(self, url: str, resource_type: str) -> RouteRule:
+        for rule in self.rules:
+            if rule.matches(url, resource_type):
+                return rule
+        return RouteRule(ALLOW)
+
+    def _plan(self, request) -> Tuple[str, object]:
+        """What to do with a request: (DENY, None), (STUB, rule), ("replay", HAR response), ("fetch", None)
+        or (ALLOW, None) to let it through untouched"""
+        self.stats["requests"] += 1
+        rule = self.decide(request.url, request.resource_type)
+        if rule.action == DENY:
+            self.stats["blocked"] += 1
+            return DENY, None
+        if rule.action == STUB:
+            self.stats["stubbed"] += 1
+            return STUB, rule
+        if (self.cache is None or request.method != "GET" or request.resource_type not in CACHEABLE_TYPES
+                or request.url in self._uncacheable):
+            return ALLOW, None
+        entry = self.cache.get(request.url, request.headers)
+        if entry is None:
+            return "fetch", None
+        response = entry["response"]
+        body = base64.b64decode(response["content"]["text"])
+        self.stats["cache_hits"] += 1
+        self.stats["bytes_saved"] += len(body)
+        return "replay", {
+            "status": response["status"],
+            "headers": {header["name"]: header["value"] for header in response["headers"]},
+            "body": body,
+        }
+
+    def _store(self, request, status: int, headers: Dict[str, str], body: bytes):
+        if status != 200 or not self.cache.put(request.url, status, headers, body, request.headers):
+            self._uncacheable.add(request.url)
+
+
+class NetworkRouter(BaseNetworkRouter):
+    """Routes every request of a context through the rule list for one test"""
+
+    def start(self) -> "NetworkRouter":
+        self.context.route("**/*", self._handle)
+        self._active[self.context] = self
+        return self
+
+    def stop(self) -> Dict:
+        """Detach from the context (so pooled contexts stay clean) and return the stats"""
+        self._active.pop(self.context, None)
+        try:
+            self.context.unroute("**/*", self._handle)
+        except PlaywrightError:
+            pass
+        return dict(self.stats)
+
+    def _handle(self, route: Route):
+        request = route.request
+        action, payload = self._plan(request)
+        if action == DENY:
+            route.abort("blockedbyclient")
+        elif action == STUB:
+            route.fulfill(status=payload.status, body=payload.body, content_type=payload.content_type)
+        elif action == "replay":
+            route.fulfill(**payload)
+        elif action == ALLOW:
+            route.fallback()
+        else:
+            try:
+                response = route.fetch()
+            except PlaywrightError:
+                route.fallback()
+                return
+            body = response.body()
+            self._store(request, response.status, response.headers, body)
+            route.fulfill(response=response, body=body)
+
+
+class AsyncNetworkRouter(BaseNetworkRouter):
+    """NetworkRouter for a context of playwright.async_api"""
+
+    async def start(self) -> "AsyncNetworkRouter":
+        await self.context.route("**/*", self._handle)
+        self._active[self.context] = self
+        return self
+
+    async def stop(self) -> Dict:
+        """Detach from the context and return the stats"""
+        self._active.pop(self.context, None)
+        try:
+            await self.context.unroute("**/*", self._handle)
+        except PlaywrightError:
+            pass
+        return dict(self.stats)
+
+    async def _handle(self, route):
+        request = route.request
+        action, payload = self._plan(request)
+        if action == DENY:
+            await route.abort("blockedbyclient")
+        elif action == STUB:
+            await route.fulfill(status=payload.status, body=payload.body, content_type=payload.content_type)
+        elif action == "replay":
+            await route.fulfill(**payload)
+        elif action == ALLOW:
+            await route.fallback()
+        else:
+            try:
+                response = await route.fetch()
+            except PlaywrightError:
+                await route.fallback()
+                return
+            body = await response.body()
+            self._store(request, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
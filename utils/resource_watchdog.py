@@ -0,0 +1,274 @@
+"""
+Browser resource watchdog
+Samples a worker's browser around every test (process RSS, JS heap, DOM nodes,
+open pages), writes what each test added to the report and relaunches the browser
+between tests once a limit is exceeded, so long runs stay within the runner's memory
+"""
+import os
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+from playwright.sync_api import Browser, Page
+from playwright.sync_api import Error as PlaywrightError
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+MB = 1024 * 1024
+# Outside Chromium only the DOM is counted; performance.memory is Chromium-only
+PAGE_METRICS_SCRIPT = """
+() => ({
+    nodes: document.getElementsByTagName('*').length,
+    heap: performance.memory ? performance.memory.usedJSHeapSize : null,
+})
+"""
+
+
+def process_tree() -> Dict[int, List[int]]:
+    """Child pids of every process, from psutil or /proc"""
+    tree: Dict[int, List[int]] = defaultdict(list)
+    if psutil is not None:
+        for process in psutil.process_iter(["ppid"]):
+            tree[process.info["ppid"]].append(process.pid)
+        return tree
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return tree
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8", errors="replace") as f:
+                # The command name in parentheses may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        tree[ppid].append(int(entry))
+    return tree
+
+
+def worker_browser_pids() -> List[int]:
+    """Processes of the browsers this process launched: everything below its Playwright drivers"""
+    tree = process_tree()
+    pids = []
+    stack = [pid for driver in tree.get(os.getpid(), []) for pid in tree.get(driver, [])]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(tree.get(pid, []))
+    return pids
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """Resident set size of a process in bytes, None if it is gone or can't be read"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RecyclableBrowser:
+    """A launched browser behind a stable object, so it can be relaunched while fixtures hold on to it"""
+
+    def __init__(self, launch: Callable[[], Browser]):
+        self.launch = launch
+        self.launches = 0
+        self._browser: Optional[Browser] = None
+        self._launch()
+
+    def _launch(self):
+        self._browser = self.launch()
+        self.launches += 1
+
+    @property
+    def browser(self) -> Browser:
+        return self._browser
+
+    def new_context(self, **kwargs):
+        return self._browser.new_context(**kwargs)
+
+    def new_page(self, **kwargs):
+        return self._browser.new_page(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+    def recycle(self):
+        """Close the browser, and every context and process of it, and launch a new one"""
+        self.close()
+        self._launch()
+
+    def close(self):
+        try:
+            self._browser.close()
+        except PlaywrightError:
+            pass
+
+
+@dataclass
+class ResourceLimits:
+    """Usage after a test that gets the browser recycled; 0 disables a limit"""
+    rss_mb: float = 0
+    js_heap_mb: float = 0
+    dom_nodes: int = 0
+    pages: int = 0
+
+    def exceeded(self, usage: Dict) -> Optional[str]:
+        """The first limit the usage is over, e.g. "rss_mb 2310.4 > 2048", or None"""
+        for name in ("rss_mb", "js_heap_mb", "dom_nodes", "pages"):
+            limit, value = getattr(self, name), usage.get(name)
+            if limit and value is not None and value > limit:
+                return f"{name} {value} > {limit}"
+        return None
+
+
+class ResourceWatchdog:
+    """Samples a worker's browser between tests and relaunches it over a limit
+
+    The browser must have a recycle() method (RecyclableBrowser or SharedBrowser);
+    the pool's idle contexts are closed before and warmed again after a recycle.
+    Process RSS comes from CDP SystemInfo in Chromium, else from the processes below
+    this worker. With shared set (a browser server other workers use too) that is
+    the whole server, which a worker's recycle doesn't shrink: it is reported, but
+    not limited or attributed to tests.
+    """
+
+    def __init__(self, browser, browser_name: str, limits: ResourceLimits, pool=None, shared: bool = False):
+        self.browser = browser
+        self.chromium = browser_name == "chromium"
+        self.shared = shared
+        self.limits = replace(limits, rss_mb=0) if shared else limits
+        self.pool = pool
+        self._page_start: Dict = {}
+        self._page_end: Dict = {}
+        self.last = self.sample_browser()
+
+    def sample_browser(self) -> Dict:
+        """RSS of every browser process, and the contexts and pages open in the browser"""
+        rss = [value for value in map(process_rss, self._pids()) if value is not None]
+        try:
+            contexts = self.browser.contexts
+        except PlaywrightError:
+            contexts = []
+        return {
+            "rss_mb": round(sum(rss) / MB, 1) if rss else None,
+            "processes": len(rss),
+            "contexts": len(contexts),
+            "pages": sum(len(context.pages) for context in contexts),
+        }
+
+    def _pids(self) -> List[int]:
+        if self.chromium:
+            try:
+                session = self.browser.new_browser_cdp_session()
+                try:
+                    info = session.send("SystemInfo.getProcessInfo")
+                finally:
+                    session.detach()
+                return [process["id"] for process in info["processInfo"]]
+            except (PlaywrightError, KeyError):
+                pass
+        return worker_browser_pids()
+
+    def sample_page(self, page: Page) -> Dict:
+        """JS heap, live DOM nodes and event listeners of a page (heap and listeners only in Chromium)"""
+        try:
+            if page.is_closed():
+                return {}
+            if self.chromium:
+                session = page.context.new_cdp_session(page)
+                try:
+                    session.send("Performance.enable")
+                    metrics = {metric["name"]: metric["value"]
+                               for metric in session.send("Performance.getMetrics")["metrics"]}
+                finally:
+                    session.detach()
+                return {
+                    "js_heap_mb": round(metrics["JSHeapUsedSize"] / MB, 2),
+                    "dom_nodes": int(metrics["Nodes"]),
+                    "listeners": int(metrics["JSEventListeners"]),
+                }
+            values = page.evaluate(PAGE_METRICS_SCRIPT)
+            heap = values["heap"]
+            return {"js_heap_mb": None if heap is None else round(heap / MB, 2), "dom_nodes": values["nodes"]}
+        except (PlaywrightError, KeyError):
+            return {}
+
+    def page_started(self, page: Page):
+        """Sample the test's page before the test"""
+        self._page_start = self.sample_page(page)
+        self._page_end = {}
+
+    def page_finished(self, page: Page):
+        """Sample the test's page after the test, before its context is reset"""
+        self._page_end = self.sample_page(page)
+
+    def finish_test(self) -> Dict:
+        """Usage after the test and what it added, recycling the browser if a limit is exceeded
+
+        Page deltas are over the test; browser deltas are against the end of the
+        previous test, i.e. what the test left behind.
+        """
+        browser = self.sample_browser()
+        usage = {**browser, **self._page_end}
+        for name, start in (*self.last.items(), *self._page_start.items()):
+            end = usage.get(name)
+            if name == "processes" or (self.shared and name == "rss_mb"):
+                continue
+            if start is not None and end is not None:
+                usage[f"{name}_delta"] = round(end - start, 2)
+        self._page_start, self._page_end = {}, {}
+        reason = self.limits.exceeded(usage)
+        if reason is not None:
+            self.recycle(reason)
+            usage["recycled"] = reason
+            browser = self.sample_browser()
+        self.last = browser
+        return usage
+
+    def recycle(self, reason: str):
+        print(f"Recycling the browser ({reason})")
+        if self.pool is not None:
+            self.pool.close()
+        self.browser.recycle()
+        if self.pool is not None:
+            self.pool.warm(self.pool.max_idle)
+
+
+def summarize_resources(stats: Dict[str, List], top: int = 5) -> Dict:
+    """Tests that grew the browser the most and the recycles, from the terminal reporter's stats"""
+    usages: Dict[str, Dict] = {}
+    for reports in stats.values():
+        for report in reports:
+            if getattr(report, "when", None) == "teardown":
+                usage = dict(report.user_properties).get("resources")
+                if usage is not None:
+                    usages[report.nodeid] = usage
+    if not usages:
+        return {}
+
+    def largest(name: str) -> List:
+        rows = [(usage[name], nodeid) for nodeid, usage in usages.items() if (usage.get(name) or 0) > 0]
+        return sorted(rows, reverse=True)[:top]
+
+    rss = [usage["rss_mb"] for usage in usages.values() if usage.get("rss_mb") is not None]
+    return {
+        "tests": len(usages),
+        "peak_rss_mb": max(rss) if rss else None,
+        "recycled": sorted((nodeid, usage["recycled"]) for nodeid, usage in usages.items() if usage.get("recycled")),
+        "rss_mb_delta": largest("rss_mb_delta"),
+        "js_heap_mb_delta": largest("js_heap_mb_delta"),
+        "dom_nodes_delta": largest("dom_nodes_delta"),
+        "pages_delta": largest("pages_delta"),
+    }
@@ -0,0 +1,165 @@
+"""
+Load-aware xdist scheduling
+Keeps a store of how long each test took in previous runs and hands xdist work
+units out longest first, so slow tests start early instead of forming a tail
+"""
+import json
+import os
+import statistics
+from collections import OrderedDict
+from typing import Dict
+
+from xdist.scheduler import LoadScopeScheduling
+
+
+# Weight of the newest run when smoothing stored durations
+SMOOTHING = 0.5
+
+
+def split_group(nodeid: str):
+    """Split 'path::test@group' into the node id and the group (None when ungrouped)
+
+    Every suffix is stripped: with --dist=loadgroup xdist appends one for xdist_group markers,
+    and a suffix added on top of it must not end up in the node id. The last one is the group.
+    """
+    group = None
+    # Only look past the path and the parametrize brackets, both may contain '@' themselves
+    while nodeid.rfind("@") > max(nodeid.rfind("]"), nodeid.rfind("::")):
+        nodeid, suffix = nodeid.rsplit("@", 1)
+        group = suffix if group is None else group
+    return nodeid, group
+
+
+class DurationStore:
+    """Smoothed duration in seconds of every test, kept in a JSON file across runs"""
+
+    def __init__(self, path: str, default: float = 5.0):
+        self.path = path
+        self.default = default
+        self.durations: Dict[str, float] = {}
+        self._run: Dict[str, float] = {}
+        self._not_run = set()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.durations = json.load(f)
+        except (OSError, ValueError):
+            self.durations = {}
+
+    def estimate(self, nodeid: str) -> float:
+        """Expected duration of a test; unknown tests count as the median known test"""
+        nodeid, _ = split_group(nodeid)
+        if nodeid in self.durations:
+            return self.durations[nodeid]
+        if self.durations:
+            return statistics.median(self.durations.values())
+        return self.default
+
+    def add(self, nodeid: str, duration: float, ran: bool = True):
+        """Add the duration of one phase (setup, call, teardown) of a test of this run"""
+        nodeid, _ = split_group(nodeid)
+        self._run[nodeid] = self._run.get(nodeid, 0.0) + duration
+        if not ran:
+            self._not_run.add(nodeid)
+
+    def save(self) -> int:
+        """Fold this run into the stored durations and write them; returns how many were updated"""
+        updated = 0
+        for nodeid, duration in self._run.items():
+            # A skipped test, or one whose setup broke, says nothing about how long it takes to run
+            if nodeid in self._not_run:
+                continue
+            previous = self.durations.get(nodeid)
+            self.durations[nodeid] = round(
+                duration if previous is None else SMOOTHING * duration + (1 - SMOOTHING) * previous, 3
+            )
+            updated += 1
+        if not updated:
+            return 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.durations, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        return updated
+
+
+class DurationRecorder:
+    """Plugin feeding every test report into a duration store (registered on the controller,
+    where xdist replays the reports of all workers)"""
+
+    def __init__(self, store: DurationStore):
+        self.store = store
+
+    def pytest_runtest_logreport(self, report):
+        ran = not report.skipped and not (report.when == "setup" and report.failed)
+        self.store.add(report.nodeid, report.duration, ran=ran)
+
+    def pytest_sessionfinish(self, session):
+        if not session.config.option.collectonly:
+            self.store.save()
+
+
+class LPTScheduling(LoadScopeScheduling):
+    """Longest processing time first scheduling of xdist work units
+
+    Every test is its own work unit, except tests tagged with a group (an xdist_group
+    marker, or the same login/context args), which stay together on one worker. Units
+    are queued by their estimated total duration, longest first, and each worker pulls
+    the next one when it runs low, which is greedy LPT bin packing.
+    """
+
+    def __init__(self, config, log, store: DurationStore):
+        super().__init__(config, log)
+        self.store = store
+        self.estimates: Dict[str, float] = {}
+
+    def _split_scope(self, nodeid: str) -> str:
+        _, group = split_group(nodeid)
+        return group if group is not None else nodeid
+
+    def schedule(self):
+        """Build the work queue ordered by estimated duration, then start distributing it"""
+        assert self.collection_is_completed
+
+        if self.collection is not None:
+            for node in self.nodes:
+                self._reschedule(node)
+            return
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = list(next(iter(self.registered_collections.values())))
+        if not self.collection:
+            return
+
+        units = OrderedDict()
+        for nodeid in self.collection:
+            scope = self._split_scope(nodeid)
+            units.setdefault(scope, OrderedDict())[nodeid] = False
+            self.estimates[scope] = self.estimates.get(scope, 0.0) + self.store.estimate(nodeid)
+
+        for scope, work_unit in sorted(units.items(), key=lambda item: -self.estimates[item[0]]):
+            self.workqueue[scope] = work_unit
+        self.log(f"LPT queue: {len(units)} units, {sum(self.estimates.values()):.1f}s estimated")
+
+        extra_nodes = len(self.nodes) - len(self.workqueue)
+        for _ in range(max(extra_nodes, 0)):
+            unused_node, _ = self.assigned_work.popitem(last=True)
+            self.log(f"Shutting down unused node {unused_node}")
+            unused_node.shutdown()
+
+        for node in self.nodes:
+            self._assign_work_unit(node)
+        for node in self.nodes:
+            self._reschedule(node)
+
+        if not self.workqueue:
+            for node in self.nodes:
+                node.shutdown()
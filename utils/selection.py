@@ -0,0 +1,363 @@
+"""
+Change-based test selection
+Records which page object classes, methods and selector constants each test
+touches, and with --changed-since=<git-ref> runs only the tests a diff can affect;
+changes to shared files, or to files the map knows nothing about, run everything
+"""
+import ast
+import fnmatch
+import functools
+import inspect
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import pytest
+
+from utils.scheduler import split_group
+
+
+# Symbols look like "pages.login_page:LoginPage.login", "pages.login_page:LoginPage" or "pages.login_page"
+_touched: Optional[Set[str]] = None
+_page_classes: List[type] = []
+_selector_index: Dict[str, Set[str]] = {}
+
+
+def module_symbol(cls: type, member: str = None) -> str:
+    symbol = f"{cls.__module__}:{cls.__qualname__}"
+    return f"{symbol}.{member}" if member else symbol
+
+
+def start_recording():
+    global _touched
+    _touched = set()
+
+
+def finish_recording() -> Set[str]:
+    global _touched
+    touched, _touched = _touched, None
+    return touched or set()
+
+
+def record_page(cls: type):
+    """A page object was created: its class and the page classes it inherits from are in use"""
+    if _touched is not None:
+        _touched.update(module_symbol(klass) for klass in cls.__mro__ if klass in _page_classes)
+
+
+def record_selector(selector: str):
+    """A selector was used: every page constant declaring that selector is in use (aliases included)"""
+    if _touched is None:
+        return
+    if not _selector_index:
+        for cls in _page_classes:
+            for name, value in vars(cls).items():
+                if name.isupper() and isinstance(value, str):
+                    _selector_index.setdefault(value, set()).add(module_symbol(cls, name))
+    _touched.update(_selector_index.get(selector, ()))
+
+
+def tracked(func):
+    """Record every call of a page object method (sync or async) as a dependency of the current test"""
+    symbol = f"{func.__module__}:{func.__qualname__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _touched is not None:
+                _touched.add(symbol)
+            return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _touched is not None:
+                _touched.add(symbol)
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def track_page_class(cls: type):
+    """Wrap the public methods a page class defines with tracked()"""
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(value):
+            setattr(cls, name, tracked(value))
+    _page_classes.append(cls)
+    _selector_index.clear()
+
+
+class DependencyMap:
+    """Symbols each test touched in its last run, kept in a JSON file across runs"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tests: Dict[str, List[str]] = {}
+        self._updated = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.tests = json.load(f)
+        except (OSError, ValueError):
+            self.tests = {}
+
+    def update(self, nodeid: str, symbols: Iterable[str]):
+        nodeid, _ = split_group(nodeid)
+        self.tests[nodeid] = sorted(symbols)
+        self._updated += 1
+
+    def save(self) -> int:
+        """Write the map if this run recorded anything; tests that were not run keep their entry"""
+        if not self._updated:
+            return 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.tests, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        return self._updated
+
+    def modules(self) -> Set[str]:
+        return {symbol.split(":", 1)[0] for symbols in self.tests.values() for symbol in symbols}
+
+    def test_files(self) -> Set[str]:
+        return {nodeid.split("::", 1)[0] for nodeid in self.tests}
+
+    def users_of(self, symbol: str) -> Set[str]:
+        """Tests that touched a symbol; a class or module symbol matches everything inside it"""
+        users = set()
+        for nodeid, symbols in self.tests.items():
+            for touched in symbols:
+                if touched == symbol or (":" not in symbol and touched.startswith(symbol + ":")):
+                    users.add(nodeid)
+                    break
+        return users
+
+
+class DependencyRecorder:
+    """Plugin recording each test's dependencies: workers attach them to the teardown report, the
+    controller (where xdist replays every report) stores them"""
+
+    def __init__(self, dependency_map: DependencyMap = None):
+        self.dependency_map = dependency_map
+        self._ran: Set[str] = set()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        start_recording()
+        yield
+        finish_recording()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if report.when == "teardown" and _touched is not None:
+            report.dependencies = sorted(_touched)
+
+    def pytest_runtest_logreport(self, report):
+        if self.dependency_map is None:
+            return
+        if report.when == "setup" and report.passed:
+            self._ran.add(report.nodeid)
+        elif report.when == "call" and report.skipped:
+            self._ran.discard(report.nodeid)
+        elif report.when == "teardown" and report.nodeid in self._ran:
+            self._ran.discard(report.nodeid)
+            dependencies = getattr(report, "dependencies", None)
+            if dependencies is not None:
+                self.dependency_map.update(report.nodeid, dependencies)
+
+    def pytest_sessionfinish(self, session):
+        if self.dependency_map is not None and not session.config.option.collectonly:
+            self.dependency_map.save()
+
+
+def _git(cwd: str, *args: str) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+@dataclass
+class FileChange:
+    """Lines of a file changed since the git ref: old_lines in the ref's version, new_lines in the working tree"""
+    path: str
+    old_lines: Set[int] = field(default_factory=set)
+    new_lines: Set[int] = field(default_factory=set)
+
+
+def changed_files(ref: str, cwd: str) -> Dict[str, FileChange]:
+    """Files changed since ref, committed or not, relative to cwd; untracked files count as new"""
+    changes: Dict[str, FileChange] = {}
+    current = None
+    for line in _git(cwd, "diff", "-U0", "--no-color", "--no-renames", "--relative", ref, "--").splitlines():
+        if line.startswith("diff --git "):
+            current = None
+        elif line.startswith("--- ") or line.startswith("+++ "):
+            path = line[4:]
+            if path != "/dev/null":
+                current = changes.setdefault(path[2:], FileChange(path[2:]))
+        elif line.startswith("@@") and current is not None:
+            old, new = line.split()[1:3]
+            current.old_lines.update(_hunk_lines(old[1:]))
+            current.new_lines.update(_hunk_lines(new[1:]))
+    for path in _git(cwd, "ls-files", "--others", "--exclude-standard").splitlines():
+        changes[path] = FileChange(path, new_lines={0})
+    return changes
+
+
+def _hunk_lines(spec: str) -> range:
+    start, _, count = spec.partition(",")
+    count = 1 if count == "" else int(count)
+    return range(int(start), int(start) + count)
+
+
+def module_name(path: str) -> str:
+    """pages/login_page.py -> pages.login_page"""
+    name = path[:-3].replace("/", ".").replace(os.sep, ".")
+    return name[:-len(".__init__")] if name.endswith(".__init__") else name
+
+
+def changed_symbols(source: str, lines: Set[int], module: str) -> Set[str]:
+    """Symbols of a module that contain the given lines
+
+    A public method or an UPPER_CASE constant of a class is its own symbol; anything
+    else in a class body stands for the whole class and anything outside a class for
+    the whole module. Unparsable source counts as a module change.
+    """
+    if not lines:
+        return set()
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {module}
+    symbols = set()
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        hit = {line for line in lines if start <= line <= node.end_lineno}
+        if not hit:
+            continue
+        lines = lines - hit
+        if not isinstance(node, ast.ClassDef):
+            symbols.add(module)
+            continue
+        class_symbol = f"{module}:{node.name}"
+        for member in node.body:
+            start = min([member.lineno] + [d.lineno for d in getattr(member, "decorator_list", [])])
+            member_hit = {line for line in hit if start <= line <= member.end_lineno}
+            if not member_hit:
+                continue
+            hit -= member_hit
+            symbols.add(_member_symbol(member, class_symbol))
+        if hit:
+            symbols.add(class_symbol)
+    if lines:
+        # Blank lines and comments between top level statements
+        symbols.add(module)
+    return symbols
+
+
+def _member_symbol(member: ast.stmt, class_symbol: str) -> str:
+    if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        # Only plain public methods are tracked one by one
+        if not member.name.startswith("_") and not member.decorator_list:
+            return f"{class_symbol}.{member.name}"
+    elif isinstance(member, (ast.Assign, ast.AnnAssign)):
+        targets = member.targets if isinstance(member, ast.Assign) else [member.target]
+        if len(targets) == 1 and isinstance(targets[0], ast.Name) and targets[0].id.isupper():
+            return f"{class_symbol}.{targets[0].id}"
+    return class_symbol
+
+
+@dataclass
+class Selection:
+    """Outcome of --changed-since: the tests to keep, or why everything runs"""
+    ref: str
+    changed: int
+    full_run_reason: Optional[str] = None
+    nodeids: Set[str] = field(default_factory=set)
+    files: Set[str] = field(default_factory=set)
+    known: Set[str] = field(default_factory=set)
+
+    def keeps(self, nodeid: str) -> bool:
+        """Whether a collected test runs; tests the map has never seen always run"""
+        if self.full_run_reason is not None:
+            return True
+        nodeid, _ = split_group(nodeid)
+        return nodeid in self.nodeids or nodeid.split("::", 1)[0] in self.files or nodeid not in self.known
+
+    def describe(self) -> str:
+        if self.full_run_reason is not None:
+            return f"changed since {self.ref}: {self.changed} files, running everything ({self.full_run_reason})"
+        return (f"changed since {self.ref}: {self.changed} files, {len(self.nodeids)} affected tests "
+                f"and the tests in {len(self.files)} changed test files")
+
+    def to_dict(self) -> Dict:
+        return {"ref": self.ref, "changed": self.changed, "full_run_reason": self.full_run_reason,
+                "nodeids": sorted(self.nodeids), "files": sorted(self.files), "known": sorted(self.known)}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Selection":
+        return cls(data["ref"], data["changed"], data["full_run_reason"],
+                   set(data["nodeids"]), set(data["files"]), set(data["known"]))
+
+
+def select_tests(ref: str, cwd: str, dependency_map: DependencyMap, test_patterns: Sequence[str],
+                 ignore: Sequence[str] = (), full_run: Sequence[str] = ()) -> Selection:
+    """Work out which tests a diff against ref can affect"""
+    changes = changed_files(ref, cwd)
+    selection = Selection(ref, len(changes), known=set(dependency_map.tests))
+    if not dependency_map.tests:
+        selection.full_run_reason = "no dependency map recorded yet"
+        return selection
+    modules = dependency_map.modules()
+    test_files = dependency_map.test_files()
+    for path, change in sorted(changes.items()):
+        posix_path = path.replace(os.sep, "/")
+        if any(fnmatch.fnmatch(posix_path, pattern) for pattern in ignore):
+            continue
+        if any(fnmatch.fnmatch(posix_path, pattern) for pattern in full_run):
+            selection.full_run_reason = f"shared file {posix_path} changed"
+            return selection
+        if posix_path in test_files or any(fnmatch.fnmatch(os.path.basename(path), p) for p in test_patterns):
+            selection.files.add(posix_path)
+            continue
+        module = module_name(posix_path) if posix_path.endswith(".py") else None
+        if module not in modules:
+            selection.full_run_reason = f"no dependency data for {posix_path}"
+            return selection
+        selection.nodeids.update(affected_tests(ref, cwd, path, module, change, dependency_map))
+    return selection
+
+
+def affected_tests(ref: str, cwd: str, path: str, module: str, change: FileChange,
+                   dependency_map: DependencyMap) -> Set[str]:
+    """Tests that touched the symbols changed in one page object module"""
+    symbols = set()
+    if change.old_lines - {0}:
+        try:
+            old_source = _git(cwd, "show", f"{ref}:./{path}")
+        except ValueError:
+            old_source = ""
+        symbols |= changed_symbols(old_source, change.old_lines - {0}, module)
+    if change.new_lines - {0}:
+        with open(os.path.join(cwd, path), encoding="utf-8") as f:
+            symbols |= changed_symbols(f.read(), change.new_lines - {0}, module)
+    elif 0 in change.new_lines:
+        symbols.add(module)
+    users = set()
+    for symbol in symbols:
+        found = dependency_map.users_of(symbol)
+        _, _, qualname = symbol.partition(":")
+        if not found and "." in qualname and qualname.rsplit(".", 1)[1].isupper():
+            # Constants only show up when used as a selector; otherwise assume the whole class uses them
+            found = dependency_map.users_of(symbol.rsplit(".", 1)[0])
+        users |= found
+    return users
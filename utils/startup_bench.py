@@ -0,0 +1,153 @@
+"""
+Container startup benchmark
+Starts the test image a few times and reports how long each phase took from
+`docker run` to the first test (entrypoint, pytest, collection, first test), so
+changes to the image or entrypoint can be compared by per-job overhead
+
+    python -m utils.startup_bench --image playwright-tests --runs 5
+    python -m utils.startup_bench --image playwright-tests:main --image playwright-tests --output startup.json
+    python -m utils.startup_bench --image playwright-tests -- tests/test_login.py -n 4
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import pytest
+
+
+# Printed once by StartupTimer when the first test starts
+STARTUP_PREFIX = "startup timing:"
+PHASES = ("entrypoint", "pytest", "collected", "first_test")
+_MARK = re.compile(r"(\w+)=([\d.]+)s")
+
+
+class StartupTimer:
+    """Plugin that reports when pytest started, finished collecting and began the first test
+
+    Times are seconds since CONTAINER_STARTED_AT (epoch seconds, set by docker-entrypoint.sh
+    or by the benchmark before `docker run`); ENTRYPOINT_STARTED_AT adds the entrypoint.
+    """
+
+    def __init__(self, config, started_at: float):
+        self.config = config
+        self.started_at = started_at
+        self.marks: Dict[str, float] = {}
+        if os.getenv("ENTRYPOINT_STARTED_AT"):
+            self.mark("entrypoint", float(os.environ["ENTRYPOINT_STARTED_AT"]))
+        self.mark("pytest")
+
+    def mark(self, phase: str, at: float = None):
+        if phase not in self.marks:
+            self.marks[phase] = round((time.time() if at is None else at) - self.started_at, 3)
+
+    def pytest_collection_finish(self, session):
+        self.mark("collected")
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        # The xdist controller doesn't collect; the first worker that did counts
+        self.mark("collected")
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        if "first_test" in self.marks:
+            return
+        self.mark("first_test")
+        reporter = self.config.pluginmanager.get_plugin("terminalreporter")
+        if reporter is not None:
+            reporter.write_line(format_marks(self.marks))
+
+
+def format_marks(marks: Dict[str, float]) -> str:
+    return f"{STARTUP_PREFIX} " + " ".join(f"{phase}={marks[phase]:.3f}s" for phase in PHASES if phase in marks) + \
+        " (since container start)"
+
+
+def parse_marks(line: str) -> Optional[Dict[str, float]]:
+    """The phases of a StartupTimer line, None for any other output line"""
+    if STARTUP_PREFIX not in line:
+        return None
+    return {phase: float(value) for phase, value in _MARK.findall(line.split(STARTUP_PREFIX, 1)[1])}
+
+
+def run_once(image: str, pytest_args: List[str], timeout: float, docker_args: List[str]) -> Dict:
+    """Start the image and stop it once the first test started; the marks, or an error"""
+    name = f"startup-bench-{uuid.uuid4().hex[:8]}"
+    started = time.time()
+    command = ["docker", "run", "--rm", "--name", name, "-e", f"CONTAINER_STARTED_AT={started:.6f}",
+               *docker_args, image, *pytest_args]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    timer = threading.Timer(timeout, lambda: subprocess.run(["docker", "kill", name], capture_output=True))
+    timer.start()
+    marks, tail = None, []
+    try:
+        for line in process.stdout:
+            tail = (tail + [line.rstrip()])[-20:]
+            marks = parse_marks(line)
+            if marks is not None:
+                break
+    finally:
+        timer.cancel()
+        subprocess.run(["docker", "kill", name], capture_output=True)
+        process.stdout.close()
+        process.wait()
+    if marks is None:
+        return {"image": image, "error": "no test started:\n" + "\n".join(tail)}
+    return {"image": image, **marks}
+
+
+def summarize(runs: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """min, median and max of every phase over the successful runs"""
+    summary = {}
+    for phase in PHASES:
+        values = [run[phase] for run in runs if phase in run]
+        if values:
+            summary[phase] = {"min": min(values), "median": round(statistics.median(values), 3), "max": max(values)}
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time the test image from docker run to the first test")
+    parser.add_argument("--image", action="append", required=True, help="Image to start; repeat to compare images")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per image")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for the first test")
+    parser.add_argument("--docker-arg", action="append", default=[], help="Extra `docker run` argument, e.g. --docker-arg=--env=CI=true")
+    parser.add_argument("--output", help="Write every run and the summary to this JSON file")
+    parser.add_argument("pytest_args", nargs="*", help="Arguments for pytest in the container (after --)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = {}
+    failed = False
+    for image in args.image:
+        runs = []
+        for number in range(1, args.runs + 1):
+            run = run_once(image, args.pytest_args, args.timeout, args.docker_arg)
+            runs.append(run)
+            if "error" in run:
+                failed = True
+                print(f"{image} run {number}: {run['error']}")
+            else:
+                print(f"{image} run {number}: " + format_marks(run))
+        summary = summarize(runs)
+        results[image] = {"runs": runs, "summary": summary}
+        print(f"\n{image} ({len(runs)} runs, seconds since docker run)")
+        for phase, stats in summary.items():
+            print(f"  {phase:<11} min {stats['min']:>7.2f}  median {stats['median']:>7.2f}  max {stats['max']:>7.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+Statistics helpers
+Small numeric helpers shared by the reports, kept apart so importing one report
+doesn't pull in the modules of the others
+"""
+from typing import List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentile with linear interpolation between the closest ranks"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
@@ -0,0 +1,174 @@
+"""
+Per-test timeline
+Records the wall time of page object methods, fixture setup and test phases into
+a timeline per test, written as JSON lines per worker and summarized at the end
+"""
+import functools
+import glob
+import inspect
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from utils.workers import worker_id
+
+
+# Page object methods whose first argument is a selector
+SELECTOR_METHODS = ("click", "fill", "get_text", "is_visible", "wait_for_selector")
+# Too cheap and too frequent to be worth a step of their own
+UNTIMED_METHODS = ("locator", "element", "get_url")
+
+# Nesting of the step being recorded; a context variable, so concurrent tasks of one test each nest on their own
+_depth: ContextVar[int] = ContextVar("timeline_depth", default=0)
+
+
+class Timeline:
+    """Steps recorded while one test runs"""
+
+    def __init__(self, nodeid: str):
+        self.nodeid = nodeid
+        self.started = time.perf_counter()
+        self.steps: List[Dict] = []
+
+    @property
+    def depth(self) -> int:
+        return _depth.get()
+
+    def record(self, kind: str, name: str, started: float, duration_ms: float, **attrs):
+        self.steps.append({
+            "kind": kind,
+            "name": name,
+            "offset_ms": round((started - self.started) * 1000, 1),
+            "duration_ms": round(duration_ms, 1),
+            "depth": self.depth,
+            **{key: value for key, value in attrs.items() if value is not None},
+        })
+
+    @contextmanager
+    def step(self, kind: str, name: str, **attrs):
+        started = time.perf_counter()
+        token = _depth.set(_depth.get() + 1)
+        try:
+            yield
+        finally:
+            _depth.reset(token)
+            self.record(kind, name, started, (time.perf_counter() - started) * 1000, **attrs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "nodeid": self.nodeid,
+            "worker": worker_id(),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "steps": self.steps,
+        }
+
+
+_current: Optional[Timeline] = None
+
+
+def start_timeline(nodeid: str) -> Timeline:
+    global _current
+    _current = Timeline(nodeid)
+    return _current
+
+
+def finish_timeline() -> Optional[Timeline]:
+    global _current
+    timeline, _current = _current, None
+    return timeline
+
+
+def current_timeline() -> Optional[Timeline]:
+    return _current
+
+
+def timed(func):
+    """Record every call of a page object method (sync or async) as a step of the current test"""
+    if getattr(func, "__timed__", False):
+        return func
+
+    def step_of(self, args):
+        selector = None
+        if func.__name__ in SELECTOR_METHODS and args and isinstance(args[0], str):
+            selector = self.locators.name_of(args[0])
+        return _current.step("page", f"{type(self).__name__}.{func.__name__}",
+                             page=type(self).__name__, selector=selector)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if _current is None:
+                return await func(self, *args, **kwargs)
+            with step_of(self, args):
+                return await func(self, *args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if _current is None:
+                return func(self, *args, **kwargs)
+            with step_of(self, args):
+                return func(self, *args, **kwargs)
+
+    wrapper.__timed__ = True
+    return wrapper
+
+
+def instrument_page_class(cls: type):
+    """Wrap the public methods a page class defines with timed()"""
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and name not in UNTIMED_METHODS and inspect.isfunction(value):
+            setattr(cls, name, timed(value))
+
+
+def clear_timelines(directory: str):
+    """Remove timelines left by a previous run"""
+    for path in glob.glob(os.path.join(directory, "timeline-*.jsonl")):
+        os.remove(path)
+
+
+class TimelineWriter:
+    """Appends finished timelines to this worker's JSON lines file"""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"timeline-{worker_id()}.jsonl")
+
+    def write(self, timeline: Timeline):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(timeline.to_dict()) + "\n")
+
+
+def load_timelines(directory: str) -> Iterator[Dict]:
+    """Read the timelines every worker wrote"""
+    for path in sorted(glob.glob(os.path.join(directory, "timeline-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize(timelines: Iterator[Dict], top_n: int = 10) -> Dict[str, List[Dict]]:
+    """Aggregate steps by name, selector and page, slowest total first"""
+    groups = {"steps": defaultdict(list), "selectors": defaultdict(list), "pages": defaultdict(list)}
+    for timeline in timelines:
+        for step in timeline["steps"]:
+            label = step["name"] if step["kind"] == "page" else f"{step['kind']}:{step['name']}"
+            groups["steps"][label].append(step["duration_ms"])
+            if step.get("selector"):
+                groups["selectors"][step["selector"]].append(step["duration_ms"])
+            # Only outermost page calls, so nested helpers aren't counted twice
+            if step.get("page") and step["depth"] == 0:
+                groups["pages"][step["page"]].append(step["duration_ms"])
+    summary = {}
+    for group, durations in groups.items():
+        rows = [
+            {"name": name, "count": len(values), "total_ms": round(sum(values), 1),
+             "mean_ms": round(sum(values) / len(values), 1), "max_ms": max(values)}
+            for name, values in durations.items()
+        ]
+        summary[group] = sorted(rows, key=lambda row: row["total_ms"], reverse=True)[:top_n]
+    return summary
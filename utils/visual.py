@@ -0,0 +1,280 @@
+"""
+Visual regression
+Compares page and element screenshots with stored baselines: a perceptual hash
+decides which screenshots need a pixel diff, the NumPy diff runs in a process pool
+while the test goes on, and each distinct baseline image is stored only once
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from slugify import slugify
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # Only needed when a test uses the visual fixture
+    np = None
+    Image = None
+
+
+# x, y, width, height in screenshot pixels
+Region = Tuple[int, int, int, int]
+
+# The perceptual hash keeps the lowest HASH_SIZE x HASH_SIZE DCT coefficients (256 bits)
+HASH_SIZE = 16
+HASH_SAMPLE = HASH_SIZE * 4
+
+
+def visual_supported() -> bool:
+    return np is not None and Image is not None
+
+
+@dataclass
+class VisualSettings:
+    """Thresholds handed to the diff processes"""
+    hash_distance: int = 0  # Hash bits that may differ without a pixel diff; -1 always diffs
+    pixel_tolerance: int = 16  # Channel difference still counted as the same pixel (anti-aliasing)
+    max_diff_ratio: float = 0.001  # Share of changed pixels that still matches
+    update: bool = False  # Replace mismatching baselines instead of failing
+
+
+@dataclass
+class VisualResult:
+    """Outcome of one screenshot comparison"""
+    name: str
+    key: str
+    status: str  # match, mismatch, new or updated
+    digest: str
+    phash: str
+    size: Tuple[int, int]
+    reason: str = ""  # identical, perceptual hash or pixel diff for a match
+    hash_distance: Optional[int] = None
+    diff_ratio: Optional[float] = None
+    diff_path: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def load_pixels(png: bytes) -> "np.ndarray":
+    return np.asarray(Image.open(io.BytesIO(png)).convert("RGB"))
+
+
+def encode_png(pixels: "np.ndarray") -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def apply_masks(pixels: "np.ndarray", regions: Sequence[Region]) -> "np.ndarray":
+    """Black out regions that change on every run (selectors are masked by Playwright instead)"""
+    if not regions:
+        return pixels
+    pixels = pixels.copy()
+    for x, y, width, height in regions:
+        pixels[max(y, 0):max(y + height, 0), max(x, 0):max(x + width, 0)] = 0
+    return pixels
+
+
+def pixel_digest(pixels: "np.ndarray") -> str:
+    """Content address of an image: the same pixels give the same digest whatever the PNG encoding"""
+    digest = hashlib.sha256(f"{pixels.shape}".encode("utf-8"))
+    digest.update(np.ascontiguousarray(pixels).tobytes())
+    return digest.hexdigest()
+
+
+def _dct_matrix(size: int) -> "np.ndarray":
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def perceptual_hash(pixels: "np.ndarray") -> str:
+    """pHash: low frequency DCT coefficients of the downscaled grayscale image, above or below their median"""
+    gray = Image.fromarray(pixels).convert("L").resize((HASH_SAMPLE, HASH_SAMPLE), Image.LANCZOS)
+    dct = _dct_matrix(HASH_SAMPLE)
+    coefficients = (dct @ np.asarray(gray, dtype=np.float64) @ dct.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = coefficients > np.median(coefficients)
+    return np.packbits(bits.flatten()).tobytes().hex()
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def diff_image(actual: "np.ndarray", changed: "np.ndarray") -> "np.ndarray":
+    """The actual screenshot faded out, with changed pixels in red"""
+    image = (actual * 0.3 + 178).astype(np.uint8)
+    image[changed] = (255, 0, 0)
+    return image
+
+
+def compare_screenshot(name: str, key: str, png: bytes, ref: Optional[Dict], regions: Sequence[Region],
+                       store_root: str, diff_dir: str, settings: VisualSettings) -> VisualResult:
+    """Compare one screenshot with its baseline; runs in a pool process
+
+    Identical pixels and (within hash_distance) identical perceptual hashes match
+    without decoding the baseline; only the rest get the pixel diff. New and
+    replaced baselines are written to the object store here, the ref by the caller.
+    """
+    store = BaselineStore(store_root)
+    actual = apply_masks(load_pixels(png), regions)
+    height, width = actual.shape[:2]
+    result = VisualResult(name, key, "match", pixel_digest(actual), perceptual_hash(actual), (width, height))
+    if ref is None:
+        store.put_object(result.digest, encode_png(actual))
+        result.status = "new"
+        return result
+    if ref["digest"] == result.digest:
+        result.reason = "identical"
+        return result
+    if tuple(ref["size"]) == result.size:
+        result.hash_distance = hamming(ref["phash"], result.phash)
+        if 0 <= settings.hash_distance and result.hash_distance <= settings.hash_distance:
+            result.reason = "perceptual hash"
+            return result
+        baseline = load_pixels(store.read_object(ref["digest"]))
+        changed = (np.abs(actual.astype(np.int16) - baseline.astype(np.int16)).max(axis=2)
+                   > settings.pixel_tolerance)
+        result.diff_ratio = round(float(changed.mean()), 6)
+        if result.diff_ratio <= settings.max_diff_ratio:
+            result.reason = "pixel diff"
+            return result
+    else:
+        changed = None
+    if settings.update:
+        store.put_object(result.digest, encode_png(actual))
+        result.status = "updated"
+        return result
+    result.status = "mismatch"
+    os.makedirs(diff_dir, exist_ok=True)
+    slug = slugify(name)
+    with open(os.path.join(diff_dir, f"{slug}-actual.png"), "wb") as f:
+        f.write(png)
+    if changed is not None:
+        result.diff_path = os.path.join(diff_dir, f"{slug}-diff.png")
+        with open(result.diff_path, "wb") as f:
+            f.write(encode_png(diff_image(actual, changed)))
+    return result
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BaselineStore:
+    """Baseline images stored once per pixel digest, plus a small ref file per screenshot name and viewport
+
+    Layout: objects/<ab>/<digest>.png and refs/<browser>/<viewport>/<name>.json, so
+    screenshots that look the same across viewports or tests share one image.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def key_for(name: str, browser: str, viewport: Optional[Dict]) -> str:
+        size = f"{viewport['width']}x{viewport['height']}" if viewport else "default"
+        return f"{browser}/{size}/{slugify(name)}"
+
+    def ref_path(self, key: str) -> str:
+        return os.path.join(self.root, "refs", *key.split("/")) + ".json"
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.png")
+
+    def get_ref(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self.ref_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_ref(self, key: str, result: VisualResult):
+        ref = {"digest": result.digest, "phash": result.phash, "size": list(result.size)}
+        _write_atomic(self.ref_path(key), (json.dumps(ref, indent=2) + "\n").encode("utf-8"))
+
+    def read_object(self, digest: str) -> bytes:
+        with open(self.object_path(digest), "rb") as f:
+            return f.read()
+
+    def put_object(self, digest: str, png: bytes):
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, png)
+
+
+def create_pool(workers: int) -> ProcessPoolExecutor:
+    """Diff processes for this worker; spawned, since forking a process that runs Playwright is unsafe"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class VisualChecker:
+    """Screenshot checks of one test: check() queues a comparison, verify() waits for all of them
+
+    check() returns as soon as the screenshot is taken, so the test keeps driving the
+    browser while the diffs run; verify() is called after the test body passed.
+    """
+
+    def __init__(self, store: BaselineStore, pool: ProcessPoolExecutor, browser: str, diff_dir: str,
+                 settings: VisualSettings, record_new: bool = True):
+        self.store = store
+        self.pool = pool
+        self.browser = browser
+        self.diff_dir = diff_dir
+        self.settings = settings
+        self.record_new = record_new
+        self.results: List[VisualResult] = []
+        self._pending: List[Future] = []
+
+    def check(self, page_object, name: str, locator: str = None, mask: Sequence[str] = (),
+              regions: Sequence[Region] = (), full_page: bool = False):
+        """Screenshot the page (or one element) and queue its comparison with the baseline named name
+
+        mask: selectors painted over by Playwright, e.g. the alert of a failed login
+        regions: (x, y, width, height) boxes blacked out in the screenshot
+        """
+        png = page_object.take_screenshot(locator=locator, mask=mask, full_page=full_page)
+        key = self.store.key_for(name, self.browser, page_object.page.viewport_size)
+        self._pending.append(self.pool.submit(
+            compare_screenshot, name, key, png, self.store.get_ref(key), list(regions),
+            self.store.root, self.diff_dir, self.settings,
+        ))
+
+    def verify(self) -> List[VisualResult]:
+        """Wait for the queued comparisons, store new baselines and fail on mismatches"""
+        pending, self._pending = self._pending, []
+        results = [future.result() for future in pending]
+        self.results.extend(results)
+        failures = []
+        for result in results:
+            if result.status == "new" and not self.record_new:
+                failures.append(f"{result.key}: no baseline (record it with --update-baselines)")
+            elif result.status in ("new", "updated"):
+                self.store.set_ref(result.key, result)
+                print(f"Baseline {result.status}: {result.key}")
+            elif result.status == "mismatch":
+                detail = "size changed" if result.diff_ratio is None else f"{result.diff_ratio:.2%} of pixels changed"
+                failures.append(f"{result.key}: {detail} (diff: {result.diff_path or self.diff_dir})")
+        if failures:
+            raise AssertionError("Screenshots don't match their baselines:\n" + "\n".join(failures))
+        return results
+
+    def cancel(self):
+        """Drop comparisons still queued, e.g. when the test failed before verify()"""
+        for future in self._pending:
+            future.cancel()
+        self._pending = []
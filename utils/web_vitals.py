@@ -0,0 +1,267 @@
+"""
+Web vitals
+Collects navigation timing, resource timing, LCP, CLS, TTFB and long tasks for
+every page load done through a page object, checks them against perf_budget
+markers and summarizes them per URL at the end of the session
+"""
+import fnmatch
+import glob
+import json
+import math
+import os
+from dataclasses import dataclass, asdict, field, fields
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+from weakref import WeakSet
+
+from playwright.sync_api import Error as PlaywrightError
+
+from config.config import Config, action_timeout
+from utils.workers import worker_id
+
+
+# Registered as an init script: observes the entries that can't be read after the fact
+VITALS_SCRIPT = """
+(() => {
+    if (window.__webVitals) return;
+    const vitals = window.__webVitals = { lcp: null, cls: 0, longTasks: 0, totalBlocking: 0 };
+    const observe = (type, callback) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({ type, buffered: true });
+        } catch (e) {
+            // Entry type not supported by this browser
+        }
+    };
+    observe('largest-contentful-paint', entry => { vitals.lcp = entry.startTime; });
+    // CLS is the worst burst of shifts (gaps under 1 s, at most 5 s long), ignoring shifts after input
+    let burst = 0, burstStart = 0, lastShift = 0;
+    observe('layout-shift', entry => {
+        if (entry.hadRecentInput) return;
+        if (burst && entry.startTime - lastShift < 1000 && entry.startTime - burstStart < 5000) {
+            burst += entry.value;
+        } else {
+            burst = entry.value;
+            burstStart = entry.startTime;
+        }
+        lastShift = entry.startTime;
+        vitals.cls = Math.max(vitals.cls, burst);
+    });
+    observe('longtask', entry => {
+        vitals.longTasks += 1;
+        vitals.totalBlocking += Math.max(0, entry.duration - 50);
+    });
+})();
+"""
+
+# Reads everything once the observers had a frame to report (and, with loadTimeout, once the page loaded)
+COLLECT_SCRIPT = """
+async ({ slowest, loadTimeout }) => {
+    if (loadTimeout && document.readyState !== 'complete') {
+        await new Promise(resolve => { addEventListener('load', resolve, { once: true }); setTimeout(resolve, loadTimeout); });
+    }
+    await new Promise(resolve => { requestAnimationFrame(() => setTimeout(resolve, 0)); setTimeout(resolve, 100); });
+    const nav = performance.getEntriesByType('navigation')[0];
+    const paint = performance.getEntriesByName('first-contentful-paint')[0];
+    const resources = performance.getEntriesByType('resource');
+    const vitals = window.__webVitals;
+    return {
+        url: location.href,
+        ttfb: nav ? nav.responseStart : null,
+        fcp: paint ? paint.startTime : null,
+        lcp: vitals ? vitals.lcp : null,
+        cls: vitals ? vitals.cls : null,
+        domContentLoaded: nav && nav.domContentLoadedEventEnd ? nav.domContentLoadedEventEnd : null,
+        load: nav && nav.loadEventEnd ? nav.loadEventEnd : null,
+        longTasks: vitals ? vitals.longTasks : null,
+        totalBlocking: vitals ? vitals.totalBlocking : null,
+        resources: resources.length,
+        transferSize: resources.reduce((sum, r) => sum + (r.transferSize || 0), nav ? nav.transferSize || 0 : 0),
+        slowest: resources
+            .map(r => ({ name: r.name, type: r.initiatorType, duration: Math.round(r.duration) }))
+            .sort((a, b) => b.duration - a.duration)
+            .slice(0, slowest),
+    };
+}
+"""
+
+
+@dataclass
+class PageMetrics:
+    """Timings of one page load; None when the browser doesn't report the metric"""
+    page: str
+    url: str
+    ttfb_ms: Optional[float] = None
+    fcp_ms: Optional[float] = None
+    lcp_ms: Optional[float] = None  # Largest paint so far, the page may still be loading
+    cls: Optional[float] = None
+    dom_content_loaded_ms: Optional[float] = None
+    load_ms: Optional[float] = None
+    long_tasks: Optional[int] = None
+    total_blocking_ms: Optional[float] = None
+    resources: int = 0
+    transfer_kb: float = 0.0
+    slowest_resources: List[Dict] = field(default_factory=list)
+
+    @classmethod
+    def from_result(cls, page_name: str, result: Dict) -> "PageMetrics":
+        def ms(value):
+            return None if value is None else round(value, 1)
+        return cls(
+            page=page_name,
+            url=result["url"],
+            ttfb_ms=ms(result["ttfb"]),
+            fcp_ms=ms(result["fcp"]),
+            lcp_ms=ms(result["lcp"]),
+            cls=None if result["cls"] is None else round(result["cls"], 4),
+            dom_content_loaded_ms=ms(result["domContentLoaded"]),
+            load_ms=ms(result["load"]),
+            long_tasks=result["longTasks"],
+            total_blocking_ms=ms(result["totalBlocking"]),
+            resources=result["resources"],
+            transfer_kb=round(result["transferSize"] / 1024, 1),
+            slowest_resources=result["slowest"],
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Budgets can be set on any numeric metric
+BUDGET_KEYS = tuple(f.name for f in fields(PageMetrics) if f.name not in ("page", "url", "slowest_resources"))
+
+# Page loads measured since the last drain, collected per test by conftest.py
+metrics_log: List[PageMetrics] = []
+# Switched on for a single test by its perf_budget marker
+_forced = False
+# Pages that already have the observers registered as an init script
+_installed = WeakSet()
+
+
+def collecting() -> bool:
+    """Whether page objects should measure their page loads right now"""
+    return Config.WEB_VITALS or _forced
+
+
+def force_collection(enabled: bool):
+    global _forced
+    _forced = enabled
+
+
+def drain_metrics_log() -> List[PageMetrics]:
+    """Return and clear all recorded page metrics"""
+    metrics = list(metrics_log)
+    metrics_log.clear()
+    return metrics
+
+
+def install(page):
+    """Register the observers for every document the (sync) page loads from now on"""
+    if page not in _installed:
+        page.add_init_script(VITALS_SCRIPT)
+        _installed.add(page)
+
+
+async def install_async(page):
+    if page not in _installed:
+        await page.add_init_script(VITALS_SCRIPT)
+        _installed.add(page)
+
+
+def collect_args() -> Dict:
+    """Arguments of COLLECT_SCRIPT: a budgeted test waits for the load event, so load and LCP are settled"""
+    return {"slowest": Config.WEB_VITALS_SLOWEST, "loadTimeout": action_timeout("navigate") if _forced else 0}
+
+
+def collect(page, page_name: str) -> Optional[PageMetrics]:
+    """Read the metrics of the current document and add them to the log"""
+    try:
+        result = page.evaluate(COLLECT_SCRIPT, collect_args())
+    except PlaywrightError:
+        # The page navigated again while measuring
+        return None
+    metrics = PageMetrics.from_result(page_name, result)
+    metrics_log.append(metrics)
+    return metrics
+
+
+async def collect_async(page, page_name: str) -> Optional[PageMetrics]:
+    try:
+        result = await page.evaluate(COLLECT_SCRIPT, collect_args())
+    except PlaywrightError:
+        return None
+    metrics = PageMetrics.from_result(page_name, result)
+    metrics_log.append(metrics)
+    return metrics
+
+
+def check_budget(metrics: List[PageMetrics], budget: Dict) -> List[str]:
+    """Describe every page load over budget or missing a budgeted metric, e.g. budget = {"lcp_ms": 2500, "url": "*/login*"}"""
+    budget = dict(budget)
+    url_pattern = budget.pop("url", None)
+    unknown = set(budget) - set(BUDGET_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown perf_budget metrics {sorted(unknown)}, use {list(BUDGET_KEYS)}")
+    violations = []
+    for entry in metrics:
+        if url_pattern and not fnmatch.fnmatch(entry.url, url_pattern):
+            continue
+        for key, limit in budget.items():
+            value = getattr(entry, key)
+            if value is None:
+                # e.g. LCP outside Chromium, or a page that never finished loading
+                violations.append(f"{entry.url}: {key} not reported, budget {limit} can't be checked")
+            elif value > limit:
+                violations.append(f"{entry.url}: {key} {value} > {limit}")
+    return violations
+
+
+def clear_vitals(directory: str):
+    """Remove page metrics left by a previous run"""
+    for path in glob.glob(os.path.join(directory, "vitals-*.jsonl")):
+        os.remove(path)
+
+
+class VitalsWriter:
+    """Appends the page loads of each test to this worker's JSON lines file"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, f"vitals-{worker_id()}.jsonl")
+
+    def write(self, nodeid: str, metrics: List[PageMetrics]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for entry in metrics:
+                f.write(json.dumps({"nodeid": nodeid, **entry.to_dict()}) + "\n")
+
+
+def load_vitals(directory: str) -> Iterator[Dict]:
+    """Read the page loads every worker wrote"""
+    for path in sorted(glob.glob(os.path.join(directory, "vitals-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def p75(values: List[float]) -> Optional[float]:
+    """75th percentile (nearest rank), the percentile Core Web Vitals are judged on"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return values[math.ceil(len(values) * 0.75) - 1]
+
+
+def summarize_vitals(entries: Iterator[Dict]) -> List[Dict]:
+    """p75 of the main metrics per URL (query strings dropped)"""
+    by_url: Dict[str, List[Dict]] = {}
+    for entry in entries:
+        parts = urlsplit(entry["url"])
+        by_url.setdefault(f"{parts.scheme}://{parts.netloc}{parts.path}", []).append(entry)
+    rows = []
+    for url, loads in sorted(by_url.items()):
+        row = {"url": url, "loads": len(loads)}
+        for key in ("ttfb_ms", "fcp_ms", "lcp_ms", "cls", "total_blocking_ms"):
+            row[key] = p75([load[key] for load in loads])
+        rows.append(row)
+    return rows
@@ -0,0 +1,47 @@
+"""
+Helpers for running under pytest-xdist
+Lets fixtures and hooks tell the controller apart from workers
+"""
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+
+# Values published by each process, gathered on the controller
+worker_results_key = pytest.StashKey[Dict[str, List[Any]]]()
+
+
+def is_ci() -> bool:
+    """Check if tests are running in a CI environment"""
+    return os.getenv('CI') == 'true' or os.getenv('GITHUB_ACTIONS') == 'true'
+
+
+def worker_id() -> str:
+    """Get the xdist worker id ('master' when not running in parallel)"""
+    return os.getenv("PYTEST_XDIST_WORKER", "master")
+
+
+def is_xdist_worker(config) -> bool:
+    """Check if the given pytest config belongs to an xdist worker"""
+    return hasattr(config, "workerinput")
+
+
+def publish(config, key: str, value: Any):
+    """Hand a value to the controller (or keep it locally when not running in parallel)"""
+    if is_xdist_worker(config):
+        config.workeroutput[key] = value
+    else:
+        config.stash.setdefault(worker_results_key, {}).setdefault(key, []).append(value)
+
+
+def collect_worker_output(config, workeroutput: Dict[str, Any]):
+    """Store what a finished worker published; call from pytest_testnodedown"""
+    results = config.stash.setdefault(worker_results_key, {})
+    for key, value in workeroutput.items():
+        results.setdefault(key, []).append(value)
+
+
+def gathered(config, key: str) -> List[Any]:
+    """Get every value published under a key across all workers"""
+    return config.stash.get(worker_results_key, {}).get(key, [])